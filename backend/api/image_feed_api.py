@@ -1,5 +1,5 @@
 from dependency_injector.wiring import inject, Provide
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify
 
 from backend.lib.container import Container
 from backend.lib.error_response import error_response
@@ -32,13 +32,11 @@ def get_image_feed(
 @validate_request(ImageFeedConfiguration)
 @inject
 def set_image_feed(
+    image_feed_configuration: ImageFeedConfiguration,
     image_feed_service: ImageFeedService = Provide[Container.image_feed_service],
 ):
     try:
-        req = request.get_json()
-        logger.debug(f"POST /image-feed: {req}")
-        # Request is a valid image feed configuration
-        image_feed_configuration = ImageFeedConfiguration(**req)
+        logger.debug(f"POST /image-feed: {image_feed_configuration}")
         image_feed_service.update_image_feed(image_feed_configuration)
         return jsonify(message="Image feed should now be updating", data=dict(success=True)), 200
     except Exception as err:
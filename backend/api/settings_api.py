@@ -1,10 +1,11 @@
 from dependency_injector.wiring import inject, Provide
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, make_response, request
 
 from backend.lib.container import Container
-from backend.lib.display_utilis import detect_inky_display, resolve_display_type_from_inky_instance
+from backend.lib.display_utilis import DisplayDetection, get_display_detection
 from backend.lib.error_response import error_response
 from backend.lib.logger_setup import logger
+from backend.lib.settings_dispatcher import SettingsDispatcher, SettingsOperation
 from backend.lib.validator import validate_request
 from backend.models.display_model import DetectionError, DisplaySettingsUpdate
 from backend.services.settings_service import DisplaySettingsService
@@ -30,51 +31,144 @@ def get_settings(display_settings_service: DisplaySettingsService = Provide[Cont
 @settings_api.route("/settings", methods=["PATCH"])
 @validate_request(DisplaySettingsUpdate)
 @inject
-def apply_settings(display_settings_service: DisplaySettingsService = Provide[Container.display_settings_service]):
+def apply_settings(
+    display_settings_update: DisplaySettingsUpdate,
+    display_settings_service: DisplaySettingsService = Provide[Container.display_settings_service],
+):
     try:
-        req = request.get_json()
-        logger.debug(f"PATCH /display: {req}")
-        # req is a valid set of settings for setting the display
-        # unpack and pass to SetDisplay constructor
-        display_settings_update = DisplaySettingsUpdate(**req)
-        display_settings_service.update_settings(display_settings_update)
-        return jsonify(message="Display settings updated", data=dict(success=True)), 200
+        logger.debug(f"PATCH /display: {display_settings_update}")
+        # display_settings_update is a valid set of settings for setting the display, the settings are stored before
+        # responding and applied in the background, the operation can be polled until they have been applied
+        operation = display_settings_service.update_settings(display_settings_update)
+        return jsonify(message="Display settings updated", data=dict(success=True, **operation_json(operation))), 202
     except Exception as err:
         logger.exception(err)
         logger.error(f"Failed to update display: {err}")
         return error_response("Failed to update display", err)
 
 
+@settings_api.route("/settings/operations/<operation_id>", methods=["GET"])
+@inject
+def get_settings_operation(
+    operation_id: str, settings_dispatcher: SettingsDispatcher = Provide[Container.settings_dispatcher]
+):
+    operation = settings_dispatcher.get_operation(operation_id)
+    if operation is None:
+        return error_response("Settings operation not found", ValueError(f"No operation with id {operation_id}"), 404)
+    return jsonify(data=operation_json(operation)), 200
+
+
+def operation_json(operation: SettingsOperation) -> dict:
+    return dict(
+        operation_id=operation.id,
+        status=operation.status,
+        submitted_at=operation.submitted_at,
+        finished_at=operation.finished_at,
+        errors=list(operation.errors),
+    )
+
+
 @settings_api.route("/detect-display", methods=["GET"])
 def detect_display():
     try:
-        display = detect_inky_display()
-
-        if display == DetectionError.UNSUPPORTED:
-            ## Handle unsupported display first
-            return jsonify(message="Your display is not supported", data=dict(type=DetectionError.UNSUPPORTED)), 200
-        elif display:
-            display_type = resolve_display_type_from_inky_instance(display)
-            return jsonify(data=dict(type=display_type)), 200
-        else:
-            return jsonify(message="No display detected", data=dict(type=None)), 200
+        # The display is probed for once at start up, the result of that probe is returned
+        return detection_response(get_display_detection())
     except Exception as err:
         logger.exception(err)
         logger.error(f"Failed to detect display: {err}")
         return error_response("Failed to detect a valid display", err)
 
 
+@settings_api.route("/detect-display", methods=["POST"])
+def redetect_display():
+    try:
+        # Probe for the display again, e.g. after it has been swapped, the display settings are left as they are
+        return detection_response(get_display_detection(force=True))
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to detect display: {err}")
+        return error_response("Failed to detect a valid display", err)
+
+
+def detection_response(detection: DisplayDetection):
+    probe = dict(probe_ms=round(detection.probe_seconds * 1000, 1), probed_at=detection.probed_at)
+    if detection.unsupported:
+        ## Handle unsupported display first
+        return jsonify(
+            message="Your display is not supported", data=dict(type=DetectionError.UNSUPPORTED, **probe)
+        ), 200
+    elif detection.display_type:
+        return jsonify(data=dict(type=detection.display_type, **probe)), 200
+    else:
+        return jsonify(message="No display detected", data=dict(type=None, **probe)), 200
+
+
 @settings_api.route("/current-image", methods=["GET"])
 @inject
 def get_current_image(display_settings_service: DisplaySettingsService = Provide[Container.display_settings_service]):
     try:
         active_worker: DisplayWorkerAbstract | None = display_settings_service.active_worker
         if active_worker:
-            current_image = active_worker.get_current_image_in_base64()
-            return jsonify(data=dict(current_image=current_image)), 200
+            fingerprint = active_worker.get_current_image_fingerprint()
+            etag = active_worker.get_current_image_etag()
+            if etag and request.if_none_match.contains(etag):
+                # The client already has the image, so there is no need to encode it again
+                response = make_response("", 304)
+            else:
+                current_image = active_worker.get_current_image_in_base64()
+                response = make_response(
+                    jsonify(data=dict(current_image=current_image, fingerprint=fingerprint and fingerprint.identity))
+                )
+            if etag:
+                response.set_etag(etag)
+            return response
         else:
-            return jsonify(message="Unable to get currently displayed image", data=dict(current_image=None)), 200
+            return (
+                jsonify(
+                    message="Unable to get currently displayed image", data=dict(current_image=None, fingerprint=None)
+                ),
+                200,
+            )
     except Exception as err:
         logger.exception(err)
         logger.error(f"Error attempting to get currently displayed image: {err}")
         return error_response("Error attempting to get currently displayed image", err)
+
+
+@settings_api.route("/current-image.png", methods=["GET"])
+@inject
+def get_current_image_png(
+    display_settings_service: DisplaySettingsService = Provide[Container.display_settings_service],
+):
+    # The frame on the display as a PNG, encoded once per refresh, the JSON /current-image remains for compatibility
+    try:
+        active_worker: DisplayWorkerAbstract | None = display_settings_service.active_worker
+        panel_frame_png = active_worker.get_panel_frame_png() if active_worker else None
+        if panel_frame_png is None:
+            return error_response("Unable to get currently displayed image", ValueError("No image displayed"), 404)
+
+        etag, png = panel_frame_png
+        response = Response(png, mimetype="image/png")
+        response.set_etag(etag)
+        # Browsers must check the image is still current before using their copy
+        response.cache_control.no_cache = True
+        # Answers conditional requests for the current frame with 304
+        return response.make_conditional(request)
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Error attempting to get currently displayed image: {err}")
+        return error_response("Error attempting to get currently displayed image", err)
+
+
+@settings_api.route("/refresh-stats", methods=["GET"])
+@inject
+def get_refresh_stats(display_settings_service: DisplaySettingsService = Provide[Container.display_settings_service]):
+    try:
+        active_worker: DisplayWorkerAbstract | None = display_settings_service.active_worker
+        if active_worker:
+            return jsonify(data=dict(worker=active_worker.worker_name, **active_worker.get_refresh_stats())), 200
+        else:
+            return jsonify(message="No display mode is running", data=None), 200
+    except Exception as err:
+        logger.error(f"Failed to get display refresh stats: {err}")
+        return error_response("Error retrieving display refresh stats", err)
@@ -1,21 +1,39 @@
-from dependency_injector.wiring import inject, Provide
-from flask import Blueprint, jsonify, request
+from dependency_injector.wiring import Provide, inject
+from flask import Blueprint, Response, jsonify, request
 
 from backend.lib.container import Container
-from backend.lib.error_response import error_response
+from backend.lib.error_response import error_response, retry_later_response
+from backend.lib.image_upload import ImageTooLargeError, ImageUpload, read_body, read_multipart_file
+from backend.lib.image_validation import MAX_IMAGE_KB
 from backend.lib.logger_setup import logger
+from backend.lib.render_executor import RenderQueueFullError
 from backend.lib.validator import validate_request
-from backend.models.slideshow_model import SlideshowConfiguration
+from backend.models.slideshow_model import SlideshowConfiguration, SlideshowImageCreate, SlideshowOrder, SlideshowUpdate
 from backend.services.slideshow_service import SlideshowService
 
 slideshow_api = Blueprint("slideshow", __name__)
 
+# Allowance for the boundaries and headers of a multipart upload, on top of the image itself
+MULTIPART_OVERHEAD = 16 * 1024
+# Bounds of the thumbnail size in pixels, thumbnails fit within a square of this size
+DEFAULT_THUMBNAIL_SIZE = 256
+MIN_THUMBNAIL_SIZE = 16
+MAX_THUMBNAIL_SIZE = 1024
+# Thumbnails are keyed by the hash of the image, so the same URL always returns the same thumbnail
+THUMBNAIL_MAX_AGE = 7 * 24 * 60 * 60
+
+
+@inject
+def image_validation_context(slideshow_service: SlideshowService = Provide[Container.slideshow_service]) -> dict:
+    # Images sent in a request are validated against the resolution of the configured display
+    return {"display_resolution": slideshow_service.display_resolution()}
+
 
 @slideshow_api.route("/slideshow", methods=["GET"])
 @inject
 def get_slideshow(slideshow_service: SlideshowService = Provide[Container.slideshow_service]):
     try:
-        current_slideshow_configuration = slideshow_service.slideshow_configuration
+        current_slideshow_configuration = slideshow_service.get_slideshow_configuration()
         if current_slideshow_configuration:
             return jsonify(data=current_slideshow_configuration.model_dump()), 200
         else:
@@ -27,17 +45,172 @@ def get_slideshow(slideshow_service: SlideshowService = Provide[Container.slides
 
 
 @slideshow_api.route("/slideshow", methods=["POST"])
-@validate_request(SlideshowConfiguration)
+@validate_request(SlideshowConfiguration, image_validation_context)
 @inject
-def set_slideshow(slideshow_service: SlideshowService = Provide[Container.slideshow_service]):
+def set_slideshow(
+    slideshow_configuration: SlideshowConfiguration,
+    slideshow_service: SlideshowService = Provide[Container.slideshow_service],
+):
     try:
-        req = request.get_json()
-        logger.debug(f"POST /slideshow: {req}")
-        # req is a valid slideshow configuration
-        slideshow_configuration = SlideshowConfiguration(**req)
+        logger.debug(
+            f"POST /slideshow: {len(slideshow_configuration.images)} images, "
+            f"delay {slideshow_configuration.change_delay} seconds"
+        )
         slideshow_service.update_slideshow(slideshow_configuration)
-        return jsonify(message="Slideshow should now be updating", data=dict(success=True)), 200
+        return jsonify(message="Slideshow should now be updating", data={"success": True}), 200
     except Exception as err:
         logger.exception(err)
         logger.error(f"Failed to update slideshow: {err}")
         return error_response("Failed to update slideshow", err)
+
+
+@slideshow_api.route("/slideshow", methods=["PATCH"])
+@validate_request(SlideshowUpdate)
+@inject
+def update_slideshow(
+    slideshow_update: SlideshowUpdate,
+    slideshow_service: SlideshowService = Provide[Container.slideshow_service],
+):
+    try:
+        slideshow_service.update_slideshow_settings(slideshow_update)
+        return jsonify(message="Slideshow updated", data={"success": True}), 200
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to update slideshow: {err}")
+        return error_response("Failed to update slideshow", err)
+
+
+@slideshow_api.route("/slideshow/images", methods=["GET"])
+@inject
+def get_slideshow_images(slideshow_service: SlideshowService = Provide[Container.slideshow_service]):
+    try:
+        # The ids and details of the images in order, without the images themselves
+        images = [image.model_dump() for image in slideshow_service.slideshow.images]
+        return jsonify(data=images), 200
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to get slideshow images: {err}")
+        return error_response("Error retrieving slideshow images", err)
+
+
+@slideshow_api.route("/slideshow/images", methods=["POST"])
+@validate_request(SlideshowImageCreate, image_validation_context)
+@inject
+def add_slideshow_image(
+    slideshow_image: SlideshowImageCreate,
+    slideshow_service: SlideshowService = Provide[Container.slideshow_service],
+):
+    try:
+        image = slideshow_service.add_image(slideshow_image.image)
+        return jsonify(message="Image added to slideshow", data=image.model_dump()), 200
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to add image to slideshow: {err}")
+        return error_response("Failed to add image to slideshow", err)
+
+
+@slideshow_api.route("/slideshow/images/upload", methods=["POST"])
+@inject
+def upload_slideshow_image(slideshow_service: SlideshowService = Provide[Container.slideshow_service]):
+    """
+    Adds an image to the end of the slideshow, sent either as the raw request body or as the file of a
+    multipart/form-data body. The image is streamed into the image store as it arrives and checked on the way.
+    """
+    max_bytes = MAX_IMAGE_KB * 1024
+    try:
+        if request.content_length is not None and request.content_length > max_bytes + MULTIPART_OVERHEAD:
+            # Reject the upload before any of it is read
+            raise ImageTooLargeError(f"Image is greater than {MAX_IMAGE_KB} KB")
+
+        if request.mimetype == "multipart/form-data":
+            boundary = request.mimetype_params.get("boundary")
+            if not boundary:
+                raise ValueError("Multipart upload has no boundary")
+            chunks = read_multipart_file(request.stream, boundary)
+        else:
+            chunks = read_body(request.stream)
+
+        image = slideshow_service.add_uploaded_image(ImageUpload(chunks, max_bytes))
+        return jsonify(message="Image added to slideshow", data=image.model_dump()), 200
+    except ImageTooLargeError as err:
+        logger.error(f"Rejected image upload: {err}")
+        return error_response("Image is too large", err, 413)
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to upload image to slideshow: {err}")
+        return error_response("Failed to upload image to slideshow", err)
+
+
+@slideshow_api.route("/slideshow/images/<image_id>", methods=["DELETE"])
+@inject
+def remove_slideshow_image(image_id: str, slideshow_service: SlideshowService = Provide[Container.slideshow_service]):
+    try:
+        slideshow_service.remove_image(image_id)
+        return jsonify(message="Image removed from slideshow", data={"success": True}), 200
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to remove image from slideshow: {err}")
+        return error_response("Failed to remove image from slideshow", err)
+
+
+@slideshow_api.route("/slideshow/images/<image_id>/thumbnail", methods=["GET"])
+@inject
+def get_slideshow_image_thumbnail(
+    image_id: str, slideshow_service: SlideshowService = Provide[Container.slideshow_service]
+):
+    try:
+        size = request.args.get("size", DEFAULT_THUMBNAIL_SIZE, type=int)
+        if not MIN_THUMBNAIL_SIZE <= size <= MAX_THUMBNAIL_SIZE:
+            raise ValueError(f"Thumbnail size must be between {MIN_THUMBNAIL_SIZE} and {MAX_THUMBNAIL_SIZE}")
+        rendition_key, thumbnail = slideshow_service.get_thumbnail(image_id, size)
+        response = Response(thumbnail, mimetype="image/jpeg")
+        response.set_etag(rendition_key)
+        response.cache_control.max_age = THUMBNAIL_MAX_AGE
+        return response.make_conditional(request)
+    except RenderQueueFullError as err:
+        logger.error(f"Refused to render slideshow image thumbnail: {err}")
+        return retry_later_response("Too busy to render the slideshow image thumbnail", err, err.retry_after)
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to get slideshow image thumbnail: {err}")
+        return error_response("Failed to get slideshow image thumbnail", err)
+
+
+@slideshow_api.route("/slideshow/images/<image_id>/preview", methods=["GET"])
+@inject
+def get_slideshow_image_preview(
+    image_id: str, slideshow_service: SlideshowService = Provide[Container.slideshow_service]
+):
+    """
+    The image as it would be shown on the display with the current display settings and fit mode.
+    """
+    try:
+        rendition_key, preview = slideshow_service.get_preview(image_id)
+        response = Response(preview, mimetype="image/png")
+        response.set_etag(rendition_key)
+        # The preview changes with the display settings, so it must be revalidated each time it is used
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except RenderQueueFullError as err:
+        logger.error(f"Refused to render slideshow image preview: {err}")
+        return retry_later_response("Too busy to render the slideshow image preview", err, err.retry_after)
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to get slideshow image preview: {err}")
+        return error_response("Failed to get slideshow image preview", err)
+
+
+@slideshow_api.route("/slideshow/images/order", methods=["PUT"])
+@validate_request(SlideshowOrder)
+@inject
+def reorder_slideshow_images(
+    slideshow_order: SlideshowOrder,
+    slideshow_service: SlideshowService = Provide[Container.slideshow_service],
+):
+    try:
+        slideshow_service.reorder_images(slideshow_order.ids)
+        return jsonify(message="Slideshow images reordered", data={"success": True}), 200
+    except Exception as err:
+        logger.exception(err)
+        logger.error(f"Failed to reorder slideshow images: {err}")
+        return error_response("Failed to reorder slideshow images", err)
@@ -1,10 +1,13 @@
 from dependency_injector.wiring import inject, Provide
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify
 
-from backend.lib.display_utilis import construct_palette, resolve_display_from_settings
-from backend.lib.error_response import error_response
-from backend.lib.image_utilis import base64_to_pil_image, dither, pil_image_to_base64
+from backend.lib.dither_cache import DitherCache
+from backend.lib.display_profile import resolve_profile_from_settings
+from backend.lib.error_response import error_response, retry_later_response
+from backend.lib.fingerprint import base64_content_hash
+from backend.lib.image_utilis import dithers_in_parallel
 from backend.lib.logger_setup import logger
+from backend.lib.render_executor import RenderExecutor, RenderQueueFullError, dither_job
 from backend.lib.validator import validate_request
 from backend.models.image_dither_model import ImageDither
 from backend.services.settings_service import DisplaySettingsService
@@ -15,27 +18,54 @@ utils_api = Blueprint("utils", __name__)
 @utils_api.route("/utils/dither", methods=["POST"])
 @validate_request(ImageDither)
 @inject
-def dither_image(display_settings_service: DisplaySettingsService = Provide["display_settings_service"]):
+def dither_image(
+    image_dither: ImageDither,
+    display_settings_service: DisplaySettingsService = Provide["display_settings_service"],
+    dither_cache: DitherCache = Provide["dither_cache"],
+    render_executor: RenderExecutor = Provide["render_executor"],
+):
     try:
-        req = request.get_json()
-
-        # Extract the display type and its supported palette from the display settings
+        # Look up the resolution and palette of the display from the display settings
         display_settings = display_settings_service.display_settings
-        display = resolve_display_from_settings(display_settings)
-        # Construct a palette to apply in the dithering process
-        palette: list[int] = construct_palette(display)
+        display_profile = resolve_profile_from_settings(display_settings)
+        # The palette to apply in the dithering process
+        palette: list[int] = list(display_profile.palette)
 
-        base64_image = ImageDither(**req).image
-        image_to_dither = base64_to_pil_image(base64_image)
-        logger.info(f"image_to_dither format {image_to_dither.format}")
+        # Use the requested dither algorithm, otherwise fall back to the one chosen for the display
+        dither_algorithm = image_dither.algorithm or display_settings.dither_algorithm
+        parallel = display_settings.parallel_dithering if image_dither.parallel is None else image_dither.parallel
 
-        # Dither the image and return it as base64
-        dithered_image = dither(image_to_dither, palette)
-        logger.info(f"dithered_image format {dithered_image.format}")
-        dithered_image_base64 = pil_image_to_base64(dithered_image)
+        # The same image dithered against the same palette is returned from the cache without decoding it
+        dither_key = DitherCache.dither_key(base64_content_hash(image_dither.image), palette, dither_algorithm)
+        dithered_image_base64 = dither_cache.get(dither_key)
+        if dithered_image_base64 is None:
+            # Decoded and dithered in the render executor, rather than in the thread serving the request
+            dithered_image_base64 = render_executor.submit(
+                dither_job,
+                image_dither.image,
+                display_profile.resolution,
+                palette,
+                dither_algorithm,
+                parallel,
+                in_process=dithers_in_parallel(dither_algorithm, parallel),
+            ).result()
+            dither_cache.put(dither_key, dithered_image_base64)
 
         return jsonify(message="Dither done", data=dict(image=dithered_image_base64)), 200
+    except RenderQueueFullError as err:
+        logger.error(f"Refused to dither image: {err}")
+        return retry_later_response("Too busy to dither the image", err, err.retry_after)
     except Exception as err:
         logger.exception(err)
         logger.error(f"Failed to dither image: {err}")
         return error_response("Error dithering the image", err)
+
+
+@utils_api.route("/utils/dither/stats", methods=["GET"])
+@inject
+def get_dither_cache_stats(dither_cache: DitherCache = Provide["dither_cache"]):
+    try:
+        return jsonify(data=dither_cache.get_stats()), 200
+    except Exception as err:
+        logger.error(f"Failed to get dither cache stats: {err}")
+        return error_response("Error retrieving dither cache stats", err)
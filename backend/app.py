@@ -9,6 +9,7 @@ from backend.api.settings_api import settings_api
 from backend.api.slideshow_api import slideshow_api
 from backend.api.utils_api import utils_api
 from backend.lib.ascii import print_logo
+from backend.lib import parallel_dithering
 from backend.lib.container import Container
 from backend.lib.logger_setup import setup_inky_logger, logger
 
@@ -63,9 +64,14 @@ Container.initialise_singletons(container)
 
 
 def thread_shutdown_handler(signum, frame):
-    # Ensure threads are stopped when the application exits or restarts
+    # Ensure threads are stopped when the application exits or restarts, settings updates are stopped first so they
+    # cannot restart a worker
+    container.settings_dispatcher().stop()
     container.slideshow_worker().shutdown(signum, frame)
     container.image_feed_worker().shutdown(signum, frame)
+    container.render_executor().shutdown()
+    parallel_dithering.shutdown()
+    container.state_store().close()
 
 
 signal.signal(signal.SIGTERM, thread_shutdown_handler)
@@ -1,3 +1,11 @@
+from backend.lib.dither_cache import DitherCache
+from backend.lib.feed_client import FeedClient
+from backend.lib.frame_cache import FrameCache
+from backend.lib.image_store import ImageStore
+from backend.lib.render_executor import RenderExecutor
+from backend.lib.rendition_cache import RenditionCache
+from backend.lib.settings_dispatcher import SettingsDispatcher
+from backend.lib.state_store import StateStore
 from backend.services.image_feed_service import ImageFeedService
 from backend.workers.image_feed_worker import ImageFeedWorker
 from backend.workers.slideshow_worker import SlideshowWorker
@@ -16,8 +24,20 @@ class Container(containers.DeclarativeContainer):
     """
     wiring_config = containers.WiringConfiguration(packages=["backend.api", "backend.services"])
 
-    slideshow_worker = providers.ThreadSafeSingleton(SlideshowWorker)
-    image_feed_worker = providers.ThreadSafeSingleton(ImageFeedWorker)
+    frame_cache = providers.ThreadSafeSingleton(FrameCache)
+    image_store = providers.ThreadSafeSingleton(ImageStore)
+    rendition_cache = providers.ThreadSafeSingleton(RenditionCache)
+    dither_cache = providers.ThreadSafeSingleton(DitherCache)
+    render_executor = providers.ThreadSafeSingleton(RenderExecutor)
+    state_store = providers.ThreadSafeSingleton(StateStore)
+    settings_dispatcher = providers.ThreadSafeSingleton(SettingsDispatcher)
+    slideshow_worker = providers.ThreadSafeSingleton(
+        SlideshowWorker, frame_cache=frame_cache, image_store=image_store, render_executor=render_executor
+    )
+    feed_client = providers.ThreadSafeSingleton(FeedClient)
+    image_feed_worker = providers.ThreadSafeSingleton(
+        ImageFeedWorker, feed_client=feed_client, render_executor=render_executor
+    )
     display_settings_service = providers.ThreadSafeSingleton(DisplaySettingsService)
     slideshow_service = providers.ThreadSafeSingleton(SlideshowService)
     image_feed_service = providers.ThreadSafeSingleton(ImageFeedService)
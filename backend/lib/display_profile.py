@@ -0,0 +1,133 @@
+"""
+What image code needs to know about each display, without instantiating the Inky driver for it. Drivers are only
+created to drive the panel itself, reading their resolution and palette does not need one.
+
+The values mirror the drivers, test_display_profile checks them against the drivers.
+"""
+
+from dataclasses import dataclass
+
+from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings, DisplayType
+
+# Two and three colour pHAT and wHAT palettes, ordered white, black, colour
+MONO_PALETTE = (255, 255, 255, 0, 0, 0)
+RED_PALETTE = (*MONO_PALETTE, 255, 0, 0)
+YELLOW_PALETTE = (*MONO_PALETTE, 255, 255, 0)
+# The remaining palettes are those the drivers blend at a saturation of 0.5, ordered as their colour constants
+RED_YELLOW_PALETTE = (6, 6, 6, 163, 163, 163, 168, 158, 5, 148, 6, 5)
+SEVEN_COLOUR_PALETTE = (
+    (28, 24, 28)
+    + (255, 255, 255)
+    + (29, 173, 35)
+    + (30, 29, 174)
+    + (205, 36, 37)
+    + (231, 222, 35)
+    + (216, 123, 36)
+    + (255, 255, 255)
+)
+IMPRESSION_7_PALETTE = (
+    (0, 0, 0)
+    + (236, 248, 255)
+    + (1, 189, 38)
+    + (13, 23, 226)
+    + (250, 40, 17)
+    + (255, 255, 34)
+    + (247, 130, 22)
+    + (255, 255, 255)
+)
+SPECTRA_PALETTE = (0, 0, 0) + (208, 209, 210) + (231, 222, 35) + (205, 36, 37) + (30, 29, 174) + (29, 173, 35)
+
+# Palettes of the displays that take their colour from the settings
+COLOUR_PALETTES = {
+    ColourPalette.BLACK: MONO_PALETTE,
+    ColourPalette.RED: RED_PALETTE,
+    ColourPalette.YELLOW: YELLOW_PALETTE,
+}
+
+
+@dataclass(frozen=True)
+class DisplayProfile:
+    type: DisplayType
+    resolution: tuple[int, int]
+    colour_palette: ColourPalette
+    # Flattened RGB colours of the palette, [r, g, b, r, g, b, ...]
+    palette: tuple[int, ...]
+    # Palette indices of the inks
+    white: int
+    black: int
+    red: int
+    # The pHATs, which are too small for the full size placeholder
+    small: bool
+    # Border colour index the display is given for a white and a black border
+    white_border: int
+    black_border: int
+
+    @property
+    def width(self) -> int:
+        return self.resolution[0]
+
+    @property
+    def height(self) -> int:
+        return self.resolution[1]
+
+    def border_index(self, border_colour: BorderColour) -> int:
+        return self.black_border if border_colour == BorderColour.BLACK else self.white_border
+
+
+def colour_profiles(
+    display_type: DisplayType, resolution: tuple[int, int], small: bool, white_border: int, black_border: int
+) -> list[DisplayProfile]:
+    # Profiles of a two or three colour display for each of its colours, the inks are white, black and colour
+    return [
+        DisplayProfile(display_type, resolution, colour_palette, palette, 0, 1, 2, small, white_border, black_border)
+        for colour_palette, palette in COLOUR_PALETTES.items()
+    ]
+
+
+def fixed_profile(
+    display_type: DisplayType,
+    resolution: tuple[int, int],
+    colour_palette: ColourPalette,
+    palette: tuple[int, ...],
+    red: int,
+    small: bool = False,
+) -> DisplayProfile:
+    # Profile of a display with a single palette, whatever colour is chosen in the settings, black is ink 0 and white
+    # ink 1
+    return DisplayProfile(display_type, resolution, colour_palette, palette, 1, 0, red, small, 1, 0)
+
+
+DISPLAY_PROFILES: dict[tuple[DisplayType, ColourPalette], DisplayProfile] = {
+    (profile.type, profile.colour_palette): profile
+    for profile in [
+        *colour_profiles(DisplayType.PHAT_104, (212, 104), True, 0, 1),
+        *colour_profiles(DisplayType.PHAT_122, (250, 122), True, 0, 1),
+        *colour_profiles(DisplayType.WHAT_300, (400, 300), False, 1, 0),
+        *colour_profiles(DisplayType.WHAT_V2_300, (400, 300), False, 1, 0),
+        fixed_profile(
+            DisplayType.PHAT_RED_YELLOW_122, (250, 122), ColourPalette.RED_YELLOW, RED_YELLOW_PALETTE, 3, True
+        ),
+        fixed_profile(DisplayType.WHAT_RED_YELLOW_300, (400, 300), ColourPalette.RED_YELLOW, RED_YELLOW_PALETTE, 3),
+        fixed_profile(DisplayType.IMPRESSION_400, (640, 400), ColourPalette.SEVEN_COLOUR, SEVEN_COLOUR_PALETTE, 4),
+        fixed_profile(DisplayType.IMPRESSION_448, (600, 448), ColourPalette.SEVEN_COLOUR, SEVEN_COLOUR_PALETTE, 4),
+        fixed_profile(DisplayType.IMPRESSION_480, (800, 480), ColourPalette.SEVEN_COLOUR, IMPRESSION_7_PALETTE, 4),
+        fixed_profile(DisplayType.SPECTRA_400, (600, 400), ColourPalette.SPECTRA, SPECTRA_PALETTE, 3),
+        fixed_profile(DisplayType.SPECTRA_480, (800, 480), ColourPalette.SPECTRA, SPECTRA_PALETTE, 3),
+        fixed_profile(DisplayType.SPECTRA_1200, (1600, 1200), ColourPalette.SPECTRA, SPECTRA_PALETTE, 3),
+    ]
+}
+
+# Displays with a single palette, they ignore the colour chosen in the settings
+FIXED_PALETTES: dict[DisplayType, ColourPalette] = {
+    display_type: colour_palette
+    for display_type, colour_palette in DISPLAY_PROFILES
+    if colour_palette not in COLOUR_PALETTES
+}
+
+
+def resolve_profile_from_settings(display_settings: DisplaySettings) -> DisplayProfile:
+    colour_palette = FIXED_PALETTES.get(display_settings.type, display_settings.colour_palette)
+    profile = DISPLAY_PROFILES.get((display_settings.type, colour_palette))
+    if profile is None:
+        raise ValueError(f"Colour {colour_palette.value} is not supported by display {display_settings.type.value}")
+    return profile
@@ -1,108 +1,206 @@
-from inky import (
-    auto,
-    InkyPHAT,
-    InkyPHAT_SSD1608,
-    Inky7Colour,
-    Inky_Impressions_7,
-    InkyWHAT,
-    InkyWHAT_SSD1683,
-    InkyE673,
-    InkyEL133UF1,
-)
-
-from inky.inky_e640 import Inky as InkyE640
-from inky.inky_jd79661 import Inky as InkyPHAT_JD79661  # red/yellow wHAT
-from inky.inky_jd79668 import Inky as InkyWHAT_JD79668  # red/yellow wHAT
+import importlib
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from backend.lib.display_profile import DISPLAY_PROFILES, FIXED_PALETTES
 from backend.lib.logger_setup import logger
-from backend.models.display_model import DisplaySettings, DisplayType, ColourPalette, DetectionError
-
-InkyDisplay = (
-    InkyPHAT  # Original pHAT (212 x 104)
-    | InkyPHAT_SSD1608  # pHAT v2 (250 x 122)
-    | InkyPHAT_JD79661  # pHAT v3 (red/yellow)
-    | InkyWHAT  # Original wHAT
-    | InkyWHAT_SSD1683  # wHAT v2
-    | InkyWHAT_JD79668  # wHAT v3 (red/yellow)
-    | Inky7Colour  # Inky Impression 4" & 5.7" v1
-    | Inky_Impressions_7  # Inky Impressions 7.3" v1
-    | InkyE640  # Inky Impression 4" v2 (Spectra)
-    | InkyE673  # Inky Impression 7.3" v2 (Spectra)
-    | InkyEL133UF1  # Inky Impression 13.3" (Spectra)
-)
-
-
-def detect_inky_display() -> InkyDisplay | DetectionError | None:
-    display: InkyDisplay | DetectionError | None = None
+from backend.models.display_model import ColourPalette, DisplaySettings, DisplayType
+
+if TYPE_CHECKING:
+    from inky import (
+        Inky7Colour,
+        Inky_Impressions_7,
+        InkyE673,
+        InkyEL133UF1,
+        InkyPHAT,
+        InkyPHAT_SSD1608,
+        InkyWHAT,
+        InkyWHAT_SSD1683,
+    )
+    from inky.eeprom import EPDType
+    from inky.inky_e640 import Inky as InkyE640
+    from inky.inky_jd79661 import Inky as InkyPHAT_JD79661  # red/yellow wHAT
+    from inky.inky_jd79668 import Inky as InkyWHAT_JD79668  # red/yellow wHAT
+
+    InkyDisplay = (
+        InkyPHAT  # Original pHAT (212 x 104)
+        | InkyPHAT_SSD1608  # pHAT v2 (250 x 122)
+        | InkyPHAT_JD79661  # pHAT v3 (red/yellow)
+        | InkyWHAT  # Original wHAT
+        | InkyWHAT_SSD1683  # wHAT v2
+        | InkyWHAT_JD79668  # wHAT v3 (red/yellow)
+        | Inky7Colour  # Inky Impression 4" & 5.7" v1
+        | Inky_Impressions_7  # Inky Impressions 7.3" v1
+        | InkyE640  # Inky Impression 4" v2 (Spectra)
+        | InkyE673  # Inky Impression 7.3" v2 (Spectra)
+        | InkyEL133UF1  # Inky Impression 13.3" (Spectra)
+    )
+else:
+    # The drivers are imported when a display is first created, not when this module is
+    InkyDisplay = Any
+
+# The driver of each display type as its module and class, the inky package imports every driver so it is only
+# imported once a display is created
+DISPLAY_DRIVERS: dict[DisplayType, tuple[str, str]] = {
+    DisplayType.PHAT_104: ("inky.phat", "InkyPHAT"),
+    DisplayType.PHAT_122: ("inky.phat", "InkyPHAT_SSD1608"),
+    DisplayType.PHAT_RED_YELLOW_122: ("inky.inky_jd79661", "Inky"),
+    DisplayType.WHAT_300: ("inky.what", "InkyWHAT"),
+    DisplayType.WHAT_V2_300: ("inky.inky_ssd1683", "Inky"),
+    DisplayType.WHAT_RED_YELLOW_300: ("inky.inky_jd79668", "Inky"),
+    DisplayType.IMPRESSION_400: ("inky.inky_uc8159", "Inky"),
+    DisplayType.IMPRESSION_448: ("inky.inky_uc8159", "Inky"),
+    DisplayType.IMPRESSION_480: ("inky.inky_ac073tc1a", "Inky"),
+    DisplayType.SPECTRA_400: ("inky.inky_e640", "Inky"),
+    DisplayType.SPECTRA_480: ("inky.inky_e673", "Inky"),
+    DisplayType.SPECTRA_1200: ("inky.inky_el133uf1", "Inky"),
+}
+
+# Display variants are named in inky's table of them (inky.eeprom.DISPLAY_VARIANT) after the chip that drives them, e.g.
+# "Red wHAT (SSD1683)", apart from the original pHAT and wHAT
+VARIANT_CHIP = re.compile(r"\((\w+)\)")
+
+EEPROM_COLOURS: dict[str, ColourPalette] = {
+    "red": ColourPalette.RED,
+    "yellow": ColourPalette.YELLOW,
+    "black": ColourPalette.BLACK,
+}
+
+
+def load_driver(display_type: DisplayType) -> type:
+    module_name, class_name = DISPLAY_DRIVERS[display_type]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def load_drivers(*display_types: DisplayType) -> tuple[type, ...]:
+    # For isinstance checks against a display that was created, by when the drivers have already been imported
+    return tuple(load_driver(display_type) for display_type in display_types)
+
+
+def detect_inky_display() -> "EPDType | None":
+    # Reads the EEPROM of the display, without creating its driver
+    eeprom = None
     try:
-        # Try to auto-detect the Inky display first
-        display = auto(ask_user=False)
+        from inky.eeprom import read_eeprom
+
+        eeprom = read_eeprom()
     except Exception as e:
         logger.error(f"Could not auto detect Inky Device: {e}")
 
-    return display
+    return eeprom
+
+
+def driver_chip(display_type: DisplayType) -> str:
+    # The chip the driver of the display type drives, e.g. inky.inky_ssd1683 or InkyPHAT_SSD1608. The drivers of the
+    # original pHAT and wHAT are named after the board instead.
+    module_name, class_name = DISPLAY_DRIVERS[display_type]
+    return (class_name.partition("_")[2] or module_name.rpartition(".")[2].removeprefix("inky_")).lower()
+
+
+def resolve_display_type_from_variant(eeprom: "EPDType") -> DisplayType | None:
+    """
+    Finds the display type of the display variant stored in the EEPROM, by matching the chip inky names the variant
+    after to the chip of a driver. Display types with the same chip are told apart by their resolution.
+    """
+    from inky.eeprom import DISPLAY_VARIANT
+
+    variant = eeprom.display_variant
+    name = DISPLAY_VARIANT[variant] if 0 <= variant < len(DISPLAY_VARIANT) else None
+    if name is None:
+        return None
+    chip_match = VARIANT_CHIP.search(name)
+    chip = chip_match.group(1).lower() if chip_match else "phat" if "pHAT" in name else "what"
+
+    display_types = [display_type for display_type in DISPLAY_DRIVERS if driver_chip(display_type) == chip]
+    if len(display_types) > 1:
+        resolutions = {profile.type: profile.resolution for profile in DISPLAY_PROFILES.values()}
+        display_types = [
+            display_type for display_type in display_types if resolutions[display_type] == (eeprom.width, eeprom.height)
+        ]
+    return display_types[0] if len(display_types) == 1 else None
+
+
+def resolve_display_from_eeprom(eeprom: "EPDType") -> tuple[DisplayType, ColourPalette]:
+    display_type = resolve_display_type_from_variant(eeprom)
+    if display_type is None:
+        logger.error(f"Unsupported Inky display variant: {eeprom.display_variant}")
+        raise ValueError(f"Unsupported Inky display variant: {eeprom.display_variant}")
+    colour_palette = FIXED_PALETTES.get(display_type) or EEPROM_COLOURS.get(eeprom.get_color())
+    if (display_type, colour_palette) not in DISPLAY_PROFILES:
+        logger.error(f"Unsupported colour {eeprom.get_color()} for Inky display {display_type.value}")
+        raise ValueError(f"Unsupported colour {eeprom.get_color()} for Inky display {display_type.value}")
+    return display_type, colour_palette
+
+
+@dataclass(frozen=True)
+class DisplayDetection:
+    # The display found by probing for one, both None if none was found or it is not supported
+    display_type: DisplayType | None
+    colour_palette: ColourPalette | None
+    unsupported: bool
+    # How long the probe took, and when it finished as seconds since the epoch
+    probe_seconds: float
+    probed_at: float
+
+
+# Probing reads the EEPROM of the display over I2C, so it is done once and its result kept until a probe is forced
+_detection: DisplayDetection | None = None
+_detection_lock = threading.Lock()
+
+
+def get_display_detection(force: bool = False) -> DisplayDetection:
+    global _detection
+    with _detection_lock:
+        if _detection is None or force:
+            start = time.perf_counter()
+            eeprom = detect_inky_display()
+            display_type = colour_palette = None
+            unsupported = False
+            if eeprom is not None:
+                try:
+                    display_type, colour_palette = resolve_display_from_eeprom(eeprom)
+                except ValueError:
+                    unsupported = True
+            _detection = DisplayDetection(
+                display_type, colour_palette, unsupported, time.perf_counter() - start, time.time()
+            )
+            if unsupported:
+                found = "an unsupported display"
+            else:
+                found = display_type.value if display_type else "no display"
+            logger.info(f"Probed for an Inky display in {_detection.probe_seconds * 1000:.1f} ms, found {found}")
+        return _detection
+
+
+def create_detected_display(display_settings: DisplaySettings) -> InkyDisplay | None:
+    # Creates the driver for the detected display, from the last probe rather than probing again
+    detection = get_display_detection()
+    if detection.display_type is None:
+        return None
+    return resolve_display_from_settings(
+        display_settings.model_copy(update={"type": detection.display_type, "colour_palette": detection.colour_palette})
+    )
 
 
 def resolve_display_from_settings(display_settings: DisplaySettings) -> InkyDisplay:
-    if display_settings.type == DisplayType.PHAT_104:
-        return InkyPHAT(display_settings.colour_palette)
-    elif display_settings.type == DisplayType.PHAT_122:
-        return InkyPHAT_SSD1608(display_settings.colour_palette)
-    elif display_settings.type == DisplayType.PHAT_RED_YELLOW_122:
-        return InkyPHAT_JD79661()
-    elif display_settings.type == DisplayType.WHAT_300:
-        return InkyWHAT(display_settings.colour_palette)
-    elif display_settings.type == DisplayType.WHAT_V2_300:
-        return InkyWHAT_SSD1683(display_settings.colour_palette)
-    elif display_settings.type == DisplayType.WHAT_RED_YELLOW_300:
-        return InkyWHAT_JD79668()
-    elif display_settings.type == DisplayType.IMPRESSION_400:
-        return Inky7Colour(resolution=(640, 400))
-    elif display_settings.type == DisplayType.IMPRESSION_448:
-        return Inky7Colour(resolution=(600, 448))
-    elif display_settings.type == DisplayType.IMPRESSION_480:
-        return Inky_Impressions_7()
-    elif display_settings.type == DisplayType.SPECTRA_400:
-        return InkyE640()
-    elif display_settings.type == DisplayType.SPECTRA_480:
-        return InkyE673()
-    elif display_settings.type == DisplayType.SPECTRA_1200:
-        return InkyEL133UF1()
-    else:
+    if display_settings.type not in DISPLAY_DRIVERS:
         logger.error(f"Unsupported display type: {display_settings.type}")
         raise ValueError(f"Unsupported display type: {display_settings.type}")
 
-
-def resolve_display_type_from_inky_instance(inky_instance: InkyDisplay | DetectionError) -> DisplayType:
-    if isinstance(inky_instance, InkyPHAT) and inky_instance.resolution == (212, 104):
-        return DisplayType.PHAT_104
-    elif isinstance(inky_instance, InkyPHAT_SSD1608) and inky_instance.resolution == (250, 122):
-        return DisplayType.PHAT_122
-    elif isinstance(inky_instance, InkyPHAT_JD79661) and inky_instance.resolution == (250, 122):
-        return DisplayType.PHAT_RED_YELLOW_122
-    elif isinstance(inky_instance, InkyWHAT):
-        return DisplayType.WHAT_300
-    elif isinstance(inky_instance, InkyWHAT_SSD1683):
-        return DisplayType.WHAT_V2_300
-    elif isinstance(inky_instance, InkyWHAT_JD79668):
-        return DisplayType.WHAT_RED_YELLOW_300
-    elif isinstance(inky_instance, Inky7Colour) and inky_instance.resolution == (640, 400):
-        return DisplayType.IMPRESSION_400
-    elif isinstance(inky_instance, Inky7Colour) and inky_instance.resolution == (600, 448):
-        return DisplayType.IMPRESSION_448
-    elif isinstance(inky_instance, Inky_Impressions_7):
-        return DisplayType.IMPRESSION_480
-    elif isinstance(inky_instance, InkyE640):
-        return DisplayType.SPECTRA_400
-    elif isinstance(inky_instance, InkyE673):
-        return DisplayType.SPECTRA_480
-    elif isinstance(inky_instance, InkyEL133UF1):
-        return DisplayType.SPECTRA_1200
-    elif inky_instance == DetectionError.UNSUPPORTED:
-        logger.error("Unsupported Inky display instance")
-        raise ValueError("Unsupported Inky display instance")
+    driver = load_driver(display_settings.type)
+    if display_settings.type in (DisplayType.PHAT_104, DisplayType.PHAT_122, DisplayType.WHAT_300):
+        return driver(display_settings.colour_palette)
+    elif display_settings.type == DisplayType.WHAT_V2_300:
+        return driver(colour=display_settings.colour_palette)
+    elif display_settings.type == DisplayType.IMPRESSION_400:
+        return driver(resolution=(640, 400))
+    elif display_settings.type == DisplayType.IMPRESSION_448:
+        return driver(resolution=(600, 448))
     else:
-        logger.error(f"Unknown Inky display instance: {inky_instance}")
-        raise ValueError(f"Unknown Inky display instance: {inky_instance}")
+        return driver()
 
 
 def resolve_supported_palette_from_inky_instance(inky_instance: InkyDisplay) -> ColourPalette:
@@ -114,9 +212,11 @@ def resolve_supported_palette_from_inky_instance(inky_instance: InkyDisplay) ->
         palette = ColourPalette.BLACK
     elif inky_instance.colour == "red/yellow":
         palette = ColourPalette.RED_YELLOW
-    elif isinstance(inky_instance, Inky7Colour) or isinstance(inky_instance, Inky_Impressions_7):
+    elif isinstance(inky_instance, load_drivers(DisplayType.IMPRESSION_400, DisplayType.IMPRESSION_480)):
         palette = ColourPalette.SEVEN_COLOUR
-    elif isinstance(inky_instance, InkyE673 | InkyEL133UF1 | InkyE640):
+    elif isinstance(
+        inky_instance, load_drivers(DisplayType.SPECTRA_400, DisplayType.SPECTRA_480, DisplayType.SPECTRA_1200)
+    ):
         palette = ColourPalette.SPECTRA
     else:
         logger.error(f"Could not determine palette from Inky instance: {inky_instance}")
@@ -125,12 +225,17 @@ def resolve_supported_palette_from_inky_instance(inky_instance: InkyDisplay) ->
 
 
 def is_small_display(inky_instance: InkyDisplay) -> bool:
-    return isinstance(inky_instance, InkyPHAT | InkyPHAT_SSD1608 | InkyPHAT_JD79661)
+    return isinstance(
+        inky_instance, load_drivers(DisplayType.PHAT_104, DisplayType.PHAT_122, DisplayType.PHAT_RED_YELLOW_122)
+    )
 
 
 def construct_palette(inky_instance: InkyDisplay) -> list[int]:
     # Construct a palette
-    if isinstance(inky_instance, InkyPHAT | InkyPHAT_SSD1608 | InkyWHAT | InkyWHAT_SSD1683):
+    if isinstance(
+        inky_instance,
+        load_drivers(DisplayType.PHAT_104, DisplayType.PHAT_122, DisplayType.WHAT_300, DisplayType.WHAT_V2_300),
+    ):
         # Resolve the palette type, which is needed to determine the palette for 3 colour Inky pHAT/wHAT (red or yellow)
         palette_type: ColourPalette = resolve_supported_palette_from_inky_instance(inky_instance)
         palette = construct_phat_palette(palette_type)
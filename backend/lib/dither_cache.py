@@ -0,0 +1,71 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+from backend.lib.logger_setup import logger
+from backend.models.display_model import DitherAlgorithm
+
+
+def default_budget() -> int:
+    # Bytes of dithered images kept in memory, the least recently used are evicted beyond this
+    return int(os.getenv("DITHER_CACHE_MB", "32")) * 1024 * 1024
+
+
+@dataclass
+class DitherCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class DitherCache:
+    """
+    Size bounded in memory cache of dithered images, so the same image dithered against the same palette with the
+    same parameters is only dithered once. Entries are evicted least recently used first once they exceed the budget.
+    """
+
+    budget: int
+    stats: DitherCacheStats
+    # Dithered images in order of use, least recently used first
+    _entries: OrderedDict[str, str]
+    _size: int
+    _lock: threading.Lock
+
+    def __init__(self, budget: int | None = None):
+        self.budget = default_budget() if budget is None else budget
+        self.stats = DitherCacheStats()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def dither_key(source_key: str, palette: list[int], algorithm: DitherAlgorithm) -> str:
+        # Dithering in parallel gives the same result as on a single core, so it is not part of the key
+        palette_key = hashlib.blake2b(bytes(palette), digest_size=8).hexdigest()
+        return f"{source_key}_{palette_key}_{algorithm.value}"
+
+    def get(self, dither_key: str) -> str | None:
+        with self._lock:
+            dithered_image = self._entries.get(dither_key)
+            if dithered_image is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(dither_key)
+            self.stats.hits += 1
+            return dithered_image
+
+    def put(self, dither_key: str, dithered_image: str):
+        if len(dithered_image) > self.budget:
+            logger.debug(f"Dithered image is larger than the dither cache budget, not caching {dither_key}")
+            return
+        with self._lock:
+            self._size += len(dithered_image) - len(self._entries.pop(dither_key, ""))
+            self._entries[dither_key] = dithered_image
+            while self._size > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(**asdict(self.stats), entries=len(self._entries), size=self._size, budget=self.budget)
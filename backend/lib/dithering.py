@@ -0,0 +1,300 @@
+import functools
+from collections.abc import Callable, Iterator
+
+import numpy as np
+from PIL import Image
+
+from backend.lib.palette_lut import get_palette_lut, lookup_colour_indices
+from backend.models.display_model import DitherAlgorithm
+
+# Error diffusion kernels, each a list of (row offset, column offset, weight) and the divisor of the weights.
+# Floyd-Steinberg is not dithered by this engine, Pillow's C implementation is many times faster than a NumPy wavefront
+# (see image_utilis.quantize_image).
+ERROR_DIFFUSION_KERNELS: dict[DitherAlgorithm, tuple[list[tuple[int, int, int]], int]] = {
+    # Atkinson only diffuses 6/8 of the error, which gives it its higher contrast look
+    DitherAlgorithm.ATKINSON: ([(0, 1, 1), (0, 2, 1), (1, -1, 1), (1, 0, 1), (1, 1, 1), (2, 0, 1)], 8),
+    DitherAlgorithm.STUCKI: (
+        [
+            (0, 1, 8),
+            (0, 2, 4),
+            (1, -2, 2),
+            (1, -1, 4),
+            (1, 0, 8),
+            (1, 1, 4),
+            (1, 2, 2),
+            (2, -2, 1),
+            (2, -1, 2),
+            (2, 0, 4),
+            (2, 1, 2),
+            (2, 2, 1),
+        ],
+        42,
+    ),
+}
+
+# Error diffusion works in fixed point integers, this is the number of fractional bits kept for each channel value.
+# Integer arithmetic makes the result independent of the order in which errors are summed.
+FRACTION_BITS = 4
+
+# Number of rows processed at once by ordered dithering, this bounds the size of the temporary arrays
+ORDERED_CHUNK_ROWS = 64
+
+# Number of pixels in each band when dithering an image as a stream of bands, the number of rows in a band depends on
+# the width of the image. A band pixel takes 20 bytes of working memory: 12 in the fixed point work buffer, 4 in the
+# cropped band, 3 in its RGB array and 1 for its palette index, so a band takes about 10 MB. Every band restarts the
+# error diffusion wavefront, so smaller bands use less memory but take longer.
+STREAM_BAND_PIXELS = 1 << 19
+
+
+def create_ditherer(width: int, palette: list[int], algorithm: DitherAlgorithm) -> "BandDitherer":
+    if algorithm not in DITHERERS:
+        raise ValueError(f"{algorithm.value} is not dithered by the NumPy engine")
+    # Convert the palette from a flat list [r, g, b, r, g, b, ...] into rows of colours
+    palette_colours = np.array(palette, dtype=np.int32).reshape(-1, 3)
+    # Nearest palette colours are looked up from a precomputed table rather than searched for per pixel
+    lut = get_palette_lut(palette)
+    return DITHERERS[algorithm](width, palette_colours, lut)
+
+
+def dither(image: Image.Image, palette: list[int], algorithm: DitherAlgorithm) -> Image.Image:
+    rgb = np.asarray(image.convert("RGB"))
+    indices = create_ditherer(image.width, palette, algorithm).dither_band(rgb)
+
+    dithered_image = Image.frombytes("P", (image.width, image.height), indices.tobytes())
+    dithered_image.putpalette(palette)
+    return dithered_image
+
+
+def dither_bands(
+    image: Image.Image,
+    palette: list[int],
+    algorithm: DitherAlgorithm,
+    box: tuple[int, int, int, int] | None = None,
+    band_rows: int | None = None,
+) -> Iterator[np.ndarray]:
+    """
+    Dithers the region (left, top, right, bottom) of the image, yielding the palette indices one band of rows at a
+    time. Only a band is converted to RGB at once, so memory use is bounded by the band size rather than the image.
+    """
+    left, top, right, bottom = box or (0, 0, image.width, image.height)
+    band_rows = band_rows or max(1, STREAM_BAND_PIXELS // (right - left))
+    ditherer = create_ditherer(right - left, palette, algorithm)
+    for first_row in range(top, bottom, band_rows):
+        band = image.crop((left, first_row, right, min(first_row + band_rows, bottom)))
+        if band.mode != "RGB":
+            band = band.convert("RGB")
+        yield ditherer.dither_band(np.asarray(band))
+
+
+def wavefront_slope(kernel: list[tuple[int, int, int]]) -> int:
+    """
+    Error diffusion is sequential, a pixel can only be quantised once every pixel that diffuses error into it has
+    been. Pixels on the line x + slope * y = t only depend on pixels on earlier lines, so all the pixels on a line can
+    be processed at once, as long as the slope is steep enough that every kernel offset lands on a later line.
+    """
+    return max([(-column_offset) // row_offset + 1 for row_offset, column_offset, _ in kernel if row_offset > 0] + [1])
+
+
+class ErrorDiffusion:
+    """
+    Error diffuses an image one band of rows at a time. The error diffused past the bottom of a band is carried into
+    the next band, so dithering an image in bands gives exactly the same result as dithering it whole.
+    """
+
+    def __init__(self, width: int, palette_colours: np.ndarray, lut: np.ndarray, algorithm: DitherAlgorithm):
+        kernel, self.divisor = ERROR_DIFFUSION_KERNELS[algorithm]
+        self.kernel = kernel
+        self.width = width
+        self.lut = lut
+        self.slope = wavefront_slope(kernel)
+        # Pad the work buffer so error diffused past the edges of the image lands in the padding and is discarded
+        self.pad_columns = max(abs(column_offset) for _, column_offset, _ in kernel)
+        self.pad_rows = max(row_offset for row_offset, _, _ in kernel)
+        self.stride = width + 2 * self.pad_columns
+        self.palette_fixed = palette_colours << FRACTION_BITS
+        self.offsets = [
+            (row_offset * self.stride + column_offset, weight) for row_offset, column_offset, weight in kernel
+        ]
+        self.weights = sorted({weight for _, _, weight in kernel})
+        # Error that has been diffused into the rows below the last band
+        self.carry = np.zeros((self.pad_rows, self.stride, 3), dtype=np.int32)
+        # The work buffer is allocated for the first band and reused by the bands after it, which are never taller
+        self.work: np.ndarray | None = None
+
+    def dither_band(self, rgb: np.ndarray) -> np.ndarray:
+        height = rgb.shape[0]
+        if self.work is None or self.work.shape[0] < height + self.pad_rows:
+            self.work = np.zeros((height + self.pad_rows, self.stride, 3), dtype=np.int32)
+        work = self.create_work(rgb, out=self.work[: height + self.pad_rows])
+        work[: self.pad_rows] += self.carry
+        indices = np.zeros(height * self.width, dtype=np.uint8)
+
+        self.diffuse_lines(work.reshape(-1, 3), indices, range(self.line_count(height)), (0, height))
+
+        self.carry = work[height:].copy()
+        return indices.reshape(height, self.width)
+
+    def create_work(self, rgb: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Builds the padded fixed point work buffer the error is diffused through. The RGB values are converted in place
+        in the buffer, so no fixed point copy of the image is made. Error diffused into the padding is never read, but
+        the rows below the image are cleared as they carry error into the next band.
+        """
+        height = rgb.shape[0]
+        work = np.zeros((height + self.pad_rows, self.stride, 3), dtype=np.int32) if out is None else out
+        image_columns = work[:height, self.pad_columns : self.pad_columns + self.width]
+        image_columns[...] = rgb
+        image_columns <<= FRACTION_BITS
+        work[height:] = 0
+        return work
+
+    def line_count(self, height: int) -> int:
+        # Number of wavefront lines needed to cover an image of the given height
+        return self.width + self.slope * (height - 1)
+
+    def line_reach(self) -> int:
+        # How many lines ahead of its own line a pixel diffuses error
+        return max(column_offset + self.slope * row_offset for row_offset, column_offset, _ in self.kernel)
+
+    def diffuse_lines(self, flat_work: np.ndarray, indices: np.ndarray, lines: range, rows: tuple[int, int]):
+        """
+        Quantises the pixels on the given wavefront lines, within rows [first, last), of a flattened work buffer and
+        diffuses their error. The quantised palette indices are written to the flattened indices array.
+        """
+        width, slope, pad_columns, divisor = self.width, self.slope, self.pad_columns, self.divisor
+        # When the image is narrower than the slope each line holds a single pixel, so any positive step will do
+        work_step = max(self.stride - slope, 1)
+        indices_step = max(width - slope, 1)
+        rounding = 1 << (FRACTION_BITS - 1)
+
+        for line in lines:
+            # The first and last row that intersect this line inside the rows
+            first_row = max(rows[0], -((width - 1 - line) // slope))
+            last_row = min(rows[1] - 1, line // slope)
+            if first_row > last_row:
+                continue
+            start = first_row * work_step + line + pad_columns
+            stop = last_row * work_step + line + pad_columns + 1
+
+            values = flat_work[start:stop:work_step]
+            colours = np.clip((values + rounding) >> FRACTION_BITS, 0, 255)
+            line_indices = lookup_colour_indices(colours, self.lut)
+            indices[first_row * indices_step + line : last_row * indices_step + line + 1 : indices_step] = line_indices
+
+            # Diffuse the quantisation error, rounded to the nearest fixed point value, into the neighbouring pixels
+            error = values - self.palette_fixed[line_indices]
+            diffused_errors = {weight: (error * weight + divisor // 2) // divisor for weight in self.weights}
+            for offset, weight in self.offsets:
+                flat_work[start + offset : stop + offset : work_step] += diffused_errors[weight]
+
+
+def bayer_matrix(order: int = 3) -> np.ndarray:
+    # Recursively builds a (2^order x 2^order) Bayer matrix of thresholds in the range [0, 1)
+    matrix = np.zeros((1, 1))
+    for _ in range(order):
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return (matrix + 0.5) / matrix.size
+
+
+@functools.lru_cache(maxsize=1)
+def blue_noise_matrix(size: int = 64, sigma: float = 1.5, seed: int = 0) -> np.ndarray:
+    """
+    Generates a (size x size) blue noise threshold matrix using the void-and-cluster method.
+    The matrix tiles seamlessly and only has to be generated once per process.
+    """
+    rng = np.random.default_rng(seed)
+    # Gaussian energy kernel centred on (0, 0) that wraps around the edges of the matrix
+    distance = np.minimum(np.arange(size), size - np.arange(size))
+    kernel = np.exp(-(distance[:, None] ** 2 + distance[None, :] ** 2) / (2 * sigma**2))
+
+    def kernel_at(position: int) -> np.ndarray:
+        row, column = divmod(position, size)
+        return np.roll(kernel, (row, column), axis=(0, 1)).ravel()
+
+    # Start with ~10% of pixels set at random
+    pattern = rng.random(size * size) < 0.1
+    energy = np.zeros(size * size)
+    for position in np.flatnonzero(pattern):
+        energy += kernel_at(position)
+
+    # Spread the initial points out evenly by moving the point in the tightest cluster into the largest void
+    while True:
+        tightest_cluster = int(np.where(pattern, energy, -np.inf).argmax())
+        pattern[tightest_cluster] = False
+        energy -= kernel_at(tightest_cluster)
+        largest_void = int(np.where(pattern, np.inf, energy).argmin())
+        pattern[largest_void] = True
+        energy += kernel_at(largest_void)
+        if largest_void == tightest_cluster:
+            break
+
+    ranks = np.zeros(size * size, dtype=np.int64)
+    initial_points = int(pattern.sum())
+
+    # Rank the initial points by removing them from the tightest cluster first
+    removal_pattern = pattern.copy()
+    removal_energy = energy.copy()
+    for rank in range(initial_points - 1, -1, -1):
+        tightest_cluster = int(np.where(removal_pattern, removal_energy, -np.inf).argmax())
+        removal_pattern[tightest_cluster] = False
+        removal_energy -= kernel_at(tightest_cluster)
+        ranks[tightest_cluster] = rank
+
+    # Rank the remaining pixels by filling the largest void first
+    for rank in range(initial_points, size * size):
+        largest_void = int(np.where(pattern, np.inf, energy).argmin())
+        pattern[largest_void] = True
+        energy += kernel_at(largest_void)
+        ranks[largest_void] = rank
+
+    return ((ranks + 0.5) / ranks.size).reshape(size, size)
+
+
+class OrderedDither:
+    """
+    Ordered dithering treats every pixel independently, only the position of a band within the image is tracked so
+    the threshold matrix tiles seamlessly across bands.
+    """
+
+    def __init__(self, width: int, palette_colours: np.ndarray, lut: np.ndarray, threshold_matrix: np.ndarray):
+        self.lut = lut
+        self.threshold_matrix = threshold_matrix
+        self.matrix_size = threshold_matrix.shape[0]
+        self.columns = np.arange(width) % self.matrix_size
+        # The thresholds offset each pixel along the grey axis, the spread is sized from the largest gap between a
+        # palette colour and its nearest neighbour (measured per channel) so every pixel can reach the colours around it
+        unique_colours = np.unique(palette_colours, axis=0)
+        colour_distances = np.sqrt(((unique_colours[:, None, :] - unique_colours[None, :, :]) ** 2).sum(axis=2))
+        np.fill_diagonal(colour_distances, np.inf)
+        nearest_distances = colour_distances.min(axis=1)
+        self.spread = min(255.0, 2 * nearest_distances[np.isfinite(nearest_distances)].max(initial=0) / np.sqrt(3))
+        # Row of the image the next band starts at
+        self.next_row = 0
+
+    def dither_band(self, rgb: np.ndarray) -> np.ndarray:
+        height, width, _ = rgb.shape
+        indices = np.zeros((height, width), dtype=np.uint8)
+        for first_row in range(0, height, ORDERED_CHUNK_ROWS):
+            rows = np.arange(first_row, min(first_row + ORDERED_CHUNK_ROWS, height))
+            matrix_rows = (rows + self.next_row) % self.matrix_size
+            thresholds = self.threshold_matrix[matrix_rows[:, None], self.columns[None, :]]
+            offset = ((thresholds - 0.5) * self.spread)[..., None]
+            colours = np.clip(np.rint(rgb[rows] + offset), 0, 255).astype(np.int32)
+            indices[rows] = lookup_colour_indices(colours.reshape(-1, 3), self.lut).reshape(len(rows), width)
+
+        self.next_row += height
+        return indices
+
+
+BandDitherer = ErrorDiffusion | OrderedDither
+
+DITHERERS: dict[DitherAlgorithm, Callable[[int, np.ndarray, np.ndarray], BandDitherer]] = {
+    DitherAlgorithm.ATKINSON: functools.partial(ErrorDiffusion, algorithm=DitherAlgorithm.ATKINSON),
+    DitherAlgorithm.STUCKI: functools.partial(ErrorDiffusion, algorithm=DitherAlgorithm.STUCKI),
+    DitherAlgorithm.BAYER: lambda width, palette_colours, lut: OrderedDither(
+        width, palette_colours, lut, bayer_matrix()
+    ),
+    DitherAlgorithm.BLUE_NOISE: lambda width, palette_colours, lut: OrderedDither(
+        width, palette_colours, lut, blue_noise_matrix()
+    ),
+}
@@ -17,6 +17,13 @@ def error_response(message: str, errors: Union[Exception, ValidationError], resp
     return jsonify(message=message, errors=formatted_errors, data=None), response_code
 
 
+def retry_later_response(message: str, errors: Exception, retry_after: int):
+    # The server is too busy to handle the request now, tell the client when it is worth trying again
+    response, response_code = error_response(message, errors, 429)
+    response.headers["Retry-After"] = str(retry_after)
+    return response, response_code
+
+
 def formatValidationErrors(validationErrors: List[ErrorDetails]) -> List[str]:
     formatted_errors = []
     # Loop over the errors and put them into the format <field_name> <error_message>
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Seconds allowed to establish a connection (DNS lookup, TCP and TLS handshakes) and between bytes received
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+# Seconds allowed to download the whole body, stops a feed trickling an image in slowly
+DOWNLOAD_TIMEOUT = 120
+CHUNK_SIZE = 64 * 1024
+# application/octet-stream is allowed as many file servers do not know the type of what they are serving
+ALLOWED_CONTENT_TYPES = ("image/", "application/octet-stream")
+
+
+class TimedConnectionMixin:
+    # Time taken to connect, None once it has been reported or when the connection is reused
+    connect_duration: float | None = None
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()  # type: ignore[misc]
+        self.connect_duration = time.perf_counter() - start
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    # Transport adapter whose connections record how long they took to connect
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+@dataclass
+class FeedTimings:
+    # Seconds spent on each stage of a fetch, connect is 0 when a kept alive connection was reused
+    connect: float = 0.0
+    first_byte: float = 0.0
+    download: float = 0.0
+
+    def __str__(self) -> str:
+        return f"connect {self.connect:.3f}s, first byte {self.first_byte:.3f}s, download {self.download:.3f}s"
+
+
+@dataclass
+class FeedResponse:
+    status_code: int
+    headers: Mapping[str, str]
+    # The body, None when the feed responded that the image has not been modified
+    content: bytes | None
+    timings: FeedTimings = field(default_factory=FeedTimings)
+
+
+class FeedClient:
+    """
+    Fetches images from feeds over a persistent session, so connections are kept alive between polls. Bodies are
+    streamed with a cap on their size, and responses that are clearly not a usable image are abandoned before their
+    body is downloaded.
+    """
+
+    session: requests.Session
+    _lock: threading.Lock
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+
+    def fetch(self, url: str, headers: dict[str, str] | None = None, max_bytes: int | None = None) -> FeedResponse:
+        # A session is not safe to share between threads
+        with self._lock:
+            start = time.perf_counter()
+            with self.session.get(
+                url, headers=headers, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+            ) as response:
+                timings = FeedTimings()
+                headers_received = time.perf_counter()
+                connection = getattr(response.raw, "connection", None)
+                connect_duration = getattr(connection, "connect_duration", None)
+                if connect_duration is not None:
+                    timings.connect = connect_duration
+                    # Later requests reusing this connection did not have to connect
+                    connection.connect_duration = None
+                timings.first_byte = headers_received - start - timings.connect
+
+                if response.status_code == 304:
+                    return FeedResponse(response.status_code, response.headers, None, timings)
+
+                response.raise_for_status()
+                FeedClient.check_headers(response.headers, max_bytes)
+                content = FeedClient.read_body(response, max_bytes, headers_received)
+                timings.download = time.perf_counter() - headers_received
+
+        return FeedResponse(response.status_code, response.headers, content, timings)
+
+    def close(self):
+        with self._lock:
+            self.session.close()
+
+    @staticmethod
+    def check_headers(headers: Mapping[str, str], max_bytes: int | None):
+        content_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and not content_type.startswith(ALLOWED_CONTENT_TYPES):
+            raise ValueError(f"Feed responded with {content_type} rather than an image")
+
+        content_length = headers.get("Content-Length")
+        if max_bytes is not None and content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise ValueError(f"Feed image is {content_length} bytes, larger than the limit of {max_bytes} bytes")
+
+    @staticmethod
+    def read_body(response: requests.Response, max_bytes: int | None, started: float) -> bytes:
+        body = bytearray()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            body.extend(chunk)
+            # Content-Length may be missing or wrong, so the size is checked as the body arrives
+            if max_bytes is not None and len(body) > max_bytes:
+                raise ValueError(f"Feed image is larger than the limit of {max_bytes} bytes")
+            if time.perf_counter() - started > DOWNLOAD_TIMEOUT:
+                raise TimeoutError(f"Feed image took longer than {DOWNLOAD_TIMEOUT} seconds to download")
+        return bytes(body)
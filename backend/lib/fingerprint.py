@@ -0,0 +1,57 @@
+import base64
+import hashlib
+from dataclasses import dataclass
+
+from PIL import Image
+
+# Rows of pixels hashed at a time, so an image is never copied whole to be hashed
+PIXEL_HASH_ROWS = 256
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """
+    Identifies an image without encoding it. The content hash identifies the exact bytes of the encoded image, the
+    optional pixel hash identifies the decoded image, so the same picture encoded differently (e.g. with a new
+    timestamp in its metadata) can be recognised.
+    """
+
+    content: str
+    pixels: str | None = None
+
+    @property
+    def identity(self) -> str:
+        # Identifies the picture, the pixel hash is preferred as it does not change when the image is re-encoded
+        return self.pixels or self.content
+
+    def matches(self, other: "Fingerprint | None") -> bool:
+        if other is None:
+            return False
+        if self.content == other.content:
+            return True
+        return self.pixels is not None and self.pixels == other.pixels
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def base64_content_hash(base64_image: str) -> str:
+    # Hash the decoded bytes, so the hash only depends on the image and not on how it was base64 encoded
+    return content_hash(base64.b64decode(base64_image))
+
+
+def pixel_hash(image: Image.Image) -> str:
+    hasher = hashlib.blake2b(digest_size=32)
+    hasher.update(f"{image.mode}:{image.width}x{image.height}".encode())
+    palette = image.getpalette() if image.mode == "P" else None
+    if palette:
+        hasher.update(bytes(palette))
+    for top in range(0, image.height, PIXEL_HASH_ROWS):
+        hasher.update(image.crop((0, top, image.width, min(top + PIXEL_HASH_ROWS, image.height))).tobytes())
+    return hasher.hexdigest()
+
+
+def fingerprint(data: bytes, image: Image.Image | None = None) -> Fingerprint:
+    # The pixels are only hashed when the decoded image is given
+    return Fingerprint(content_hash(data), pixel_hash(image) if image is not None else None)
@@ -0,0 +1,100 @@
+import os
+import shutil
+import threading
+
+from PIL import Image
+
+from backend.lib.fingerprint import base64_content_hash
+from backend.lib.logger_setup import logger
+from backend.models.display_model import DisplaySettings, FitMode
+
+
+class FrameCache:
+    """
+    Persistent on-disk cache of finished palette frames, i.e. images that have already been dithered, cropped and
+    padded for a display. Frames are stored as palette based PNGs under a directory per display profile:
+    <cache_dir>/<display profile>/<source image hash>_<fit mode>.png
+    """
+
+    cache_dir: str
+    _lock: threading.Lock
+
+    def __init__(self, cache_dir: str | None = None):
+        self.cache_dir = cache_dir or os.path.join(os.getenv("DATA_DIR", ""), "frame_cache")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def source_key(base64_image: str) -> str:
+        # The content hash of the image, so the key only depends on the image and not on its encoding
+        return base64_content_hash(base64_image)
+
+    @staticmethod
+    def frame_key(source_key: str, fit_mode: FitMode) -> str:
+        # The same image fitted differently gives a different frame
+        return f"{source_key}_{fit_mode.value}"
+
+    @staticmethod
+    def profile_key(display_settings: DisplaySettings) -> str:
+        # The "red/yellow" palette contains a path separator, so it must be replaced to form a directory name
+        colour_palette = display_settings.colour_palette.value.replace("/", "-")
+        return (
+            f"{display_settings.type.value}_{colour_palette}_{display_settings.border_colour.value}"
+            f"_{display_settings.dither_algorithm.value}"
+        )
+
+    def profile_dir(self, display_settings: DisplaySettings) -> str:
+        return os.path.join(self.cache_dir, FrameCache.profile_key(display_settings))
+
+    def frame_path(self, frame_key: str, display_settings: DisplaySettings) -> str:
+        return os.path.join(self.profile_dir(display_settings), f"{frame_key}.png")
+
+    def contains(self, frame_key: str, display_settings: DisplaySettings) -> bool:
+        return os.path.isfile(self.frame_path(frame_key, display_settings))
+
+    def get(self, frame_key: str, display_settings: DisplaySettings) -> Image.Image | None:
+        frame_path = self.frame_path(frame_key, display_settings)
+        try:
+            with Image.open(frame_path) as frame:
+                # Load the pixel data so the file handle can be closed
+                frame.load()
+                return frame
+        except FileNotFoundError:
+            return None
+        except (OSError, SyntaxError, ValueError) as err:
+            # A corrupt frame is treated as a cache miss, it will be rendered and stored again. Pillow reports a corrupt
+            # image as any of these errors.
+            logger.error(f"Failed to read cached frame {frame_path}: {err}")
+            return None
+
+    def put(self, frame_key: str, display_settings: DisplaySettings, frame: Image.Image):
+        frame_path = self.frame_path(frame_key, display_settings)
+        with self._lock:
+            os.makedirs(os.path.dirname(frame_path), exist_ok=True)
+            # Write to a temporary file first so a partially written frame is never read back
+            temp_path = f"{frame_path}.tmp"
+            frame.save(temp_path, "PNG")
+            os.replace(temp_path, frame_path)
+        logger.debug(f"Stored frame {frame_key} for {FrameCache.profile_key(display_settings)}")
+
+    def prune(self, frame_keys: set[str], display_settings: DisplaySettings):
+        # Remove frames of the given display profile that are no longer in use, e.g. their image was removed
+        profile_dir = self.profile_dir(display_settings)
+        with self._lock:
+            if not os.path.isdir(profile_dir):
+                return
+            for file_name in os.listdir(profile_dir):
+                frame_key, _ = os.path.splitext(file_name)
+                if frame_key not in frame_keys:
+                    os.remove(os.path.join(profile_dir, file_name))
+                    logger.debug(f"Pruned cached frame {file_name}")
+
+    def evict_profiles_except(self, display_settings: DisplaySettings):
+        # Frames rendered for any other display profile can no longer be shown, so remove them
+        keep = FrameCache.profile_key(display_settings)
+        with self._lock:
+            if not os.path.isdir(self.cache_dir):
+                return
+            for profile in os.listdir(self.cache_dir):
+                if profile != keep:
+                    logger.info(f"Evicting cached frames for display profile {profile}")
+                    shutil.rmtree(os.path.join(self.cache_dir, profile), ignore_errors=True)
@@ -0,0 +1,70 @@
+import time
+from collections.abc import Mapping
+from email.utils import parsedate_to_datetime
+
+# A feed can ask to not be polled again for a while, this caps how long it can hold off polling for
+MAX_POLL_DELAY = 86400
+
+
+def conditional_request_headers(etag: str | None, last_modified: str | None) -> dict[str, str]:
+    # Ask the server to only send the image if it has changed since the validators were received
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def parse_http_date(value: str | None) -> float | None:
+    # Returns the timestamp of an HTTP date, or None if it is missing or invalid
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers: Mapping[str, str]) -> float | None:
+    """
+    Returns how many seconds a response stays fresh for, using Cache-Control max-age over Expires as in RFC 9111.
+    None is returned when the response does not say.
+    """
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.strip().lower()] = value.strip().strip('"')
+
+    if "no-cache" in directives or "no-store" in directives:
+        return 0
+
+    if "max-age" in directives:
+        try:
+            max_age = int(directives["max-age"])
+        except ValueError:
+            return 0
+        # Age is how long the response has already spent in caches on the way here
+        try:
+            age = int(headers.get("Age", 0))
+        except ValueError:
+            age = 0
+        return max(0, max_age - age)
+
+    if "Expires" in headers:
+        expires = parse_http_date(headers["Expires"])
+        if expires is None:
+            # An invalid Expires, such as "0", means the response has already expired
+            return 0
+        date = parse_http_date(headers.get("Date")) or time.time()
+        return max(0.0, expires - date)
+
+    return None
+
+
+def next_poll_delay(polling_interval: int, headers: Mapping[str, str]) -> float:
+    # Poll at the configured interval, unless the response stays fresh for longer, polling before then is pointless
+    lifetime = freshness_lifetime(headers)
+    if lifetime is None:
+        return polling_interval
+    return max(polling_interval, min(lifetime, MAX_POLL_DELAY))
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from backend.lib.logger_setup import logger
+
+# Images are named by their content hash, which also stops a name from escaping the store directory
+IMAGE_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+# Images are written here while they arrive, then moved into place once they are complete
+INCOMING_DIR = ".incoming"
+
+
+@dataclass
+class StagedImage:
+    # An image that has been written to the store but is not yet in place to be read
+    path: str
+    key: str
+    size: int
+
+
+class ImageStore:
+    """
+    Content addressed store of source images. Each image is held once as the raw bytes it was uploaded as, named by
+    the hash of those bytes:
+    <store_dir>/<first two characters of the hash>/<hash>
+    """
+
+    store_dir: str
+    _lock: threading.Lock
+
+    def __init__(self, store_dir: str | None = None):
+        self.store_dir = store_dir or os.path.join(os.getenv("DATA_DIR", ""), "images")
+        self._lock = threading.Lock()
+
+    def image_path(self, image_key: str) -> str:
+        if not IMAGE_KEY_PATTERN.fullmatch(image_key):
+            raise ValueError(f"Invalid image key: {image_key}")
+        # Images are spread across sub directories so no single directory grows too large
+        return os.path.join(self.store_dir, image_key[:2], image_key)
+
+    def contains(self, image_key: str) -> bool:
+        return os.path.isfile(self.image_path(image_key))
+
+    def get(self, image_key: str) -> bytes:
+        with open(self.image_path(image_key), "rb") as file:
+            return file.read()
+
+    def get_base64(self, image_key: str) -> str:
+        return base64.b64encode(self.get(image_key)).decode("utf-8")
+
+    def put(self, data: bytes) -> str:
+        return self.commit(self.stage([data]))
+
+    def stage(self, chunks: Iterable[bytes]) -> StagedImage:
+        """
+        Writes an image to the store a chunk at a time, hashing it as it is written, so it is never held in memory
+        whole. The image cannot be read until it is committed.
+        """
+        incoming_dir = os.path.join(self.store_dir, INCOMING_DIR)
+        os.makedirs(incoming_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        file_descriptor, temp_path = tempfile.mkstemp(dir=incoming_dir)
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return StagedImage(temp_path, hasher.hexdigest(), size)
+
+    def commit(self, staged_image: StagedImage) -> str:
+        image_path = self.image_path(staged_image.key)
+        with self._lock:
+            if os.path.isfile(image_path):
+                # The same image is already stored
+                os.remove(staged_image.path)
+                return staged_image.key
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            os.replace(staged_image.path, image_path)
+        logger.debug(f"Stored image {staged_image.key}")
+        return staged_image.key
+
+    def discard(self, staged_image: StagedImage):
+        if os.path.isfile(staged_image.path):
+            os.remove(staged_image.path)
+
+    def put_base64(self, base64_image: str) -> str:
+        return self.put(base64.b64decode(base64_image))
+
+    def prune(self, image_keys: set[str]):
+        # Remove images that are no longer referenced, e.g. they were removed from the slideshow
+        with self._lock:
+            if not os.path.isdir(self.store_dir):
+                return
+            for directory in os.listdir(self.store_dir):
+                directory_path = os.path.join(self.store_dir, directory)
+                # Images still arriving are not pruned
+                if directory == INCOMING_DIR or not os.path.isdir(directory_path):
+                    continue
+                for file_name in os.listdir(directory_path):
+                    if file_name not in image_keys:
+                        os.remove(os.path.join(directory_path, file_name))
+                        logger.debug(f"Pruned stored image {file_name}")
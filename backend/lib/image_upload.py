@@ -0,0 +1,95 @@
+from collections.abc import Iterator
+from typing import BinaryIO
+
+from werkzeug.sansio.multipart import NEED_DATA, Data, Epilogue, File, MultipartDecoder
+
+from backend.lib.image_validation import detect_image_format
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Enough bytes to recognise the format of an image from its magic bytes
+HEADER_SIZE = 8
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+def read_body(stream: BinaryIO) -> Iterator[bytes]:
+    # Reads a raw request body a chunk at a time
+    while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+def read_multipart_file(stream: BinaryIO, boundary: str) -> Iterator[bytes]:
+    """
+    Reads the first file of a multipart/form-data body a chunk at a time, as the body arrives. Other fields are
+    skipped, so the body is never parsed into memory as a whole form.
+    """
+    decoder = MultipartDecoder(boundary.encode())
+    in_file = False
+    found_file = False
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while event is not NEED_DATA:
+            if isinstance(event, File):
+                # Only the first file is read
+                in_file = not found_file
+                found_file = True
+            elif isinstance(event, Data):
+                if in_file:
+                    yield event.data
+                    in_file = event.more_data
+            elif isinstance(event, Epilogue):
+                if not found_file:
+                    raise ValueError("Upload does not contain a file")
+                return
+            else:
+                in_file = False
+            event = decoder.next_event()
+        if not chunk:
+            raise ValueError("Upload ended before the multipart body was complete")
+
+
+class ImageUpload:
+    """
+    Checks an image as it is uploaded: its magic bytes must be those of a supported format, and it must not grow
+    larger than max_bytes. An invalid upload stops as soon as it is known to be invalid, before the rest is read.
+    """
+
+    chunks: Iterator[bytes]
+    max_bytes: int
+    format: str | None
+    size: int
+
+    def __init__(self, chunks: Iterator[bytes], max_bytes: int):
+        self.chunks = chunks
+        self.max_bytes = max_bytes
+        self.format = None
+        self.size = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        header = b""
+        for chunk in self.chunks:
+            self.size += len(chunk)
+            if self.size > self.max_bytes:
+                raise ImageTooLargeError(f"Image is greater than {self.max_bytes // 1024} KB")
+
+            if self.format is None:
+                # Hold back the start of the image until there is enough of it to check its format
+                header += chunk
+                if len(header) < HEADER_SIZE:
+                    continue
+                self.check_format(header)
+                chunk = header
+            yield chunk
+
+        if self.format is None:
+            self.check_format(header)
+            yield header
+
+    def check_format(self, header: bytes):
+        self.format = detect_image_format(header)
+        if self.format is None:
+            raise ValueError("Image is not in PNG or JPG/JPEG format")
@@ -1,14 +1,72 @@
 import base64
 import io
+import math
 import os
-from typing import Tuple
 
+import numpy as np
 from PIL import Image
 
+from backend.lib import dithering, parallel_dithering
 from backend.lib.logger_setup import logger
+from backend.models.display_model import DitherAlgorithm, FitMode
 
+# When downscaling by more than this factor, resize first reduces the image by an integer factor with reduce(),
+# which is much cheaper than resampling every source pixel and gives the same result to the eye
+REDUCING_GAP = 3.0
 
-def pad_image(target_resolution: Tuple[int, int], image: Image.Image) -> Image.Image:
+
+def fit_image(image: Image.Image, target_resolution: tuple[int, int], fit_mode: FitMode) -> Image.Image:
+    if fit_mode == FitMode.CROP:
+        # Cropping and padding is applied once the image has been dithered
+        return image
+
+    target_width, target_height = target_resolution
+    if fit_mode == FitMode.STRETCH:
+        scale_x = target_width / image.width
+        scale_y = target_height / image.height
+    elif fit_mode == FitMode.FIT:
+        scale_x = scale_y = min(target_width / image.width, target_height / image.height)
+    else:
+        scale_x = scale_y = max(target_width / image.width, target_height / image.height)
+
+    # For JPEGs, draft configures the decoder to downscale by a power of 2 while decoding (in the DCT domain), so a
+    # large photo is never decoded at full size. The decoded image is at least as large as the requested size.
+    # This has no effect on other formats or images that have already been loaded.
+    original_width, original_height = image.size
+    image.draft(image.mode, (math.ceil(original_width * scale_x), math.ceil(original_height * scale_y)))
+    if image.size != (original_width, original_height):
+        logger.info(f"Decoding image at {image.width}x{image.height} instead of {original_width}x{original_height}")
+        scale_x *= original_width / image.width
+        scale_y *= original_height / image.height
+
+    if fit_mode == FitMode.FIT:
+        size = (
+            min(target_width, max(1, round(image.width * scale_x))),
+            min(target_height, max(1, round(image.height * scale_y))),
+        )
+        box = (0.0, 0.0, float(image.width), float(image.height))
+    else:
+        size = (target_width, target_height)
+        # Only resample the region of the source that will be visible, for fill this is centred on the image
+        box_width = target_width / scale_x
+        box_height = target_height / scale_y
+        left = (image.width - box_width) / 2
+        top = (image.height - box_height) / 2
+        box = (left, top, left + box_width, top + box_height)
+
+    logger.info(f"Resizing image from {image.width}x{image.height} to {size[0]}x{size[1]} ({fit_mode.value})")
+    return image.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=REDUCING_GAP)
+
+
+def thumbnail_image(image: Image.Image, size: int) -> Image.Image:
+    # Scale the image to fit within a square of the given size, thumbnail decodes large JPEGs at reduced size first
+    image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    return image
+
+
+def pad_image(target_resolution: tuple[int, int], image: Image.Image) -> Image.Image:
     logger.info("Image is below target resolution, padding image")
     target_width, target_height = target_resolution
     # Calculate the padding needed
@@ -34,13 +92,13 @@ def pad_image(target_resolution: Tuple[int, int], image: Image.Image) -> Image.I
     return padded_image
 
 
-def crop_image_width(image: Image.Image, target_resolution: Tuple[int, int]) -> Image.Image:
+def crop_image_width(image: Image.Image, target_resolution: tuple[int, int]) -> Image.Image:
     left_crop = (image.width - target_resolution[0]) // 2
     right_crop = left_crop + target_resolution[0]
     return image.crop((left_crop, 0, right_crop, image.height))
 
 
-def crop_image_height(image: Image.Image, target_resolution: Tuple[int, int]) -> Image.Image:
+def crop_image_height(image: Image.Image, target_resolution: tuple[int, int]) -> Image.Image:
     top_crop = (image.height - target_resolution[1]) // 2
     bottom_crop = top_crop + target_resolution[1]
     return image.crop((0, top_crop, image.width, bottom_crop))
@@ -52,11 +110,117 @@ def find_white_index(palette: list[int] | None) -> int:
 
     for i in range(0, len(palette), 3):
         if palette[i] == 255 and palette[i + 1] == 255 and palette[i + 2] == 255:
-            return i
+            return i // 3
 
     return 0
 
 
+def changed_pixel_fraction(frame: Image.Image, previous_frame: Image.Image | None) -> float:
+    # Fraction of the pixels of the frame that differ from the previous frame, frames that cannot be compared pixel by
+    # pixel are entirely different
+    if (
+        previous_frame is None
+        or frame.mode != previous_frame.mode
+        or frame.size != previous_frame.size
+        or frame.getpalette() != previous_frame.getpalette()
+    ):
+        return 1.0
+    if frame.width == 0 or frame.height == 0:
+        return 0.0
+
+    changed = np.asarray(frame) != np.asarray(previous_frame)
+    if changed.ndim == 3:
+        # A pixel has changed if any of its channels has
+        changed = changed.any(axis=2)
+    return np.count_nonzero(changed) / changed.size
+
+
+def dithers_in_parallel(algorithm: DitherAlgorithm, parallel: bool) -> bool:
+    # Floyd-Steinberg is always dithered on a single core by Pillow, which is faster than dithering in parallel
+    return parallel and algorithm != DitherAlgorithm.FLOYD_STEINBERG
+
+
+def dither_to_frame(
+    image: Image.Image,
+    target_resolution: tuple[int, int],
+    palette: list[int],
+    algorithm: DitherAlgorithm,
+    parallel: bool = False,
+) -> Image.Image:
+    """
+    Dithers the image straight into a frame of the target resolution, centre cropping and padding it in the same
+    pass. Only the region visible on the display is dithered. The NumPy engine dithers it a band of rows at a time, so
+    no copy of the whole region is made, unless it is dithered in parallel which needs the region to be shared between
+    processes. Floyd-Steinberg is dithered by Pillow, which copies and converts the whole region to RGB at once, the
+    region is never larger than the display.
+    """
+    parallel = dithers_in_parallel(algorithm, parallel)
+    logger.info(f"Dithering image into frame using {algorithm.value}{' in parallel' if parallel else ''}")
+    target_width, target_height = target_resolution
+    # The region of the image that is visible on the display
+    width = min(image.width, target_width)
+    height = min(image.height, target_height)
+    left = (image.width - width) // 2
+    top = (image.height - height) // 2
+    # Where the visible region is placed in the frame
+    pad_left = (target_width - width) // 2
+    pad_top = (target_height - height) // 2
+
+    frame = Image.new("P", (target_width, target_height), find_white_index(palette))
+    frame.putpalette(palette)
+    box = (left, top, left + width, top + height)
+    if algorithm == DitherAlgorithm.FLOYD_STEINBERG:
+        frame.paste(quantize_image(image.crop(box), palette), (pad_left, pad_top))
+    elif parallel:
+        paste_indices(
+            frame, parallel_dithering.dither_indices(image.crop(box), palette, algorithm), (pad_left, pad_top)
+        )
+    else:
+        row = pad_top
+        for indices in dithering.dither_bands(image, palette, algorithm, box):
+            paste_indices(frame, indices, (pad_left, row))
+            row += indices.shape[0]
+
+    return frame
+
+
+def paste_indices(frame: Image.Image, indices: np.ndarray, position: tuple[int, int]):
+    # The palette indices are wrapped in a palette image without being copied, pasting it copies them into the frame
+    height, width = indices.shape
+    frame.paste(Image.frombuffer("P", (width, height), np.ascontiguousarray(indices), "raw", "P", 0, 1), position)
+
+
+def render_frame(
+    image: Image.Image,
+    target_resolution: tuple[int, int],
+    palette: list[int],
+    dither_algorithm: DitherAlgorithm = DitherAlgorithm.FLOYD_STEINBERG,
+    fit_mode: FitMode = FitMode.CROP,
+    parallel: bool = False,
+) -> Image.Image:
+    # Resize the image first, so large images are decoded and dithered at close to the display resolution
+    image = fit_image(image, target_resolution, fit_mode)
+
+    if image.mode != "P":
+        logger.info(f"Image is not in palette mode ({image.mode}), attempt to dither it")
+        # Dither, crop and pad the image in a single streaming pass to keep memory use low
+        return dither_to_frame(image, target_resolution, palette, dither_algorithm, parallel)
+
+    # A palette image is shown as is, it only needs to be cropped and padded to the display resolution
+    if image.width > target_resolution[0]:
+        logger.info("Image is wider than display width, cropping image")
+        image = crop_image_width(image, target_resolution)
+
+    if image.height > target_resolution[1]:
+        logger.info("Image is higher than display height, cropping image")
+        image = crop_image_height(image, target_resolution)
+
+    if image.width < target_resolution[0] or image.height < target_resolution[1]:
+        image = pad_image(target_resolution, image)
+
+    return image
+
+
 def base64_to_pil_image(base64_image) -> Image.Image:
     # convert the base64 to bytes
     byte_data = base64.b64decode(base64_image)
@@ -69,9 +233,7 @@ def base64_to_pil_image(base64_image) -> Image.Image:
 
 
 def pil_image_to_base64(image: Image.Image) -> str:
-    # Convert image to bytes and create a byte stream
-    byte_data = image.tobytes()
-    image_stream = io.BytesIO(byte_data)
+    image_stream = io.BytesIO()
     # set image to original format else default to PNG
     image_format = image.format if image.format else "PNG"
     # Convert image to its original format (if possible), e.g. PNG or JPEG etc...
@@ -81,13 +243,35 @@ def pil_image_to_base64(image: Image.Image) -> str:
     return img_str.decode("utf-8")
 
 
-def dither(image: Image.Image, palette: list[int]) -> Image.Image:
+def quantize_image(image: Image.Image, palette: list[int]) -> Image.Image:
+    """
+    Floyd-Steinberg dithers the image with Pillow, this is the only implementation of Floyd-Steinberg. It is how
+    frames have always been dithered, the NumPy engine (see dithering) implements the other algorithms.
+    """
     # Create a new image to hold our palette
     palette_image = Image.new("P", (1, 1))
-    # Apply out palette and zero out all other colours
-    palette_image.putpalette(palette + [0, 0, 0] * 248)
+    # Apply our palette and zero out all other colours, every palette contains black so the padding is never chosen
+    palette_image.putpalette(list(palette) + [0, 0, 0] * (256 - len(palette) // 3))
+
+    quantized_image = image.convert("RGB").quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+    quantized_image.putpalette(palette)
+    return quantized_image
+
 
-    dithered_image = image.convert("RGB").quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+def dither(
+    image: Image.Image,
+    palette: list[int],
+    algorithm: DitherAlgorithm = DitherAlgorithm.FLOYD_STEINBERG,
+    parallel: bool = False,
+) -> Image.Image:
+    parallel = dithers_in_parallel(algorithm, parallel)
+    logger.info(f"Dithering image using {algorithm.value}{' in parallel' if parallel else ''}")
+    if algorithm == DitherAlgorithm.FLOYD_STEINBERG:
+        dithered_image = quantize_image(image, palette)
+    elif parallel:
+        dithered_image = parallel_dithering.dither(image, palette, algorithm)
+    else:
+        dithered_image = dithering.dither(image, palette, algorithm)
     dithered_image.format = image.format
 
     if os.getenv("DEV", "False").lower() == "true":
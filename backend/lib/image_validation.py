@@ -1,8 +1,72 @@
 import base64
 import io
+from dataclasses import dataclass
+from typing import BinaryIO
 
 from PIL import Image
 
+# Largest image, in KB, that can be added to the slideshow
+MAX_IMAGE_KB = 15100
+# An image may have up to this many times the pixels of the display it is shown on
+MAX_PIXELS_PER_DISPLAY_PIXEL = 32
+# The pixel limit is never lower than this, so a 12 MP photo from a phone camera is accepted for the smallest displays.
+# Decoded to RGB it takes about 48 MB.
+MIN_PIXEL_LIMIT = 12_000_000
+
+
+@dataclass(frozen=True)
+class ImageProbe:
+    format: str | None
+    width: int
+    height: int
+    mode: str
+    frame_count: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> "ImageProbe":
+        # The image must have been opened lazily, reading these does not decode its pixels
+        return cls(
+            format=image.format,
+            width=image.width,
+            height=image.height,
+            mode=image.mode,
+            frame_count=getattr(image, "n_frames", 1),
+        )
+
+
+# Read the format, dimensions, mode and frame count of an image from its header, without decoding its pixels
+def probe_image(source: bytes | str | BinaryIO) -> ImageProbe:
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            return ImageProbe.from_image(image)
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"Image has too many pixels: {e}")
+    except OSError as e:
+        raise ValueError(f"Image could not be read: {e}")
+
+
+def max_image_pixels(display_resolution: tuple[int, int]) -> int:
+    return max(MIN_PIXEL_LIMIT, display_resolution[0] * display_resolution[1] * MAX_PIXELS_PER_DISPLAY_PIXEL)
+
+
+# Check the image does not have so many pixels that decoding it would use too much memory for the display
+def is_within_pixel_limit(
+    probe: ImageProbe, display_resolution: tuple[int, int], throw_exception: bool = False
+) -> bool:
+    max_pixels = max_image_pixels(display_resolution)
+    is_within_limit = probe.pixels <= max_pixels
+
+    if not is_within_limit and throw_exception:
+        raise ValueError(
+            f"Image is {probe.width}x{probe.height}, more than the limit of {max_pixels:,} pixels for this display"
+        )
+
+    return is_within_limit
+
 
 # Check if the image string is a valid base64 string
 def is_valid_base64(base64_image: str, throw_exception: bool = False) -> bool:
@@ -43,6 +107,15 @@ def is_valid_jpg(base64_image: str, throw_exception: bool = False) -> bool:
     return is_jpg
 
 
+# Identify the format of raw image bytes by their magic bytes, None if it is not a supported format
+def detect_image_format(data: bytes) -> str | None:
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    return None
+
+
 # Check file size is less than the given KB allowance
 def is_valid_file_size(base64_image: str, kb_allowance: int, throw_exception: bool = False) -> bool:
     is_within_size = False
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from backend.lib.logger_setup import logger
+
+# Bits kept per colour channel, 6 bits gives a 64 x 64 x 64 table (256 KB) with a maximum error of 2 levels a channel
+LUT_BITS = 6
+LUT_SHIFT = 8 - LUT_BITS
+# Multiplying a colour (after the shift) by these weights gives its position in the flattened table
+LUT_WEIGHTS = np.array([1 << (2 * LUT_BITS), 1 << LUT_BITS, 1], dtype=np.int32)
+
+_luts: dict[bytes, np.ndarray] = {}
+_luts_lock = threading.Lock()
+
+
+def lut_dir() -> str:
+    return os.path.join(os.getenv("DATA_DIR", ""), "palette_lut")
+
+
+def lut_path(palette: list[int]) -> str:
+    # Tables are named after the palette they were built from, so a changed palette can never load a stale table
+    palette_hash = hashlib.sha256(bytes(palette)).hexdigest()[:16]
+    return os.path.join(lut_dir(), f"{palette_hash}_{LUT_BITS}bit.npy")
+
+
+def nearest_colour_indices(colours: np.ndarray, palette_colours: np.ndarray) -> np.ndarray:
+    # Finds the index of the nearest palette colour (by euclidean distance) for each colour in an (N, 3) array.
+    # |c - p|^2 = |c|^2 - 2c.p + |p|^2 and |c|^2 is the same for every palette colour, so it can be dropped
+    distances = colours @ (-2 * palette_colours.T) + (palette_colours**2).sum(axis=1)
+    return distances.argmin(axis=1).astype(np.uint8)
+
+
+def build_palette_lut(palette_colours: np.ndarray) -> np.ndarray:
+    # Find the nearest palette colour for the centre of every cell in the RGB cube
+    levels = (np.arange(1 << LUT_BITS, dtype=np.int32) << LUT_SHIFT) + (1 << LUT_SHIFT) // 2
+    cell_colours = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1).reshape(-1, 3)
+    return nearest_colour_indices(cell_colours, palette_colours)
+
+
+def get_palette_lut(palette: list[int]) -> np.ndarray:
+    """
+    Returns a flattened RGB -> palette index lookup table for the palette.
+    A table is built once, stored on disk and memory mapped, later calls are served from memory.
+    """
+    key = bytes(palette)
+    with _luts_lock:
+        lut = _luts.get(key)
+        if lut is not None:
+            return lut
+
+        path = lut_path(palette)
+        lut = load_palette_lut(path)
+        if lut is None:
+            logger.info(f"Building palette lookup table {os.path.basename(path)}")
+            palette_colours = np.array(palette, dtype=np.int32).reshape(-1, 3)
+            os.makedirs(lut_dir(), exist_ok=True)
+            # Write to a temporary file first so a partially written table is never loaded
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as file:
+                np.save(file, build_palette_lut(palette_colours))
+            os.replace(temp_path, path)
+            lut = np.load(path, mmap_mode="r")
+
+        _luts[key] = lut
+        return lut
+
+
+def load_palette_lut(path: str) -> np.ndarray | None:
+    try:
+        lut = np.load(path, mmap_mode="r")
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as err:
+        logger.error(f"Failed to load palette lookup table {path}: {err}")
+        return None
+
+    if lut.shape != (1 << (3 * LUT_BITS),) or lut.dtype != np.uint8:
+        # The table was built with different settings, it will be rebuilt
+        return None
+    return lut
+
+
+def lookup_colour_indices(colours: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    # Maps an (N, 3) array of colours in the range [0, 255] to palette indices with a single indexing pass
+    return lut[(colours >> LUT_SHIFT) @ LUT_WEIGHTS]
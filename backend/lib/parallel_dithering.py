@@ -0,0 +1,215 @@
+"""
+Spreads dithering across a pool of processes, the result is identical to dithering on a single core.
+
+The rows of the image are split into stripes, one per process, and the image is shared between the processes through
+shared memory. Ordered dithering treats every pixel independently, so the stripes are dithered independently.
+Error diffusion runs a wavefront (see dithering.wavefront_slope) across the whole image, each process handles the part
+of every wavefront line inside its stripe. A stripe stays far enough behind the stripe above that all the error
+diffused into a line has arrived before the line is quantised, and the two stripes never update the same pixels at
+the same time. The error is held in integers, so the order it arrives in does not change the result.
+
+Only the algorithms of the NumPy engine (see dithering) are dithered in parallel. Floyd-Steinberg is always dithered on
+a single core by Pillow, which is faster than the engine spread across every core, so the parallel option is ignored
+for it (see image_utilis.dithers_in_parallel).
+"""
+
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+from backend.lib.dithering import ErrorDiffusion, OrderedDither, create_ditherer
+from backend.lib.logger_setup import logger
+from backend.models.display_model import DitherAlgorithm
+
+# Stripes are never smaller than this, thinner stripes would spend more time waiting than working
+MIN_STRIPE_ROWS = 32
+# Number of wavefront lines a stripe processes between publishing its progress
+SYNC_LINES = 16
+# Seconds a stripe waits for the stripe above before the render is abandoned
+SYNC_TIMEOUT = 60
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+# The progress of the stripes is shared by the whole pool, so only one image is dithered in parallel at a time
+_render_lock = threading.Lock()
+_progress = None
+_progress_condition = None
+
+# Progress of a stripe that has finished every line
+FINISHED = sys.maxsize
+
+
+def worker_count() -> int:
+    return int(os.getenv("DITHER_WORKERS", os.cpu_count() or 1))
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor, _progress, _progress_condition
+    with _executor_lock:
+        if _executor is None:
+            workers = worker_count()
+            logger.info(f"Starting dithering process pool with {workers} workers")
+            # Forking a threaded server is unsafe, a fork server starts clean processes quickly
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            context = multiprocessing.get_context(method)
+            # The last wavefront line each stripe has finished
+            _progress = context.Array("q", workers, lock=False)
+            _progress_condition = context.Condition()
+            _executor = ProcessPoolExecutor(
+                workers, mp_context=context, initializer=init_worker, initargs=(_progress, _progress_condition)
+            )
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+def init_worker(progress, progress_condition):
+    global _progress, _progress_condition
+    _progress = progress
+    _progress_condition = progress_condition
+
+
+def stripe_rows(height: int) -> list[tuple[int, int]]:
+    stripe_count = max(1, min(worker_count(), height // MIN_STRIPE_ROWS))
+    boundaries = [height * stripe // stripe_count for stripe in range(stripe_count + 1)]
+    return list(itertools.pairwise(boundaries))
+
+
+def dither(image: Image.Image, palette: list[int], algorithm: DitherAlgorithm) -> Image.Image:
+    indices = dither_indices(image, palette, algorithm)
+
+    dithered_image = Image.frombytes("P", (image.width, image.height), indices.tobytes())
+    dithered_image.putpalette(palette)
+    return dithered_image
+
+
+def dither_indices(image: Image.Image, palette: list[int], algorithm: DitherAlgorithm) -> np.ndarray:
+    rgb = np.asarray(image.convert("RGB"))
+    rows = stripe_rows(image.height)
+    ditherer = create_ditherer(image.width, palette, algorithm)
+    if len(rows) == 1:
+        # Too small to be worth sharing out
+        return ditherer.dither_band(rgb)
+
+    with _render_lock:
+        executor = get_executor()
+        indices_memory = shared_memory.SharedMemory(create=True, size=image.width * image.height)
+        work_memory = None
+        try:
+            if isinstance(ditherer, ErrorDiffusion):
+                work_shape = (image.height + ditherer.pad_rows, ditherer.stride, 3)
+                work_memory = shared_memory.SharedMemory(create=True, size=int(np.prod(work_shape)) * 4)
+                work = np.ndarray(work_shape, dtype=np.int32, buffer=work_memory.buf)
+                ditherer.create_work(rgb, out=work)
+                # The array must be released before the shared memory can be closed
+                del work
+                for stripe in range(len(rows)):
+                    _progress[stripe] = -1
+                futures = [
+                    executor.submit(
+                        diffuse_stripe,
+                        work_memory.name,
+                        work_shape,
+                        indices_memory.name,
+                        (image.width, image.height),
+                        palette,
+                        algorithm,
+                        stripe,
+                        rows_of_stripe,
+                    )
+                    for stripe, rows_of_stripe in enumerate(rows)
+                ]
+            else:
+                futures = [
+                    executor.submit(ordered_stripe, rgb[first_row:last_row], palette, algorithm, first_row)
+                    for first_row, last_row in rows
+                ]
+
+            # Wait for every stripe, so none are still using the shared memory if one of them fails
+            wait(futures)
+            indices = np.ndarray((image.height, image.width), dtype=np.uint8, buffer=indices_memory.buf).copy()
+            for future, (first_row, last_row) in zip(futures, rows):
+                stripe_indices = future.result()
+                if stripe_indices is not None:
+                    indices[first_row:last_row] = stripe_indices
+            return indices
+        finally:
+            indices_memory.close()
+            indices_memory.unlink()
+            if work_memory is not None:
+                work_memory.close()
+                work_memory.unlink()
+
+
+def ordered_stripe(rgb: np.ndarray, palette: list[int], algorithm: DitherAlgorithm, first_row: int) -> np.ndarray:
+    ditherer = create_ditherer(rgb.shape[1], palette, algorithm)
+    if not isinstance(ditherer, OrderedDither):
+        raise TypeError(f"{algorithm.value} is not an ordered dither algorithm")
+    # Offset the threshold matrix to where the stripe sits in the image
+    ditherer.next_row = first_row
+    return ditherer.dither_band(rgb)
+
+
+def diffuse_stripe(
+    work_name: str,
+    work_shape: tuple[int, int, int],
+    indices_name: str,
+    size: tuple[int, int],
+    palette: list[int],
+    algorithm: DitherAlgorithm,
+    stripe: int,
+    rows: tuple[int, int],
+) -> None:
+    width, height = size
+    ditherer = create_ditherer(width, palette, algorithm)
+    if not isinstance(ditherer, ErrorDiffusion):
+        raise TypeError(f"{algorithm.value} is not an error diffusion algorithm")
+
+    work_memory = shared_memory.SharedMemory(name=work_name)
+    indices_memory = shared_memory.SharedMemory(name=indices_name)
+    flat_work = np.ndarray(work_shape, dtype=np.int32, buffer=work_memory.buf).reshape(-1, 3)
+    indices = np.ndarray(width * height, dtype=np.uint8, buffer=indices_memory.buf)
+    try:
+        # The wavefront lines that cross the stripe
+        first_line = ditherer.slope * rows[0]
+        last_line = width - 1 + ditherer.slope * (rows[1] - 1)
+        # A line can be processed once the stripe above has finished every line that diffuses error into it, and
+        # has moved far enough ahead that the lines it is updating are beyond the lines this stripe updates
+        lead = ditherer.line_reach() - 1
+
+        for block_start in range(first_line, last_line + 1, SYNC_LINES):
+            block_end = min(block_start + SYNC_LINES, last_line + 1)
+            if stripe > 0:
+                with _progress_condition:
+                    if not _progress_condition.wait_for(
+                        lambda end=block_end: _progress[stripe - 1] >= end - 1 + lead, SYNC_TIMEOUT
+                    ):
+                        raise TimeoutError(f"Stripe {stripe} timed out waiting for stripe {stripe - 1}")
+
+            ditherer.diffuse_lines(flat_work, indices, range(block_start, block_end), rows)
+
+            with _progress_condition:
+                _progress[stripe] = block_end - 1
+                _progress_condition.notify_all()
+    finally:
+        with _progress_condition:
+            # Never hold up the stripe below, if this stripe failed the render fails on its result instead
+            _progress[stripe] = FINISHED
+            _progress_condition.notify_all()
+        # The arrays must be released before the shared memory can be closed
+        del flat_work, indices
+        work_memory.close()
+        indices_memory.close()
@@ -1,14 +1,12 @@
+import base64
+import functools
 import os
+import threading
 from typing import Tuple
 from PIL import Image, ImageDraw, ImageFont
 from backend.lib.image_utilis import pil_image_to_base64
 from backend.lib.logger_setup import logger
-from backend.lib.display_utilis import (
-    InkyDisplay,
-    is_small_display,
-    construct_palette,
-    resolve_display_from_settings,
-)
+from backend.lib.display_profile import DisplayProfile, resolve_profile_from_settings
 from backend.models.display_model import DisplaySettings
 
 
@@ -48,34 +46,87 @@ noto_emoji = os.path.abspath(os.path.join(os.path.dirname(__file__), "../assets/
 
 PLACEHOLDER_TEXT = "Inky Dash"
 PLACEHOLDER_EMOJI = "🐙"
+# Part of the file name of rendered placeholders, bump it when the placeholder changes so old renders are not used
+PLACEHOLDER_VERSION = 1
+
+# Rendered placeholders as base64 PNGs, by display profile (see placeholder_key)
+_placeholders: dict[str, str] = {}
+_placeholders_lock = threading.Lock()
+
+
+@functools.cache
+def load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    # Fonts are loaded once for the life of the process
+    return ImageFont.truetype(font_path, size)
+
+
+def placeholder_key(display_profile: DisplayProfile) -> str:
+    # The "red/yellow" palette contains a path separator, so it must be replaced to form a file name
+    colour_palette = display_profile.colour_palette.value.replace("/", "-")
+    return f"{display_profile.type.value}_{colour_palette}_v{PLACEHOLDER_VERSION}"
+
+
+def placeholder_path(key: str) -> str:
+    return os.path.join(os.getenv("DATA_DIR", ""), "placeholders", f"{key}.png")
 
 
 def generate_place_holder_image(display_settings: DisplaySettings) -> str:
+    """
+    Returns the placeholder for the display as a base64 encoded PNG. Placeholders are rendered once for each display
+    profile and kept in memory and in the data directory, so switching display or restarting does not render again.
+    """
+    display_profile = resolve_profile_from_settings(display_settings)
+    key = placeholder_key(display_profile)
+    with _placeholders_lock:
+        placeholder = _placeholders.get(key)
+        if placeholder is None:
+            placeholder = read_place_holder_image(key) or render_place_holder_image(display_profile, key)
+            _placeholders[key] = placeholder
+        return placeholder
+
+
+def read_place_holder_image(key: str) -> str | None:
+    try:
+        with open(placeholder_path(key), "rb") as file:
+            png = file.read()
+    except FileNotFoundError:
+        return None
+    logger.info(f"Using the placeholder image rendered for {key}")
+    return base64.b64encode(png).decode("utf-8")
+
+
+def render_place_holder_image(display_profile: DisplayProfile, key: str) -> str:
     logger.info("Generating a placeholder image")
-    display = resolve_display_from_settings(display_settings)
-
-    logger.info(f"width: {display.width} height: {display.height}")
-    placeholder_image = Image.new("P", (display.width, display.height), display.WHITE)
-    palette = construct_palette(display)
+    logger.info(f"width: {display_profile.width} height: {display_profile.height}")
+    placeholder_image = Image.new("P", display_profile.resolution, display_profile.white)
+    palette = list(display_profile.palette)
     logger.info(f"palette {palette}")
     placeholder_image.putpalette(palette)
 
     draw = ImageDraw.Draw(placeholder_image)
-    draw_placeholder_content(draw, display)
-
-    placeholder_image.save(os.path.join(os.getenv("DATA_DIR", ""), "placeholder_image.png"), "PNG")
+    draw_placeholder_content(draw, display_profile)
 
-    return pil_image_to_base64(placeholder_image)
+    placeholder = pil_image_to_base64(placeholder_image)
+    path = placeholder_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so a partially written placeholder is never read back
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(base64.b64decode(placeholder))
+        os.replace(f"{path}.tmp", path)
+    except OSError as err:
+        logger.error(f"Failed to store the placeholder image for {key}: {err}")
+    return placeholder
 
 
-def draw_placeholder_content(draw: ImageDraw.ImageDraw, display: InkyDisplay):
-    small = is_small_display(display)
+def draw_placeholder_content(draw: ImageDraw.ImageDraw, display_profile: DisplayProfile):
+    small = display_profile.small
 
     text_font_size = 24 if small else 64
-    text_font = ImageFont.truetype(silkscreen_pixel, text_font_size)
+    text_font = load_font(silkscreen_pixel, text_font_size)
 
     emoji_font_size = 48 if small else 120
-    emoji_font = ImageFont.truetype(noto_emoji, emoji_font_size)
+    emoji_font = load_font(noto_emoji, emoji_font_size)
 
     gap = 15 if small else 30
 
@@ -84,14 +135,14 @@ def draw_placeholder_content(draw: ImageDraw.ImageDraw, display: InkyDisplay):
 
     # Calculate x and y positions to center content on the display
     total_height = text_height + gap + emoji_height
-    text_x = (display.width - text_width) / 2
-    text_y = (display.height - total_height) / 2
-    emoji_x = (display.width - emoji_width) / 2
+    text_x = (display_profile.width - text_width) / 2
+    text_y = (display_profile.height - total_height) / 2
+    emoji_x = (display_profile.width - emoji_width) / 2
     emoji_y = text_y + text_height + gap
 
-    draw.text((text_x, text_y), PLACEHOLDER_TEXT, fill=display.BLACK, font=text_font)
+    draw.text((text_x, text_y), PLACEHOLDER_TEXT, fill=display_profile.black, font=text_font)
 
-    emoji_fill = getattr(display, "BLACK" if small else "RED", 1)
+    emoji_fill = display_profile.black if small else display_profile.red
     draw.text((emoji_x, emoji_y), PLACEHOLDER_EMOJI, fill=emoji_fill, font=emoji_font)
 
 
@@ -0,0 +1,203 @@
+"""
+Runs CPU bound rendering, i.e. decoding, dithering and encoding images, in a pool of processes, so a large render
+does not hold the GIL and starve the threads serving requests.
+
+The number of jobs running and waiting is bounded. Requests submit without waiting and are turned away with
+RenderQueueFullError when every slot is taken, the display workers wait for a slot instead. Jobs dithered in parallel
+are run in the thread that submits them, parallel dithering already spreads the work across its own pool of processes.
+Whether a job is dithered in parallel is decided by image_utilis.dithers_in_parallel, Floyd-Steinberg never is, so its
+jobs always run in the pool, where a decompression bomb or running out of memory only takes down a pool process.
+"""
+
+import io
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from backend.lib.fingerprint import pixel_hash
+from backend.lib.image_utilis import (
+    base64_to_pil_image,
+    dither,
+    pil_image_to_base64,
+    render_frame,
+    thumbnail_image,
+)
+from backend.lib.image_validation import ImageProbe, is_within_pixel_limit
+from backend.lib.logger_setup import logger
+from backend.models.display_model import DitherAlgorithm, FitMode
+
+# Seconds a job is assumed to take until jobs have been timed, used to tell clients when to retry
+INITIAL_JOB_SECONDS = 2.0
+# Weight of the latest job when averaging how long jobs take
+JOB_SECONDS_WEIGHT = 0.2
+
+
+def worker_count() -> int:
+    return int(os.getenv("RENDER_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+
+def queue_size() -> int:
+    # Jobs that may wait for a free process, beyond those running
+    return int(os.getenv("RENDER_QUEUE_SIZE", "4"))
+
+
+class RenderQueueFullError(RuntimeError):
+    retry_after: int
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many images are being rendered, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class RenderExecutor:
+    workers: int
+    queue_size: int
+    # Average seconds from submitting a job to its result
+    job_seconds: float
+    _slots: threading.BoundedSemaphore
+    _executor: ProcessPoolExecutor | None
+    _lock: threading.Lock
+
+    def __init__(self, workers: int | None = None, max_queued: int | None = None):
+        self.workers = worker_count() if workers is None else workers
+        self.queue_size = queue_size() if max_queued is None else max_queued
+        self.job_seconds = INITIAL_JOB_SECONDS
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"Starting render process pool with {self.workers} workers")
+                # Forking a threaded server is unsafe, a fork server starts clean processes quickly
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def submit(self, job: Callable, *args, block: bool = False, in_process: bool = False) -> Future:
+        """
+        Runs job(*args) in the pool of processes, or in the calling thread if in_process is set. When every slot is
+        taken it waits for one if block is set, otherwise it raises RenderQueueFullError.
+        """
+        if not self._slots.acquire(blocking=block):
+            raise RenderQueueFullError(self.retry_after())
+        submitted = time.monotonic()
+
+        def job_done(future: Future):
+            self._slots.release()
+            if future.cancelled():
+                return
+            if isinstance(future.exception(), BrokenProcessPool):
+                # A process died, e.g. it ran out of memory, start a new pool for the next job
+                logger.error("Render process pool is broken, it will be restarted")
+                self.reset(executor)
+                return
+            with self._lock:
+                self.job_seconds += JOB_SECONDS_WEIGHT * (time.monotonic() - submitted - self.job_seconds)
+
+        if in_process:
+            executor = None
+            future = Future()
+            try:
+                future.set_result(job(*args))
+            except Exception as err:  # noqa: BLE001 - the error is raised from the future, as it is for pooled jobs
+                future.set_exception(err)
+            job_done(future)
+            return future
+
+        try:
+            executor = self.get_executor()
+            future = executor.submit(job, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(job_done)
+        return future
+
+    def reset(self, executor: ProcessPoolExecutor | None):
+        with self._lock:
+            if executor is not None and self._executor is executor:
+                self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def retry_after(self) -> int:
+        # At least one of the jobs ahead should have finished by then
+        with self._lock:
+            return max(1, math.ceil(self.job_seconds))
+
+
+def open_source(source: bytes | str) -> Image.Image:
+    # Images are passed to jobs as their encoded bytes or as a path, decoding them is left to the job
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def render_frame_job(
+    source: bytes | str,
+    resolution: tuple[int, int],
+    palette: list[int],
+    dither_algorithm: DitherAlgorithm,
+    fit_mode: FitMode,
+    parallel: bool,
+) -> Image.Image:
+    with open_source(source) as image:
+        frame = render_frame(image, resolution, palette, dither_algorithm, fit_mode, parallel)
+        # A palette image that already fits the display is the frame itself, it must be read before it is closed
+        frame.load()
+    return frame
+
+
+def dither_job(
+    base64_image: str,
+    resolution: tuple[int, int],
+    palette: list[int],
+    dither_algorithm: DitherAlgorithm,
+    parallel: bool,
+) -> str:
+    image = base64_to_pil_image(base64_image)
+    # The image is opened lazily, so an image too large to dither is refused before its pixels are decoded
+    is_within_pixel_limit(ImageProbe.from_image(image), resolution, True)
+    return pil_image_to_base64(dither(image, palette, dither_algorithm, parallel))
+
+
+def render_changed_frame_job(
+    source: bytes | str,
+    previous_pixel_hash: str | None,
+    resolution: tuple[int, int],
+    palette: list[int],
+    dither_algorithm: DitherAlgorithm,
+    fit_mode: FitMode,
+    parallel: bool,
+) -> tuple[str, Image.Image | None]:
+    """
+    Hashes the pixels of the image and renders it into a frame for the display, decoding the image once for both. The
+    frame is None when the pixels hash to the previous pixel hash, the picture is unchanged so it is not rendered.
+    """
+    with open_source(source) as image:
+        image_pixel_hash = pixel_hash(image)
+        if image_pixel_hash == previous_pixel_hash:
+            return image_pixel_hash, None
+        frame = render_frame(image, resolution, palette, dither_algorithm, fit_mode, parallel)
+        frame.load()
+    return image_pixel_hash, frame
+
+
+def thumbnail_job(source: bytes | str, size: int) -> bytes:
+    with open_source(source) as image:
+        thumbnail_stream = io.BytesIO()
+        thumbnail_image(image, size).save(thumbnail_stream, "JPEG", quality=85)
+    return thumbnail_stream.getvalue()
@@ -0,0 +1,136 @@
+import os
+import threading
+from collections import OrderedDict
+
+from backend.lib.logger_setup import logger
+
+# Bytes of renditions kept in memory and on disk, the least recently used are evicted beyond these
+MEMORY_BUDGET = 16 * 1024 * 1024
+DISK_BUDGET = 256 * 1024 * 1024
+
+
+class RenditionCache:
+    """
+    Size bounded cache of encoded renditions of images, i.e. thumbnails and panel previews. Renditions are kept in
+    memory and on disk, each with its own byte budget, evicting the least recently used beyond it. Keys are built
+    from the image hash, the size and the display profile of the rendition (see rendition_key).
+    """
+
+    cache_dir: str
+    memory_budget: int
+    disk_budget: int
+    # Renditions in order of use, least recently used first
+    _memory: OrderedDict[str, bytes]
+    _memory_size: int
+    # Sizes of the renditions on disk in order of use, read from the cache directory when first needed
+    _disk: OrderedDict[str, int] | None
+    _disk_size: int
+    _lock: threading.Lock
+
+    def __init__(
+        self, cache_dir: str | None = None, memory_budget: int = MEMORY_BUDGET, disk_budget: int = DISK_BUDGET
+    ):
+        self.cache_dir = cache_dir or os.path.join(os.getenv("DATA_DIR", ""), "renditions")
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None
+        self._disk_size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def rendition_key(image_key: str, kind: str, size: int | str, profile: str | None = None) -> str:
+        # Renditions that do not depend on the display, such as thumbnails, have no profile
+        return f"{image_key}_{kind}_{size}" + (f"_{profile}" if profile else "")
+
+    def rendition_path(self, rendition_key: str) -> str:
+        return os.path.join(self.cache_dir, rendition_key)
+
+    def get(self, rendition_key: str) -> bytes | None:
+        with self._lock:
+            disk = self.load_disk_index()
+            data = self._memory.get(rendition_key)
+            if data is not None:
+                self._memory.move_to_end(rendition_key)
+                if rendition_key in disk:
+                    disk.move_to_end(rendition_key)
+                return data
+
+            if rendition_key not in disk:
+                return None
+            try:
+                with open(self.rendition_path(rendition_key), "rb") as file:
+                    data = file.read()
+            except OSError as err:
+                logger.error(f"Failed to read cached rendition {rendition_key}: {err}")
+                self._disk_size -= disk.pop(rendition_key)
+                return None
+            disk.move_to_end(rendition_key)
+            self.put_in_memory(rendition_key, data)
+            return data
+
+    def put(self, rendition_key: str, data: bytes):
+        with self._lock:
+            self.put_in_memory(rendition_key, data)
+
+            disk = self.load_disk_index()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so a partially written rendition is never read back
+            rendition_path = self.rendition_path(rendition_key)
+            temp_path = f"{rendition_path}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, rendition_path)
+            self._disk_size += len(data) - disk.pop(rendition_key, 0)
+            disk[rendition_key] = len(data)
+            while self._disk_size > self.disk_budget and len(disk) > 1:
+                evicted_key, evicted_size = disk.popitem(last=False)
+                self._disk_size -= evicted_size
+                self.remove_file(evicted_key)
+
+    def put_in_memory(self, rendition_key: str, data: bytes):
+        # Must be called with the lock held
+        self._memory_size += len(data) - len(self._memory.pop(rendition_key, b""))
+        self._memory[rendition_key] = data
+        while self._memory_size > self.memory_budget and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def load_disk_index(self) -> OrderedDict[str, int]:
+        # Must be called with the lock held, renditions left on disk by a previous run are ordered by when they changed
+        if self._disk is None:
+            self._disk = OrderedDict()
+            self._disk_size = 0
+            if os.path.isdir(self.cache_dir):
+                entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_file()]
+                for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+                    if entry.name.endswith(".tmp"):
+                        continue
+                    self._disk[entry.name] = entry.stat().st_size
+                    self._disk_size += self._disk[entry.name]
+        return self._disk
+
+    def remove_file(self, rendition_key: str):
+        try:
+            os.remove(self.rendition_path(rendition_key))
+        except FileNotFoundError:
+            pass
+
+    def evict_profiles_except(self, profile: str):
+        # Renditions made for any other display profile can no longer be shown, so remove them
+        with self._lock:
+            disk = self.load_disk_index()
+            for rendition_key in [key for key in [*self._memory, *disk] if self.has_other_profile(key, profile)]:
+                if rendition_key in self._memory:
+                    self._memory_size -= len(self._memory.pop(rendition_key))
+                if rendition_key in disk:
+                    self._disk_size -= disk.pop(rendition_key)
+                    self.remove_file(rendition_key)
+        logger.info(f"Evicted renditions for display profiles other than {profile}")
+
+    @staticmethod
+    def has_other_profile(rendition_key: str, profile: str) -> bool:
+        # Keys are <image hash>_<kind>_<size>[_<profile>]
+        parts = rendition_key.split("_", 3)
+        return len(parts) == 4 and parts[3] != profile
@@ -0,0 +1,150 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from enum import Enum
+
+from backend.lib.logger_setup import logger
+from backend.models.display_model import DisplaySettings
+
+SettingsCallback = Callable[[DisplaySettings, bool], None]
+
+# Finished operations kept for polling, the oldest are forgotten beyond this
+MAX_FINISHED_OPERATIONS = 100
+
+
+class OperationStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class SettingsOperation:
+    id: str
+    status: OperationStatus
+    # Seconds since the epoch
+    submitted_at: float
+    finished_at: float | None = None
+    errors: tuple[str, ...] = ()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (OperationStatus.SUCCEEDED, OperationStatus.FAILED)
+
+
+@dataclass
+class PendingUpdate:
+    settings: DisplaySettings
+    display_has_changed: bool
+    callbacks: list[SettingsCallback]
+    operation_ids: list[str]
+
+
+class SettingsDispatcher:
+    """
+    Delivers settings updates to their subscribers on a thread of its own, so a request that changes the settings does
+    not wait for the workers to restart. Updates made while an earlier one is being delivered are coalesced, only the
+    latest settings are delivered, and the display counts as changed if it changed in any of them.
+
+    Each update is given an operation id, the operation succeeds once the update it was coalesced into is delivered.
+    """
+
+    _pending: PendingUpdate | None
+    _operations: OrderedDict[str, SettingsOperation]
+    _condition: threading.Condition
+    _thread: threading.Thread | None
+    _stopped: bool
+
+    def __init__(self):
+        self._pending = None
+        self._operations = OrderedDict()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(
+        self, settings: DisplaySettings, display_has_changed: bool, callbacks: list[SettingsCallback]
+    ) -> SettingsOperation:
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Settings updates are no longer being delivered, the app is shutting down")
+            operation = SettingsOperation(uuid.uuid4().hex, OperationStatus.PENDING, time.time())
+            self._operations[operation.id] = operation
+            if self._pending is None:
+                self._pending = PendingUpdate(settings, display_has_changed, callbacks, [operation.id])
+            else:
+                logger.info(f"Coalescing settings update with {len(self._pending.operation_ids)} pending")
+                self._pending = PendingUpdate(
+                    settings,
+                    self._pending.display_has_changed or display_has_changed,
+                    callbacks,
+                    [*self._pending.operation_ids, operation.id],
+                )
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="settings_dispatcher", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+            return operation
+
+    def get_operation(self, operation_id: str) -> SettingsOperation | None:
+        with self._condition:
+            return self._operations.get(operation_id)
+
+    def wait(self, operation_id: str, timeout: float | None = None) -> SettingsOperation | None:
+        # Waits until the operation has finished, returns it as it is when the wait ends
+        with self._condition:
+            self._condition.wait_for(
+                lambda: operation_id not in self._operations or self._operations[operation_id].finished, timeout
+            )
+            return self._operations.get(operation_id)
+
+    def stop(self):
+        # Stops taking updates, an update being delivered is finished first, updates not yet delivered are dropped
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._stopped)
+                if self._stopped:
+                    return
+                update = self._pending
+                self._pending = None
+                self.set_status(update.operation_ids, OperationStatus.RUNNING)
+
+            errors = []
+            for callback in update.callbacks:
+                try:
+                    callback(update.settings, update.display_has_changed)
+                except Exception as err:  # noqa: BLE001 - a failed subscriber fails the operation, the rest still run
+                    logger.exception(err)
+                    logger.error(f"Failed to apply settings update: {err}")
+                    errors.append(str(err))
+
+            with self._condition:
+                status = OperationStatus.FAILED if errors else OperationStatus.SUCCEEDED
+                self.set_status(update.operation_ids, status, tuple(errors))
+                self._condition.notify_all()
+
+    def set_status(self, operation_ids: list[str], status: OperationStatus, errors: tuple[str, ...] = ()):
+        # Must be called with the condition held
+        for operation_id in operation_ids:
+            operation = replace(self._operations[operation_id], status=status, errors=errors)
+            if operation.finished:
+                # Finished operations are kept in the order they finished, so the oldest are forgotten first
+                self._operations[operation_id] = replace(operation, finished_at=time.time())
+                self._operations.move_to_end(operation_id)
+            else:
+                self._operations[operation_id] = operation
+        finished_ids = [operation.id for operation in self._operations.values() if operation.finished]
+        for operation_id in finished_ids[: max(0, len(finished_ids) - MAX_FINISHED_OPERATIONS)]:
+            del self._operations[operation_id]
@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from backend.lib.logger_setup import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    namespace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (namespace, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS slideshow_images (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slideshow_images_position ON slideshow_images (position);
+"""
+
+SLIDESHOW_IMAGE_COLUMNS = ("id", "key", "format", "size")
+
+
+class StateStore:
+    """
+    The state of the app, i.e. the display settings, the slideshow and the image feed configuration, kept in a SQLite
+    database in WAL mode. Each namespace of state is stored a row per field, and the slideshow a row per image, so an
+    update only writes the rows that changed, and each update is committed atomically.
+
+    State used to be stored as whole JSON files, see read_json_state and retire_json_state for importing them.
+    """
+
+    db_path: str
+    _connection: sqlite3.Connection | None
+    _lock: threading.Lock
+
+    def __init__(self, db_path: str | None = None):
+        self.db_path = db_path or os.path.join(os.getenv("DATA_DIR", ""), "state.db")
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        # Must be called with the lock held, the database is opened when first needed
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            # Autocommit mode, transactions are begun explicitly (see transaction)
+            connection = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # A commit in WAL mode is atomic with NORMAL, only the last commits can be lost on power loss
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    @contextmanager
+    def transaction(self, write: bool = True) -> Iterator[sqlite3.Connection]:
+        # A write transaction takes the write lock of the database up front, a read sees the database as it was when
+        # the transaction began
+        with self._lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def get_state(self, namespace: str) -> dict[str, Any] | None:
+        # Returns None when nothing has been stored in the namespace
+        with self.transaction(write=False) as connection:
+            rows = connection.execute("SELECT name, value FROM state WHERE namespace = ?", (namespace,)).fetchall()
+        return {name: json.loads(value) for name, value in rows} or None
+
+    def put_state(self, namespace: str, fields: dict[str, Any]):
+        with self.transaction() as connection:
+            self.write_fields(connection, namespace, fields)
+
+    def get_slideshow(self) -> dict[str, Any] | None:
+        # The slideshow fields and its images in the order they are shown, or None if no slideshow has been stored
+        with self.transaction(write=False) as connection:
+            rows = connection.execute("SELECT name, value FROM state WHERE namespace = 'slideshow'").fetchall()
+            images = connection.execute(
+                f"SELECT {', '.join(SLIDESHOW_IMAGE_COLUMNS)} FROM slideshow_images ORDER BY position"
+            ).fetchall()
+        if not rows:
+            return None
+        return {
+            **{name: json.loads(value) for name, value in rows},
+            "images": [dict(zip(SLIDESHOW_IMAGE_COLUMNS, image)) for image in images],
+        }
+
+    def put_slideshow(self, fields: dict[str, Any], images: list[dict[str, Any]]):
+        # Stores the slideshow fields and its images together, only the images that were added, removed or moved are
+        # written
+        with self.transaction() as connection:
+            self.write_fields(connection, "slideshow", fields)
+            stored = dict(connection.execute("SELECT id, position FROM slideshow_images"))
+            image_ids = {image["id"] for image in images}
+            connection.executemany(
+                "DELETE FROM slideshow_images WHERE id = ?",
+                [(image_id,) for image_id in stored if image_id not in image_ids],
+            )
+            connection.executemany(
+                "INSERT INTO slideshow_images (id, position, key, format, size) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET position = excluded.position",
+                [
+                    (image["id"], position, image["key"], image["format"], image["size"])
+                    for position, image in enumerate(images)
+                    if stored.get(image["id"]) != position
+                ],
+            )
+
+    @staticmethod
+    def write_fields(connection: sqlite3.Connection, namespace: str, fields: dict[str, Any]):
+        # Only the fields whose value has changed are written
+        stored = dict(connection.execute("SELECT name, value FROM state WHERE namespace = ?", (namespace,)))
+        changed = [
+            (namespace, name, value)
+            for name, value in ((name, json.dumps(value)) for name, value in fields.items())
+            if stored.get(name) != value
+        ]
+        connection.executemany(
+            "INSERT INTO state (namespace, name, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (namespace, name) DO UPDATE SET value = excluded.value",
+            changed,
+        )
+
+    def json_state_path(self, file_name: str) -> str:
+        # JSON files were stored in the data directory, where the database is
+        return os.path.join(os.path.dirname(os.path.abspath(self.db_path)), file_name)
+
+    def read_json_state(self, file_name: str) -> dict[str, Any] | None:
+        # Reads state stored as a JSON file by earlier versions, to import it
+        try:
+            with open(self.json_state_path(file_name), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def retire_json_state(self, file_name: str):
+        # Once imported, the JSON file is kept beside the database rather than read again
+        path = self.json_state_path(file_name)
+        os.replace(path, f"{path}.imported")
+        logger.info(f"Imported {file_name} into the state database")
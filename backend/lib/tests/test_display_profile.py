@@ -0,0 +1,40 @@
+import pytest
+
+from backend.lib.display_profile import DISPLAY_PROFILES, resolve_profile_from_settings
+from backend.lib.display_utilis import construct_palette, is_small_display, resolve_display_from_settings
+from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings, DisplayType
+
+
+@pytest.mark.parametrize("display_type, colour_palette", list(DISPLAY_PROFILES))
+def test_profiles_match_drivers(display_type, colour_palette):
+    display_settings = DisplaySettings(
+        type=display_type, colour_palette=colour_palette, border_colour=BorderColour.WHITE
+    )
+    display = resolve_display_from_settings(display_settings)
+    profile = resolve_profile_from_settings(display_settings)
+
+    assert profile.resolution == display.resolution
+    assert list(profile.palette) == construct_palette(display)
+    assert (profile.white, profile.black, profile.red) == (display.WHITE, display.BLACK, display.RED)
+    assert profile.small == is_small_display(display)
+
+
+def test_every_display_type_has_a_profile():
+    assert {display_type for display_type, _ in DISPLAY_PROFILES} == set(DisplayType)
+
+
+def test_single_palette_displays_ignore_colour_setting():
+    display_settings = DisplaySettings(
+        type=DisplayType.SPECTRA_480, colour_palette=ColourPalette.RED, border_colour=BorderColour.WHITE
+    )
+
+    assert resolve_profile_from_settings(display_settings).colour_palette == ColourPalette.SPECTRA
+
+
+def test_unsupported_colour_is_refused():
+    display_settings = DisplaySettings(
+        type=DisplayType.PHAT_104, colour_palette=ColourPalette.SPECTRA, border_colour=BorderColour.WHITE
+    )
+
+    with pytest.raises(ValueError):
+        resolve_profile_from_settings(display_settings)
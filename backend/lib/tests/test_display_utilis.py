@@ -0,0 +1,105 @@
+import subprocess
+import sys
+
+import pytest
+from inky import InkyPHAT_SSD1608
+from inky.eeprom import EPDType
+
+from backend.lib import display_utilis
+from backend.lib.display_utilis import (
+    create_detected_display,
+    get_display_detection,
+    resolve_display_from_eeprom,
+    resolve_display_type_from_variant,
+)
+from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings, DisplayType
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    # Count the probes, each finds the EEPROM of a red pHAT
+    probes = []
+
+    def detect_inky_display():
+        probes.append(True)
+        return EPDType(250, 122, color="red", pcb_variant=12, display_variant=12)
+
+    monkeypatch.setattr(display_utilis, "detect_inky_display", detect_inky_display)
+    monkeypatch.setattr(display_utilis, "_detection", None)
+    return probes
+
+
+def test_detection_is_probed_once(probes):
+    detection = get_display_detection()
+
+    assert (detection.display_type, detection.colour_palette) == (DisplayType.PHAT_122, ColourPalette.RED)
+    assert get_display_detection() is detection
+    assert len(probes) == 1
+
+
+def test_forced_detection_probes_again(probes):
+    detection = get_display_detection()
+
+    assert get_display_detection(force=True) is not detection
+    assert len(probes) == 2
+
+
+def test_detected_display_is_created_without_probing(probes):
+    display_settings = DisplaySettings(
+        type=DisplayType.SPECTRA_480, colour_palette=ColourPalette.SPECTRA, border_colour=BorderColour.WHITE
+    )
+    get_display_detection()
+
+    display = create_detected_display(display_settings)
+    assert isinstance(display, InkyPHAT_SSD1608)
+    assert display.colour == "red"
+    assert len(probes) == 1
+
+
+def test_display_is_resolved_from_eeprom():
+    what = EPDType(400, 300, color="yellow", pcb_variant=12, display_variant=2)
+    spectra = EPDType(800, 480, color="spectra6", pcb_variant=12, display_variant=22)
+
+    assert resolve_display_from_eeprom(what) == (DisplayType.WHAT_300, ColourPalette.YELLOW)
+    assert resolve_display_from_eeprom(spectra) == (DisplayType.SPECTRA_480, ColourPalette.SPECTRA)
+
+
+@pytest.mark.parametrize(
+    ("display_variant", "resolution", "display_type"),
+    [
+        (1, (212, 104), DisplayType.PHAT_104),
+        (7, (400, 300), DisplayType.WHAT_300),
+        (12, (250, 122), DisplayType.PHAT_122),
+        (14, (600, 448), DisplayType.IMPRESSION_448),
+        (15, (640, 400), DisplayType.IMPRESSION_400),
+        (26, (800, 480), DisplayType.SPECTRA_480),
+        (27, (1600, 1200), DisplayType.SPECTRA_1200),
+        # Red/yellow wHAT (SSD2683) has no driver here, nor do variants inky does not know
+        (28, (400, 300), None),
+        (0, (400, 300), None),
+        (99, (400, 300), None),
+    ],
+)
+def test_display_type_is_found_from_inky_variant_name(display_variant, resolution, display_type):
+    eeprom = EPDType(*resolution, color="red", pcb_variant=12, display_variant=display_variant)
+
+    assert resolve_display_type_from_variant(eeprom) == display_type
+
+
+def test_unsupported_eeprom_is_refused(probes, monkeypatch):
+    ssd2683 = EPDType(400, 300, color="red/yellow", pcb_variant=12, display_variant=28)
+    monkeypatch.setattr(display_utilis, "detect_inky_display", lambda: ssd2683)
+
+    with pytest.raises(ValueError):
+        resolve_display_from_eeprom(ssd2683)
+    detection = get_display_detection()
+    assert detection.unsupported
+    assert detection.display_type is None
+
+
+def test_drivers_are_not_imported_until_a_display_is_created():
+    # A fresh interpreter, as the drivers are imported by other tests
+    code = "import sys; import backend.lib.display_utilis; print('inky' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,44 @@
+from backend.lib.dither_cache import DitherCache
+from backend.models.display_model import DitherAlgorithm
+
+palette = [255, 255, 255, 0, 0, 0]
+
+
+def test_dither_key_depends_on_palette_and_parameters():
+    dither_key = DitherCache.dither_key("abc", palette, DitherAlgorithm.FLOYD_STEINBERG)
+
+    assert dither_key == DitherCache.dither_key("abc", list(palette), DitherAlgorithm.FLOYD_STEINBERG)
+    assert dither_key != DitherCache.dither_key("abc", [*palette, 255, 0, 0], DitherAlgorithm.FLOYD_STEINBERG)
+    assert dither_key != DitherCache.dither_key("abc", palette, DitherAlgorithm.ATKINSON)
+    assert dither_key != DitherCache.dither_key("def", palette, DitherAlgorithm.FLOYD_STEINBERG)
+
+
+def test_counts_hits_and_misses():
+    dither_cache = DitherCache(1024)
+
+    assert dither_cache.get("abc") is None
+    dither_cache.put("abc", "dithered")
+    assert dither_cache.get("abc") == "dithered"
+
+    stats = dither_cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["size"]) == (1, 1, 1, 8)
+
+
+def test_evicts_least_recently_used_beyond_budget():
+    dither_cache = DitherCache(20)
+    dither_cache.put("first", "0" * 10)
+    dither_cache.put("second", "1" * 10)
+    dither_cache.get("first")
+    dither_cache.put("third", "2" * 10)
+
+    assert dither_cache.get("second") is None
+    assert dither_cache.get("first") == "0" * 10
+    assert dither_cache.get("third") == "2" * 10
+
+
+def test_does_not_cache_images_larger_than_budget():
+    dither_cache = DitherCache(4)
+    dither_cache.put("abc", "dithered")
+
+    assert dither_cache.get("abc") is None
+    assert dither_cache.get_stats()["size"] == 0
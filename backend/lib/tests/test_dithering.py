@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.lib.dithering import (
+    DITHERERS,
+    ERROR_DIFFUSION_KERNELS,
+    bayer_matrix,
+    blue_noise_matrix,
+    create_ditherer,
+    dither,
+    dither_bands,
+    wavefront_slope,
+)
+from backend.models.display_model import DitherAlgorithm
+
+# white, black, red
+palette = [255, 255, 255, 0, 0, 0, 255, 0, 0]
+# Floyd-Steinberg is dithered by Pillow rather than this engine
+algorithms = list(DITHERERS)
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    # Palette lookup tables are written under DATA_DIR
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+
+@pytest.mark.parametrize("algorithm", algorithms)
+def test_dither_returns_palette_image(algorithm):
+    image = Image.linear_gradient("L").resize((50, 30)).convert("RGB")
+
+    dithered_image = dither(image, palette, algorithm)
+
+    assert dithered_image.mode == "P"
+    assert dithered_image.size == (50, 30)
+    assert dithered_image.getpalette()[:9] == palette
+    assert set(np.unique(np.asarray(dithered_image))) <= {0, 1, 2}
+
+
+@pytest.mark.parametrize("algorithm", algorithms)
+def test_palette_colours_are_kept(algorithm):
+    image = Image.new("RGB", (20, 10), (255, 0, 0))
+
+    dithered_image = dither(image, palette, algorithm)
+
+    assert np.all(np.asarray(dithered_image) == 2)
+
+
+@pytest.mark.parametrize("algorithm", algorithms)
+def test_mid_grey_is_half_black_half_white(algorithm):
+    image = Image.new("RGB", (64, 64), (128, 128, 128))
+
+    indices = np.asarray(dither(image, [255, 255, 255, 0, 0, 0], algorithm))
+
+    assert 0.4 < (indices == 0).mean() < 0.6
+
+
+def test_wavefront_slope():
+    assert wavefront_slope(ERROR_DIFFUSION_KERNELS[DitherAlgorithm.ATKINSON][0]) == 2
+    assert wavefront_slope(ERROR_DIFFUSION_KERNELS[DitherAlgorithm.STUCKI][0]) == 3
+
+
+def test_threshold_matrices_contain_every_level_once():
+    bayer = bayer_matrix(3)
+    blue_noise = blue_noise_matrix(16)
+
+    assert len(np.unique(bayer)) == 64
+    assert len(np.unique(blue_noise)) == 256
+    assert 0 < bayer.min() and bayer.max() < 1
+
+
+@pytest.mark.parametrize("algorithm", algorithms)
+def test_dither_bands_matches_whole_image(algorithm):
+    image = Image.radial_gradient("L").resize((70, 45)).convert("RGB")
+
+    whole_image = np.asarray(dither(image, palette, algorithm))
+    bands = list(dither_bands(image, palette, algorithm, band_rows=4))
+
+    assert len(bands) == 12
+    assert np.array_equal(np.concatenate(bands), whole_image)
+
+
+def test_error_diffusion_reuses_its_work_buffer():
+    rgb = np.asarray(Image.radial_gradient("L").resize((70, 45)).convert("RGB"))
+    ditherer = create_ditherer(70, palette, DitherAlgorithm.ATKINSON)
+
+    ditherer.dither_band(rgb[:20])
+    work = ditherer.work
+    ditherer.dither_band(rgb[20:40])
+    ditherer.dither_band(rgb[40:])
+
+    # Memory use is bounded by the first band, every band after it is dithered in the same buffer
+    assert ditherer.work is work
+    assert work.shape[0] == 20 + ditherer.pad_rows
+
+
+def test_dither_bands_box():
+    image = Image.radial_gradient("L").resize((70, 45)).convert("RGB")
+
+    bands = list(dither_bands(image, palette, DitherAlgorithm.STUCKI, box=(10, 5, 60, 25), band_rows=8))
+
+    assert np.array_equal(
+        np.concatenate(bands), np.asarray(dither(image.crop((10, 5, 60, 25)), palette, DitherAlgorithm.STUCKI))
+    )
+
+
+def test_floyd_steinberg_is_not_dithered_by_the_engine():
+    assert DitherAlgorithm.FLOYD_STEINBERG not in algorithms
+    with pytest.raises(ValueError):
+        create_ditherer(10, palette, DitherAlgorithm.FLOYD_STEINBERG)
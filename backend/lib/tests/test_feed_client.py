@@ -0,0 +1,103 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.lib.feed_client import FeedClient
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(2000)
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/image" and self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/image":
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(IMAGE)))
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            self.wfile.write(IMAGE)
+        elif self.path == "/html":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", "4")
+            self.end_headers()
+            self.wfile.write(b"oops")
+        elif self.path == "/unknown-length":
+            # Without a Content-Length the body is read until the connection closes
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(IMAGE)
+            self.close_connection = True
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def feed_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_fetch_image(feed_url):
+    client = FeedClient()
+
+    response = client.fetch(f"{feed_url}/image")
+
+    assert response.status_code == 200
+    assert response.content == IMAGE
+    assert response.headers["ETag"] == '"v1"'
+    assert response.timings.connect > 0
+
+
+def test_connection_is_kept_alive(feed_url):
+    client = FeedClient()
+    client.fetch(f"{feed_url}/image")
+
+    response = client.fetch(f"{feed_url}/image")
+
+    assert response.timings.connect == 0
+
+
+def test_not_modified(feed_url):
+    response = FeedClient().fetch(f"{feed_url}/image", {"If-None-Match": '"v1"'})
+
+    assert response.status_code == 304
+    assert response.content is None
+
+
+def test_rejects_content_type(feed_url):
+    with pytest.raises(ValueError, match="text/html"):
+        FeedClient().fetch(f"{feed_url}/html")
+
+
+def test_rejects_content_length(feed_url):
+    with pytest.raises(ValueError, match="larger than the limit"):
+        FeedClient().fetch(f"{feed_url}/image", max_bytes=1000)
+
+
+def test_rejects_oversize_body(feed_url):
+    with pytest.raises(ValueError, match="larger than the limit"):
+        FeedClient().fetch(f"{feed_url}/unknown-length", max_bytes=1000)
+
+
+def test_raises_for_error_status(feed_url):
+    with pytest.raises(Exception, match="404"):
+        FeedClient().fetch(f"{feed_url}/missing")
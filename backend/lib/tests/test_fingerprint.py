@@ -0,0 +1,69 @@
+import base64
+import io
+
+from PIL import Image, PngImagePlugin
+
+from backend.lib.fingerprint import (
+    PIXEL_HASH_ROWS,
+    Fingerprint,
+    base64_content_hash,
+    content_hash,
+    fingerprint,
+    pixel_hash,
+)
+
+
+def png_bytes(image: Image.Image, comment: str | None = None) -> bytes:
+    png_stream = io.BytesIO()
+    png_info = PngImagePlugin.PngInfo()
+    if comment:
+        png_info.add_text("Comment", comment)
+    image.save(png_stream, "PNG", pnginfo=png_info)
+    return png_stream.getvalue()
+
+
+def test_content_hash_matches_base64_content_hash():
+    data = png_bytes(Image.new("RGB", (2, 2), (255, 0, 0)))
+
+    assert content_hash(data) == base64_content_hash(base64.b64encode(data).decode("utf-8"))
+    assert len(content_hash(data)) == 64
+
+
+def test_pixel_hash_ignores_metadata():
+    image = Image.radial_gradient("L").convert("RGB")
+    first = png_bytes(image, "taken at 10:00")
+    second = png_bytes(image, "taken at 10:05")
+
+    assert content_hash(first) != content_hash(second)
+    assert pixel_hash(Image.open(io.BytesIO(first))) == pixel_hash(Image.open(io.BytesIO(second)))
+
+
+def test_pixel_hash_depends_on_pixels_size_and_palette():
+    image = Image.new("RGB", (4, PIXEL_HASH_ROWS + 3), (255, 255, 255))
+    changed = image.copy()
+    # The change is in the last band of rows hashed
+    changed.putpixel((3, PIXEL_HASH_ROWS + 2), (0, 0, 0))
+
+    assert pixel_hash(image) != pixel_hash(changed)
+    assert pixel_hash(image) != pixel_hash(image.resize((image.height, image.width)))
+
+    palette_image = Image.new("P", (2, 2), 0)
+    palette_image.putpalette([0, 0, 0, 255, 255, 255])
+    recoloured = palette_image.copy()
+    recoloured.putpalette([255, 0, 0, 255, 255, 255])
+    assert pixel_hash(palette_image) != pixel_hash(recoloured)
+
+
+def test_fingerprint_matches():
+    image = Image.new("RGB", (2, 2), (255, 0, 0))
+    first = png_bytes(image, "first")
+    second = png_bytes(image, "second")
+
+    assert fingerprint(first) == Fingerprint(content_hash(first))
+    assert fingerprint(first).matches(fingerprint(first))
+    assert not fingerprint(first).matches(fingerprint(second))
+    assert not fingerprint(first).matches(None)
+    # Re-encoded images are recognised once their pixels have been hashed
+    assert fingerprint(first, image).matches(fingerprint(second, image))
+    assert fingerprint(first, image).identity == fingerprint(second, image).identity
+    assert fingerprint(first).identity == content_hash(first)
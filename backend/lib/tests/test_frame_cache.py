@@ -0,0 +1,73 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from backend.lib.frame_cache import FrameCache
+from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings, DisplayType
+
+
+@pytest.fixture
+def display_settings():
+    return DisplaySettings(
+        type=DisplayType.PHAT_RED_YELLOW_122,
+        colour_palette=ColourPalette.RED_YELLOW,
+        border_colour=BorderColour.WHITE,
+    )
+
+
+@pytest.fixture
+def frame():
+    frame = Image.new("P", (4, 2), 1)
+    frame.putpalette([0, 0, 0, 255, 255, 255, 255, 0, 0, 255, 255, 0])
+    return frame
+
+
+def test_source_key_depends_on_image_content():
+    png_stream = io.BytesIO()
+    Image.new("RGB", (2, 2), (255, 0, 0)).save(png_stream, "PNG")
+    base64_image = base64.b64encode(png_stream.getvalue()).decode("utf-8")
+
+    assert FrameCache.source_key(base64_image) == FrameCache.source_key(base64_image)
+    assert len(FrameCache.source_key(base64_image)) == 64
+
+
+def test_put_and_get_frame(tmp_path, display_settings, frame):
+    frame_cache = FrameCache(str(tmp_path))
+    assert frame_cache.get("abc", display_settings) is None
+
+    frame_cache.put("abc", display_settings, frame)
+
+    cached_frame = frame_cache.get("abc", display_settings)
+    assert cached_frame is not None
+    assert cached_frame.mode == "P"
+    assert cached_frame.tobytes() == frame.tobytes()
+    assert frame_cache.contains("abc", display_settings)
+
+
+def test_profile_key_is_a_valid_directory_name(display_settings):
+    assert "/" not in FrameCache.profile_key(display_settings)
+
+
+def test_prune_removes_unused_frames(tmp_path, display_settings, frame):
+    frame_cache = FrameCache(str(tmp_path))
+    frame_cache.put("keep", display_settings, frame)
+    frame_cache.put("remove", display_settings, frame)
+
+    frame_cache.prune({"keep"}, display_settings)
+
+    assert frame_cache.contains("keep", display_settings)
+    assert not frame_cache.contains("remove", display_settings)
+
+
+def test_evict_other_display_profiles(tmp_path, display_settings, frame):
+    frame_cache = FrameCache(str(tmp_path))
+    other_settings = display_settings.model_copy(update={"border_colour": BorderColour.BLACK})
+    frame_cache.put("abc", display_settings, frame)
+    frame_cache.put("abc", other_settings, frame)
+
+    frame_cache.evict_profiles_except(display_settings)
+
+    assert frame_cache.contains("abc", display_settings)
+    assert not frame_cache.contains("abc", other_settings)
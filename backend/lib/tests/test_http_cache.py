@@ -0,0 +1,48 @@
+from backend.lib.http_cache import (
+    MAX_POLL_DELAY,
+    conditional_request_headers,
+    freshness_lifetime,
+    next_poll_delay,
+)
+
+
+def test_conditional_request_headers():
+    assert conditional_request_headers('"abc"', "Wed, 21 Oct 2015 07:28:00 GMT") == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+    assert conditional_request_headers(None, None) == {}
+
+
+def test_freshness_from_max_age():
+    assert freshness_lifetime({"Cache-Control": "public, max-age=900"}) == 900
+    # Time already spent in caches is taken off
+    assert freshness_lifetime({"Cache-Control": "max-age=900", "Age": "100"}) == 800
+
+
+def test_max_age_takes_precedence_over_expires():
+    headers = {
+        "Cache-Control": "max-age=60",
+        "Date": "Wed, 21 Oct 2015 07:00:00 GMT",
+        "Expires": "Wed, 21 Oct 2015 08:00:00 GMT",
+    }
+    assert freshness_lifetime(headers) == 60
+
+
+def test_freshness_from_expires():
+    headers = {"Date": "Wed, 21 Oct 2015 07:00:00 GMT", "Expires": "Wed, 21 Oct 2015 08:00:00 GMT"}
+    assert freshness_lifetime(headers) == 3600
+    assert freshness_lifetime({"Expires": "0"}) == 0
+
+
+def test_no_cache():
+    assert freshness_lifetime({"Cache-Control": "no-cache, max-age=900"}) == 0
+    assert freshness_lifetime({}) is None
+
+
+def test_next_poll_delay():
+    assert next_poll_delay(120, {}) == 120
+    # Never poll faster than the polling interval
+    assert next_poll_delay(120, {"Cache-Control": "max-age=30"}) == 120
+    assert next_poll_delay(120, {"Cache-Control": "max-age=900"}) == 900
+    assert next_poll_delay(120, {"Cache-Control": "max-age=31536000"}) == MAX_POLL_DELAY
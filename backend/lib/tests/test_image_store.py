@@ -0,0 +1,44 @@
+import base64
+import os
+
+import pytest
+
+from backend.lib.fingerprint import content_hash
+from backend.lib.image_store import ImageStore
+
+
+def test_put_and_get_image(tmp_path):
+    image_store = ImageStore(str(tmp_path))
+    image_key = image_store.put(b"image bytes")
+
+    assert image_key == content_hash(b"image bytes")
+    assert image_store.contains(image_key)
+    assert image_store.get(image_key) == b"image bytes"
+    assert image_store.get_base64(image_key) == base64.b64encode(b"image bytes").decode("utf-8")
+    assert os.path.isfile(os.path.join(tmp_path, image_key[:2], image_key))
+
+
+def test_put_stores_an_image_once(tmp_path):
+    image_store = ImageStore(str(tmp_path))
+    image_key = image_store.put_base64(base64.b64encode(b"image bytes").decode("utf-8"))
+
+    assert image_store.put(b"image bytes") == image_key
+    assert os.listdir(os.path.join(tmp_path, image_key[:2])) == [image_key]
+
+
+def test_image_keys_must_be_hashes(tmp_path):
+    image_store = ImageStore(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        image_store.image_path("../settings.json")
+
+
+def test_prune_removes_unreferenced_images(tmp_path):
+    image_store = ImageStore(str(tmp_path))
+    keep = image_store.put(b"keep")
+    remove = image_store.put(b"remove")
+
+    image_store.prune({keep})
+
+    assert image_store.contains(keep)
+    assert not image_store.contains(remove)
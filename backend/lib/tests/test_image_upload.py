@@ -0,0 +1,72 @@
+import io
+
+import pytest
+
+from backend.lib.image_upload import ImageTooLargeError, ImageUpload, read_body, read_multipart_file
+
+png_data = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 1024
+
+
+def multipart_body(boundary: str, file_data: bytes) -> bytes:
+    return (
+        (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="caption"\r\n\r\nholiday\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="image.png"\r\n'
+            "Content-Type: image/png\r\n\r\n"
+        ).encode()
+        + file_data
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+
+
+def test_upload_passes_valid_image_through():
+    upload = ImageUpload(read_body(io.BytesIO(png_data)), len(png_data))
+
+    assert b"".join(upload) == png_data
+    assert upload.format == "png"
+    assert upload.size == len(png_data)
+
+
+def test_upload_checks_format_from_small_chunks():
+    upload = ImageUpload(iter([b"\xff\xd8", b"\xff\xe0", b"rest of the jpeg"]), 1024)
+
+    assert b"".join(upload) == b"\xff\xd8\xff\xe0rest of the jpeg"
+    assert upload.format == "jpeg"
+
+
+def test_upload_rejects_other_formats_before_reading_them():
+    chunks_read = []
+
+    def chunks():
+        for chunk in (b"GIF89a\x00\x00", b"more", b"more"):
+            chunks_read.append(chunk)
+            yield chunk
+
+    with pytest.raises(ValueError):
+        b"".join(ImageUpload(chunks(), 1024))
+    assert len(chunks_read) == 1
+
+
+def test_upload_rejects_images_over_size_limit():
+    with pytest.raises(ImageTooLargeError):
+        b"".join(ImageUpload(read_body(io.BytesIO(png_data)), len(png_data) - 1))
+
+
+def test_read_multipart_file():
+    body = multipart_body("boundary123", png_data)
+
+    assert b"".join(read_multipart_file(io.BytesIO(body), "boundary123")) == png_data
+
+
+def test_read_multipart_without_file():
+    body = b'--boundary123\r\nContent-Disposition: form-data; name="caption"\r\n\r\nholiday\r\n--boundary123--\r\n'
+
+    with pytest.raises(ValueError):
+        b"".join(read_multipart_file(io.BytesIO(body), "boundary123"))
+
+
+def test_read_truncated_multipart():
+    body = multipart_body("boundary123", png_data)[:-100]
+
+    with pytest.raises(ValueError):
+        b"".join(read_multipart_file(io.BytesIO(body), "boundary123"))
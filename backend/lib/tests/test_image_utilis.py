@@ -0,0 +1,137 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.lib import parallel_dithering
+from backend.lib.image_utilis import (
+    changed_pixel_fraction,
+    dither,
+    dither_to_frame,
+    dithers_in_parallel,
+    find_white_index,
+    fit_image,
+    pad_image,
+)
+from backend.models.display_model import DitherAlgorithm, FitMode
+
+# white, black, red
+palette = [255, 255, 255, 0, 0, 0, 255, 0, 0]
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+
+def jpeg_image(size: tuple[int, int]) -> Image.Image:
+    jpeg_stream = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(jpeg_stream, "JPEG")
+    jpeg_stream.seek(0)
+    return Image.open(jpeg_stream)
+
+
+@pytest.mark.parametrize(
+    "fit_mode, expected_size",
+    [
+        (FitMode.CROP, (1200, 800)),
+        (FitMode.FIT, (400, 267)),
+        (FitMode.FILL, (400, 300)),
+        (FitMode.STRETCH, (400, 300)),
+    ],
+)
+def test_fit_image_sizes(fit_mode, expected_size):
+    image = fit_image(Image.new("RGB", (1200, 800)), (400, 300), fit_mode)
+
+    assert image.size == expected_size
+
+
+def test_fit_image_upscales_small_images():
+    image = fit_image(Image.new("RGB", (100, 50)), (400, 300), FitMode.FIT)
+
+    assert image.size == (400, 200)
+
+
+def test_fit_image_drafts_jpeg():
+    image = jpeg_image((1600, 1200))
+
+    fitted_image = fit_image(image, (400, 300), FitMode.FILL)
+
+    # The JPEG is decoded at a quarter of its size before being resized
+    assert image.size == (400, 300)
+    assert fitted_image.size == (400, 300)
+
+
+def test_fill_keeps_centre_of_image():
+    image = Image.new("RGB", (300, 100), (255, 0, 0))
+    image.paste((0, 0, 255), (100, 0, 200, 100))
+
+    fitted_image = fit_image(image, (100, 100), FitMode.FILL)
+
+    assert fitted_image.getpixel((0, 0)) == (0, 0, 255)
+    assert fitted_image.getpixel((99, 99)) == (0, 0, 255)
+
+
+def test_find_white_index():
+    assert find_white_index([0, 0, 0, 255, 0, 0, 255, 255, 255]) == 2
+    assert find_white_index(None) == 0
+
+
+def test_floyd_steinberg_is_dithered_by_pillow(monkeypatch):
+    image = Image.radial_gradient("L").resize((40, 30)).convert("RGB")
+    palette_image = Image.new("P", (1, 1))
+    palette_image.putpalette(palette + [0, 0, 0] * 253)
+
+    def not_parallel(*args):
+        raise AssertionError("Floyd-Steinberg must not be dithered in parallel")
+
+    # The parallel option is ignored for Floyd-Steinberg
+    monkeypatch.setattr(parallel_dithering, "dither", not_parallel)
+    monkeypatch.setattr(parallel_dithering, "dither_indices", not_parallel)
+    assert not dithers_in_parallel(DitherAlgorithm.FLOYD_STEINBERG, True)
+    assert dithers_in_parallel(DitherAlgorithm.ATKINSON, True)
+    expected_image = image.quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+    for parallel in (False, True):
+        dithered_image = dither(image, palette, DitherAlgorithm.FLOYD_STEINBERG, parallel)
+        assert dithered_image.getpalette() == palette
+        assert np.array_equal(np.asarray(dithered_image), np.asarray(expected_image))
+        frame = dither_to_frame(image, (40, 30), palette, DitherAlgorithm.FLOYD_STEINBERG, parallel)
+        assert np.array_equal(np.asarray(frame), np.asarray(expected_image))
+
+
+def test_dither_to_frame_pads_image():
+    image = Image.radial_gradient("L").resize((40, 30)).convert("RGB")
+
+    frame = dither_to_frame(image, (60, 50), palette, DitherAlgorithm.FLOYD_STEINBERG)
+
+    expected_frame = pad_image((60, 50), dither(image, palette, DitherAlgorithm.FLOYD_STEINBERG))
+    assert frame.mode == "P"
+    assert np.array_equal(np.asarray(frame), np.asarray(expected_frame))
+
+
+@pytest.mark.parametrize("algorithm", [DitherAlgorithm.FLOYD_STEINBERG, DitherAlgorithm.ATKINSON])
+def test_dither_to_frame_crops_image(algorithm):
+    image = Image.radial_gradient("L").resize((80, 30)).convert("RGB")
+
+    frame = dither_to_frame(image, (60, 20), palette, algorithm)
+
+    expected_frame = dither(image.crop((10, 5, 70, 25)), palette, algorithm)
+    assert np.array_equal(np.asarray(frame), np.asarray(expected_frame))
+
+
+def test_changed_pixel_fraction():
+    frame = Image.new("P", (10, 10), 0)
+    frame.putpalette(palette)
+    changed_frame = frame.copy()
+    for x in range(5):
+        changed_frame.putpixel((x, 0), 1)
+
+    assert changed_pixel_fraction(frame, frame.copy()) == 0
+    assert changed_pixel_fraction(changed_frame, frame) == 0.05
+    assert changed_pixel_fraction(frame, None) == 1
+    # Frames that cannot be compared pixel by pixel are entirely different
+    assert changed_pixel_fraction(frame, frame.resize((10, 5))) == 1
+    recoloured_frame = frame.copy()
+    recoloured_frame.putpalette(list(reversed(palette)))
+    assert changed_pixel_fraction(frame, recoloured_frame) == 1
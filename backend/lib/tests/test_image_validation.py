@@ -0,0 +1,65 @@
+import io
+import struct
+import warnings
+import zlib
+
+import pytest
+from PIL import Image
+
+from backend.lib.image_validation import (
+    MIN_PIXEL_LIMIT,
+    detect_image_format,
+    is_within_pixel_limit,
+    max_image_pixels,
+    probe_image,
+)
+
+
+def png_header(width: int, height: int) -> bytes:
+    # A PNG with a header but no pixel data, enough to be probed
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    header = chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    return b"\x89PNG\r\n\x1a\n" + header + chunk(b"IDAT", b"") + chunk(b"IEND", b"")
+
+
+def test_probe_image():
+    jpeg_stream = io.BytesIO()
+    Image.new("RGB", (40, 30)).save(jpeg_stream, "JPEG")
+
+    probe = probe_image(jpeg_stream.getvalue())
+    assert (probe.format, probe.width, probe.height, probe.mode, probe.frame_count) == ("JPEG", 40, 30, "RGB", 1)
+    assert detect_image_format(jpeg_stream.getvalue()) == "jpeg"
+
+
+def test_probe_image_reads_only_the_header():
+    probe = probe_image(png_header(8000, 8000))
+
+    assert probe.format == "PNG"
+    assert probe.pixels == 64_000_000
+
+
+def test_probe_refuses_decompression_bombs():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        with pytest.raises(ValueError):
+            probe_image(png_header(30000, 30000))
+
+
+def test_probe_refuses_unreadable_images():
+    with pytest.raises(ValueError):
+        probe_image(b"\x89PNG\r\n\x1a\nnot really a png")
+
+
+def test_pixel_limit_is_relative_to_display_resolution():
+    assert max_image_pixels((250, 122)) == MIN_PIXEL_LIMIT
+    assert max_image_pixels((1600, 1200)) > MIN_PIXEL_LIMIT
+
+    # A photo from a phone camera can be shown on the smallest display, a larger one cannot
+    assert is_within_pixel_limit(probe_image(png_header(4000, 3000)), (212, 104))
+    probe = probe_image(png_header(9000, 6000))
+    assert not is_within_pixel_limit(probe, (250, 122))
+    assert is_within_pixel_limit(probe, (1600, 1200))
+    with pytest.raises(ValueError):
+        is_within_pixel_limit(probe, (250, 122), True)
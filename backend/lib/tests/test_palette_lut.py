@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+
+from backend.lib import palette_lut
+from backend.lib.palette_lut import get_palette_lut, lookup_colour_indices, lut_path, nearest_colour_indices
+
+# white, black, green, blue, red, yellow, orange
+palette = [255, 255, 255, 0, 0, 0, 0, 255, 0, 0, 0, 255, 255, 0, 0, 255, 255, 0, 255, 140, 0]
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(palette_lut, "_luts", {})
+
+
+def test_lookup_matches_nearest_colour_for_palette_colours():
+    palette_colours = np.array(palette, dtype=np.int32).reshape(-1, 3)
+    lut = get_palette_lut(palette)
+
+    assert np.array_equal(lookup_colour_indices(palette_colours, lut), np.arange(len(palette_colours)))
+
+
+def test_lookup_is_close_to_nearest_colour():
+    palette_colours = np.array(palette, dtype=np.int32).reshape(-1, 3)
+    colours = np.random.default_rng(0).integers(0, 256, (10000, 3), dtype=np.int32)
+    lut = get_palette_lut(palette)
+
+    agreement = np.mean(lookup_colour_indices(colours, lut) == nearest_colour_indices(colours, palette_colours))
+
+    assert agreement > 0.99
+
+
+def test_lut_is_stored_and_reused():
+    lut = get_palette_lut(palette)
+
+    assert os.path.isfile(lut_path(palette))
+    assert get_palette_lut(palette) is lut
+
+
+def test_corrupt_lut_is_rebuilt():
+    os.makedirs(os.path.dirname(lut_path(palette)))
+    with open(lut_path(palette), "wb") as file:
+        file.write(b"not a table")
+
+    lut = get_palette_lut(palette)
+
+    assert lut.shape == (1 << (3 * palette_lut.LUT_BITS),)
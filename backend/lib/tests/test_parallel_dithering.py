@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.lib import parallel_dithering
+from backend.lib.dithering import DITHERERS, dither
+
+# white, black, green, blue, red, yellow, orange
+palette = [255, 255, 255, 0, 0, 0, 0, 255, 0, 0, 0, 255, 255, 0, 0, 255, 255, 0, 255, 140, 0]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def dither_workers(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("DATA_DIR", str(tmp_path_factory.mktemp("data")))
+        monkeypatch.setenv("DITHER_WORKERS", "3")
+        yield
+        parallel_dithering.shutdown()
+
+
+def test_stripe_rows():
+    assert parallel_dithering.stripe_rows(100) == [(0, 33), (33, 66), (66, 100)]
+    # Small images are not split
+    assert parallel_dithering.stripe_rows(40) == [(0, 40)]
+
+
+@pytest.mark.parametrize("algorithm", list(DITHERERS))
+def test_parallel_dither_matches_single_core(algorithm):
+    image = Image.radial_gradient("L").resize((150, 110)).convert("RGB")
+
+    parallel_image = parallel_dithering.dither(image, palette, algorithm)
+
+    assert parallel_image.mode == "P"
+    assert parallel_image.getpalette()[: len(palette)] == palette
+    assert np.array_equal(np.asarray(parallel_image), np.asarray(dither(image, palette, algorithm)))
@@ -0,0 +1,53 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from backend.lib import place_holder_image
+from backend.lib.place_holder_image import generate_place_holder_image, load_font, silkscreen_pixel
+from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings, DisplayType
+
+
+def display_settings(display_type: DisplayType, colour_palette: ColourPalette) -> DisplaySettings:
+    return DisplaySettings(type=display_type, colour_palette=colour_palette, border_colour=BorderColour.WHITE)
+
+
+@pytest.fixture
+def renders(monkeypatch, tmp_path):
+    # Count the placeholders drawn, each test starts without any rendered
+    renders = []
+    draw_placeholder_content = place_holder_image.draw_placeholder_content
+
+    def counting_draw(draw, display_profile):
+        renders.append(display_profile.type)
+        draw_placeholder_content(draw, display_profile)
+
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(place_holder_image, "draw_placeholder_content", counting_draw)
+    monkeypatch.setattr(place_holder_image, "_placeholders", {})
+    return renders
+
+
+def test_placeholder_is_rendered_once_per_profile(renders):
+    phat = display_settings(DisplayType.PHAT_104, ColourPalette.RED)
+    placeholder = generate_place_holder_image(phat)
+
+    assert Image.open(io.BytesIO(base64.b64decode(placeholder))).size == (212, 104)
+    assert generate_place_holder_image(phat) == placeholder
+    assert generate_place_holder_image(display_settings(DisplayType.PHAT_104, ColourPalette.YELLOW)) != placeholder
+    assert renders == [DisplayType.PHAT_104, DisplayType.PHAT_104]
+
+
+def test_placeholder_is_read_back_after_restart(renders, monkeypatch):
+    # The red/yellow palette contains a path separator
+    what = display_settings(DisplayType.WHAT_RED_YELLOW_300, ColourPalette.RED_YELLOW)
+    placeholder = generate_place_holder_image(what)
+    monkeypatch.setattr(place_holder_image, "_placeholders", {})
+
+    assert generate_place_holder_image(what) == placeholder
+    assert len(renders) == 1
+
+
+def test_fonts_are_loaded_once():
+    assert load_font(silkscreen_pixel, 24) is load_font(silkscreen_pixel, 24)
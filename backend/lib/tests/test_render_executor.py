@@ -0,0 +1,81 @@
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from backend.lib.image_utilis import dithers_in_parallel
+from backend.lib.render_executor import (
+    RenderExecutor,
+    RenderQueueFullError,
+    render_changed_frame_job,
+    render_frame_job,
+)
+from backend.models.display_model import DitherAlgorithm, FitMode
+
+palette = [255, 255, 255, 0, 0, 0, 255, 0, 0]
+
+
+@pytest.fixture
+def render_executor():
+    render_executor = RenderExecutor(workers=1, max_queued=0)
+    yield render_executor
+    render_executor.shutdown()
+
+
+@pytest.fixture
+def image_data():
+    png_stream = io.BytesIO()
+    Image.new("RGB", (40, 30), (200, 20, 20)).save(png_stream, "PNG")
+    return png_stream.getvalue()
+
+
+def test_renders_frame_in_process_pool(render_executor, image_data):
+    args = (image_data, (20, 10), palette, DitherAlgorithm.FLOYD_STEINBERG, FitMode.CROP, False)
+
+    frame = render_executor.submit(render_frame_job, *args).result()
+
+    assert (frame.mode, frame.size) == ("P", (20, 10))
+    in_process_frame = render_executor.submit(render_frame_job, *args, in_process=True).result()
+    assert frame.tobytes() == in_process_frame.tobytes()
+
+
+def test_changed_frame_is_only_rendered_when_the_pixels_differ(render_executor, image_data):
+    args = ((20, 10), palette, DitherAlgorithm.FLOYD_STEINBERG, FitMode.CROP, False)
+
+    image_pixel_hash, frame = render_executor.submit(render_changed_frame_job, image_data, None, *args).result()
+    assert frame.tobytes() == render_executor.submit(render_frame_job, image_data, *args).result().tobytes()
+
+    # The same picture is recognised from its pixels and is not rendered again
+    unchanged = render_executor.submit(render_changed_frame_job, image_data, image_pixel_hash, *args).result()
+    assert unchanged == (image_pixel_hash, None)
+
+
+def test_floyd_steinberg_jobs_run_in_the_pool(render_executor):
+    # Floyd-Steinberg is never dithered in parallel, so its jobs are isolated in the pool even when parallel is set
+    in_process = dithers_in_parallel(DitherAlgorithm.FLOYD_STEINBERG, True)
+    assert render_executor.submit(os.getpid, in_process=in_process).result() != os.getpid()
+
+    in_process = dithers_in_parallel(DitherAlgorithm.ATKINSON, True)
+    assert render_executor.submit(os.getpid, in_process=in_process).result() == os.getpid()
+
+
+def test_refuses_jobs_when_full(render_executor):
+    running = render_executor.submit(time.sleep, 0.5)
+
+    with pytest.raises(RenderQueueFullError) as err:
+        render_executor.submit(time.sleep, 0)
+    assert err.value.retry_after >= 1
+
+    # Waits for the running job to finish rather than refusing the job
+    render_executor.submit(time.sleep, 0, block=True).result()
+    assert running.done()
+
+
+def test_slot_is_released_when_job_fails(render_executor):
+    with pytest.raises(ValueError):
+        render_executor.submit(int, "not a number").result()
+
+    # The slot is released once the failed job is done, so the next job does not wait forever
+    assert render_executor.submit(int, "1", block=True).result() == 1
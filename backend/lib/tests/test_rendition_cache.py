@@ -0,0 +1,61 @@
+import os
+
+from backend.lib.rendition_cache import RenditionCache
+
+image_key = "ab" * 32
+
+
+def test_put_and_get(tmp_path):
+    rendition_cache = RenditionCache(str(tmp_path))
+    rendition_key = RenditionCache.rendition_key(image_key, "thumbnail", 256)
+
+    assert rendition_cache.get(rendition_key) is None
+
+    rendition_cache.put(rendition_key, b"thumbnail")
+    assert rendition_cache.get(rendition_key) == b"thumbnail"
+    assert os.path.isfile(rendition_cache.rendition_path(rendition_key))
+
+
+def test_renditions_are_read_back_from_disk(tmp_path):
+    rendition_key = RenditionCache.rendition_key(image_key, "thumbnail", 256)
+    RenditionCache(str(tmp_path)).put(rendition_key, b"thumbnail")
+
+    assert RenditionCache(str(tmp_path)).get(rendition_key) == b"thumbnail"
+
+
+def test_memory_evicts_least_recently_used(tmp_path):
+    rendition_cache = RenditionCache(str(tmp_path), memory_budget=20)
+    rendition_cache.put("first", b"0" * 10)
+    rendition_cache.put("second", b"1" * 10)
+    rendition_cache.get("first")
+    rendition_cache.put("third", b"2" * 10)
+
+    assert list(rendition_cache._memory) == ["first", "third"]
+    # Evicted from memory but still on disk
+    assert rendition_cache.get("second") == b"1" * 10
+
+
+def test_disk_evicts_least_recently_used(tmp_path):
+    rendition_cache = RenditionCache(str(tmp_path), disk_budget=20)
+    rendition_cache.put("first", b"0" * 10)
+    rendition_cache.put("second", b"1" * 10)
+    rendition_cache.get("first")
+    rendition_cache.put("third", b"2" * 10)
+
+    assert sorted(os.listdir(tmp_path)) == ["first", "third"]
+
+
+def test_evict_profiles_except(tmp_path):
+    rendition_cache = RenditionCache(str(tmp_path))
+    thumbnail_key = RenditionCache.rendition_key(image_key, "thumbnail", 256)
+    kept_key = RenditionCache.rendition_key(image_key, "preview-crop", "250x122", "phat_red_white_floyd")
+    evicted_key = RenditionCache.rendition_key(image_key, "preview-crop", "250x122", "phat_black_white_floyd")
+    for rendition_key in (thumbnail_key, kept_key, evicted_key):
+        rendition_cache.put(rendition_key, b"rendition")
+
+    rendition_cache.evict_profiles_except("phat_red_white_floyd")
+
+    assert rendition_cache.get(thumbnail_key) == b"rendition"
+    assert rendition_cache.get(kept_key) == b"rendition"
+    assert rendition_cache.get(evicted_key) is None
+    assert not os.path.exists(rendition_cache.rendition_path(evicted_key))
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from backend.lib.settings_dispatcher import OperationStatus, SettingsDispatcher
+from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings, DisplayType
+
+
+def display_settings(display_type: DisplayType) -> DisplaySettings:
+    return DisplaySettings(type=display_type, colour_palette=ColourPalette.RED, border_colour=BorderColour.WHITE)
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = SettingsDispatcher()
+    yield dispatcher
+    dispatcher.stop()
+
+
+def test_update_is_delivered_in_the_background(dispatcher):
+    delivered = []
+    release = threading.Event()
+
+    def callback(settings, display_has_changed):
+        release.wait(5)
+        delivered.append((settings.type, display_has_changed))
+
+    operation = dispatcher.submit(display_settings(DisplayType.PHAT_104), True, [callback])
+
+    assert operation.status == OperationStatus.PENDING
+    release.set()
+    operation = dispatcher.wait(operation.id, 5)
+    assert operation.status == OperationStatus.SUCCEEDED
+    assert operation.finished_at is not None
+    assert delivered == [(DisplayType.PHAT_104, True)]
+
+
+def test_updates_made_during_delivery_are_coalesced(dispatcher):
+    delivered = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def callback(settings, display_has_changed):
+        started.set()
+        release.wait(5)
+        delivered.append((settings.type, display_has_changed))
+
+    first = dispatcher.submit(display_settings(DisplayType.PHAT_104), False, [callback])
+    started.wait(5)
+    assert dispatcher.get_operation(first.id).status == OperationStatus.RUNNING
+    second = dispatcher.submit(display_settings(DisplayType.PHAT_122), True, [callback])
+    third = dispatcher.submit(display_settings(DisplayType.WHAT_300), False, [callback])
+    release.set()
+
+    assert dispatcher.wait(second.id, 5).status == OperationStatus.SUCCEEDED
+    assert dispatcher.wait(third.id, 5).status == OperationStatus.SUCCEEDED
+    # Only the latest settings are delivered, the display changed in one of the coalesced updates
+    assert delivered == [(DisplayType.PHAT_104, False), (DisplayType.WHAT_300, True)]
+
+
+def test_failed_callback_fails_the_operation(dispatcher):
+    delivered = []
+
+    def failing_callback(settings, display_has_changed):
+        raise ValueError("Display is not connected")
+
+    operation = dispatcher.submit(
+        display_settings(DisplayType.PHAT_104), False, [failing_callback, lambda *update: delivered.append(update)]
+    )
+
+    operation = dispatcher.wait(operation.id, 5)
+    assert operation.status == OperationStatus.FAILED
+    assert operation.errors == ("Display is not connected",)
+    # The other subscribers are still told of the update
+    assert len(delivered) == 1
+
+
+def test_unknown_operation(dispatcher):
+    assert dispatcher.get_operation("unknown") is None
+
+
+def test_no_updates_are_taken_once_stopped(dispatcher):
+    dispatcher.stop()
+
+    with pytest.raises(RuntimeError):
+        dispatcher.submit(display_settings(DisplayType.PHAT_104), False, [])
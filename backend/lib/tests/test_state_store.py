@@ -0,0 +1,73 @@
+import json
+import sqlite3
+
+import pytest
+
+from backend.lib.state_store import StateStore
+
+
+@pytest.fixture
+def state_store(tmp_path):
+    state_store = StateStore(str(tmp_path / "state.db"))
+    yield state_store
+    state_store.close()
+
+
+def image(image_id: str) -> dict:
+    return {"id": image_id, "key": f"{image_id}_key", "format": "png", "size": 100}
+
+
+def count_changes(state_store: StateStore, update) -> int:
+    # The number of rows an update inserted, changed or deleted
+    with state_store.transaction(write=False) as connection:
+        before = connection.total_changes
+    update()
+    with state_store.transaction(write=False) as connection:
+        return connection.total_changes - before
+
+
+def test_state_round_trip(state_store, tmp_path):
+    assert state_store.get_state("display_settings") is None
+
+    state_store.put_state("display_settings", {"type": "phat104", "refresh_threshold": 0.1})
+    state_store.close()
+
+    reopened = StateStore(str(tmp_path / "state.db"))
+    assert reopened.get_state("display_settings") == {"type": "phat104", "refresh_threshold": 0.1}
+    assert reopened.get_state("image_feed") is None
+    reopened.close()
+
+
+def test_only_changed_fields_are_written(state_store):
+    state_store.put_state("display_settings", {"type": "phat104", "mode": "slideshow"})
+
+    assert count_changes(state_store, lambda: state_store.put_state("display_settings", {"type": "phat104"})) == 0
+    assert count_changes(state_store, lambda: state_store.put_state("display_settings", {"mode": "imageFeed"})) == 1
+    assert state_store.get_state("display_settings") == {"type": "phat104", "mode": "imageFeed"}
+
+
+def test_slideshow_images_are_written_a_row_at_a_time(state_store):
+    fields = {"change_delay": 300, "fit_mode": "crop"}
+    state_store.put_slideshow(fields, [image("a"), image("b")])
+    added = [image("a"), image("b"), image("c")]
+
+    assert count_changes(state_store, lambda: state_store.put_slideshow(fields, added)) == 1
+    assert count_changes(state_store, lambda: state_store.put_slideshow(fields, [image("a"), image("c")])) == 2
+    assert state_store.get_slideshow() == {"change_delay": 300, "fit_mode": "crop", "images": [image("a"), image("c")]}
+
+
+def test_failed_update_is_rolled_back(state_store):
+    state_store.put_slideshow({"change_delay": 300}, [image("a")])
+
+    with pytest.raises(sqlite3.IntegrityError):
+        state_store.put_slideshow({"change_delay": 600}, [image("b"), dict(image("c"), key=None)])
+    assert state_store.get_slideshow() == {"change_delay": 300, "images": [image("a")]}
+
+
+def test_json_state_is_imported_once(state_store, tmp_path):
+    (tmp_path / "feed.json").write_text(json.dumps({"polling_interval": 60}))
+
+    assert state_store.read_json_state("feed.json") == {"polling_interval": 60}
+    state_store.retire_json_state("feed.json")
+    assert state_store.read_json_state("feed.json") is None
+    assert (tmp_path / "feed.json.imported").exists()
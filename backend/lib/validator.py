@@ -1,3 +1,6 @@
+import functools
+import inspect
+from collections.abc import Callable
 from typing import Type
 from flask import request
 from pydantic import BaseModel, ValidationError
@@ -6,17 +9,32 @@ from backend.lib.logger_setup import logger
 
 
 # Type[BaseModel] annotates that argument model must be a subclass of BaseModel
-def validate_request(model: Type[BaseModel]):
+def validate_request(model: Type[BaseModel], context: Callable[[], dict] | None = None):
+    """
+    Validates the JSON body of a request against the model, and passes the validated model to the decorated view as
+    the argument annotated with the model, so the body is only parsed and validated once. The context, if given, is
+    called for every request and passed to the validators of the model as the pydantic validation context.
+    """
+
     def decorator(func):
+        argument = next(
+            (name for name, parameter in inspect.signature(func).parameters.items() if parameter.annotation is model),
+            None,
+        )
+        if argument is None:
+            raise TypeError(f"{func.__name__} has no argument annotated with {model.__name__} to receive the request")
+
+        # Keep the name of the decorated function, Flask names endpoints after it
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                model.model_validate(request.json)
-                # if valid execute the decorated function
-                return func(*args, **kwargs)
+                validated = model.model_validate(request.json, context=context() if context else None)
             except ValidationError as validation:
                 # invalid request
                 logger.error("Invalid request")
                 return error_response("Validation errors", validation)
+            # if valid execute the decorated function
+            return func(*args, **{**kwargs, argument: validated})
 
         return wrapper
 
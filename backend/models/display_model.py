@@ -45,6 +45,27 @@ class BorderColour(str, Enum):
     BLACK = "black"
 
 
+class DitherAlgorithm(str, Enum):
+    # Error diffusion
+    FLOYD_STEINBERG = "floydSteinberg"
+    ATKINSON = "atkinson"
+    STUCKI = "stucki"
+    # Ordered
+    BAYER = "bayer"
+    BLUE_NOISE = "blueNoise"
+
+
+class FitMode(str, Enum):
+    # Centre crop larger images and pad smaller images, without scaling
+    CROP = "crop"
+    # Scale to fit inside the display, padding the remaining space
+    FIT = "fit"
+    # Scale to cover the display, cropping the overflow
+    FILL = "fill"
+    # Scale to the display resolution, ignoring the aspect ratio
+    STRETCH = "stretch"
+
+
 class DisplayMode(str, Enum):
     SLIDESHOW = "slideshow"
     IMAGE_FEED = "image_feed"
@@ -67,6 +88,21 @@ class DisplaySettings(BaseModel):
         DisplayMode.SLIDESHOW,  # Not required as defaults to slideshow
         description=f"Display mode options: {', '.join([mode for mode in DisplayMode])}",
     )
+    dither_algorithm: DitherAlgorithm = Field(
+        DitherAlgorithm.FLOYD_STEINBERG,
+        description=f"Dither algorithm options: {', '.join([algorithm for algorithm in DitherAlgorithm])}",
+    )
+    parallel_dithering: bool = Field(
+        False,
+        description="Spread dithering across all CPU cores, the result is the same but uses more memory. "
+        "Floyd-Steinberg is always dithered on a single core, as it is faster that way",
+    )
+    refresh_threshold: float = Field(
+        0.0,
+        ge=0,
+        le=1,
+        description="Fraction of pixels that must change for the display to be refreshed, 0 refreshes on any change",
+    )
 
 
 class DisplaySettingsUpdate(BaseModel):
@@ -86,3 +122,18 @@ class DisplaySettingsUpdate(BaseModel):
         None,
         description=f"Display mode options: {', '.join([mode for mode in DisplayMode])}",
     )
+    dither_algorithm: DitherAlgorithm | None = Field(
+        None,
+        description=f"Dither algorithm options: {', '.join([algorithm for algorithm in DitherAlgorithm])}",
+    )
+    parallel_dithering: bool | None = Field(
+        None,
+        description="Spread dithering across all CPU cores, the result is the same but uses more memory. "
+        "Floyd-Steinberg is always dithered on a single core, as it is faster that way",
+    )
+    refresh_threshold: float | None = Field(
+        None,
+        ge=0,
+        le=1,
+        description="Fraction of pixels that must change for the display to be refreshed, 0 refreshes on any change",
+    )
@@ -1,10 +1,19 @@
 from pydantic import BaseModel, Field, field_validator
 
 from backend.lib.image_validation import is_valid_base64, is_valid_png, is_valid_jpg, is_valid_file_size
+from backend.models.display_model import DitherAlgorithm
 
 
 class ImageDither(BaseModel):
     image: str = Field(..., description="base64 string")
+    algorithm: DitherAlgorithm | None = Field(
+        None,  # Not required, defaults to the dither algorithm of the display settings
+        description=f"Dither algorithm options: {', '.join([algorithm for algorithm in DitherAlgorithm])}",
+    )
+    parallel: bool | None = Field(
+        None,  # Not required, defaults to the parallel dithering option of the display settings
+        description="Spread dithering across all CPU cores, ignored for Floyd-Steinberg as it is faster on one core",
+    )
 
     @field_validator("image")
     @classmethod
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, field_validator, AnyUrl
 from backend.lib.logger_setup import logger
+from backend.models.display_model import FitMode
 
 
 class ImageFeedConfiguration(BaseModel):
@@ -7,6 +8,10 @@ class ImageFeedConfiguration(BaseModel):
                                   description="Interval between each request to the image feed URL in seconds", ge=60,
                                   le=600)
     image_feed_url: str = Field(..., description="Image feed URL")
+    fit_mode: FitMode = Field(FitMode.CROP, description="How images are fitted to the display resolution")
+    max_image_size: int = Field(
+        15100, description="Largest image the feed may send in KB, larger images are not downloaded", ge=1, le=102400
+    )
 
     @field_validator("image_feed_url")
     @classmethod
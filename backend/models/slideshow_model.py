@@ -1,22 +1,81 @@
-from pydantic import BaseModel, Field, field_validator
+import base64
 
-from backend.lib.image_validation import is_valid_base64, is_valid_png, is_valid_file_size, is_valid_jpg
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+
+from backend.lib.image_validation import (
+    MAX_IMAGE_KB,
+    is_valid_png,
+    is_within_pixel_limit,
+    is_valid_file_size,
+    is_valid_jpg,
+    probe_image,
+)
+from backend.models.display_model import FitMode
 
 
 class SlideshowConfiguration(BaseModel):
     change_delay: int = Field(...,
                               description="Delay between each image change in seconds", ge=300, le=86400)
     images: list[str] = Field(..., description="Array of base64 strings")
+    fit_mode: FitMode = Field(FitMode.CROP, description="How images are fitted to the display resolution")
 
     @field_validator("images")
     @classmethod
-    def validate_images(cls, png_images: list[str]):
-        try:
-            for pngBase64 in png_images:
-                is_valid_base64(pngBase64, True)
-                if not is_valid_png(pngBase64) and not is_valid_jpg(pngBase64):
-                    raise ValueError("Image is not in PNG or JPG/JPEG format")
-                is_valid_file_size(pngBase64, 15100, True)
-        except (TypeError, ValueError) as e:
-            raise ValueError(f"Invalid base64 string: {str(e)}")
+    def validate_images(cls, png_images: list[str], info: ValidationInfo):
+        for pngBase64 in png_images:
+            validate_image(pngBase64, display_resolution(info))
         return png_images
+
+
+# Resolution of the display images are validated against, given in the validation context
+def display_resolution(info: ValidationInfo) -> tuple[int, int] | None:
+    return (info.context or {}).get("display_resolution")
+
+
+def validate_image(base64_image: str, display_resolution: tuple[int, int] | None = None) -> str:
+    try:
+        if not is_valid_png(base64_image) and not is_valid_jpg(base64_image):
+            raise ValueError("Image is not in PNG or JPG/JPEG format")
+        is_valid_file_size(base64_image, MAX_IMAGE_KB, True)
+        # Decode once, checking it is valid base64, then read the image header to check it is a readable image
+        probe = probe_image(base64.b64decode(base64_image, validate=True))
+        if display_resolution:
+            # Refuse images with too many pixels for the display before any of their pixels are decoded
+            is_within_pixel_limit(probe, display_resolution, True)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid base64 string: {str(e)}")
+    return base64_image
+
+
+class SlideshowImageCreate(BaseModel):
+    image: str = Field(..., description="Base64 string of the image to add to the end of the slideshow")
+
+    @field_validator("image")
+    @classmethod
+    def validate_image(cls, base64_image: str, info: ValidationInfo):
+        return validate_image(base64_image, display_resolution(info))
+
+
+class SlideshowOrder(BaseModel):
+    ids: list[str] = Field(..., description="Ids of every image in the slideshow, in the order to show them")
+
+
+class SlideshowUpdate(BaseModel):
+    change_delay: int | None = Field(None,
+                                     description="Delay between each image change in seconds", ge=300, le=86400)
+    fit_mode: FitMode | None = Field(None, description="How images are fitted to the display resolution")
+
+
+class SlideshowImage(BaseModel):
+    id: str = Field(..., description="Identifies the image within the slideshow")
+    key: str = Field(..., description="Key of the image in the image store, the hash of its bytes")
+    format: str = Field(..., description="Format of the image, png or jpeg")
+    size: int = Field(..., description="Size of the image in bytes")
+
+
+# The slideshow as it is stored, the images are referenced rather than held inline so it stays small
+class Slideshow(BaseModel):
+    change_delay: int = Field(...,
+                              description="Delay between each image change in seconds", ge=300, le=86400)
+    images: list[SlideshowImage] = Field(..., description="Images in the order they are shown")
+    fit_mode: FitMode = Field(FitMode.CROP, description="How images are fitted to the display resolution")
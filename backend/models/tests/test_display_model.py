@@ -72,3 +72,13 @@ def test_invalid_mode():
             mode="idle",  # type: ignore
             border_colour=BorderColour.BLACK,
         )
+
+
+def test_invalid_refresh_threshold():
+    with pytest.raises(ValidationError):
+        DisplaySettings(
+            type=DisplayType.IMPRESSION_400,
+            colour_palette=ColourPalette.SEVEN_COLOUR,
+            border_colour=BorderColour.BLACK,
+            refresh_threshold=1.5,
+        )
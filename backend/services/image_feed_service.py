@@ -1,10 +1,9 @@
-import json
-import os
 import threading
 
 from dependency_injector.wiring import inject, Provide
 
 from backend.lib.logger_setup import logger
+from backend.lib.state_store import StateStore
 from backend.models.display_model import DisplayMode, DisplaySettings
 from backend.models.image_feed_model import ImageFeedConfiguration
 from backend.services.display_mode_abstract import ModeAbstract
@@ -14,23 +13,26 @@ from backend.workers.image_feed_worker import ImageFeedWorker
 class ImageFeedService(ModeAbstract):
     _image_feed_configuration: ImageFeedConfiguration | None
     image_feed_worker: ImageFeedWorker
+    state_store: StateStore
     _lock: threading.RLock
 
     @inject
     def __init__(
         self,
         image_feed_worker: ImageFeedWorker = Provide["image_feed_worker"],
+        state_store: StateStore = Provide["state_store"],
     ):
         super().__init__()
         logger.info("Created ImageFeedService")
         self._image_feed_configuration = None
         self.image_feed_worker = image_feed_worker
+        self.state_store = state_store
         self._lock = threading.RLock()
 
         stored_image_feed_configuration = self.restore_image_feed()
         if stored_image_feed_configuration:
             self._image_feed_configuration = stored_image_feed_configuration
-            logger.info("Image feed configuration was restored from file")
+            logger.info("Image feed configuration was restored")
 
         if self.display_settings_service.display_settings.mode == DisplayMode.IMAGE_FEED:
             self.start_image_feed()
@@ -63,8 +65,7 @@ class ImageFeedService(ModeAbstract):
     def update_image_feed(self, configuration: ImageFeedConfiguration):
         # Update the image feed configuration attribute
         self.image_feed_configuration = configuration
-        # Write the configuration to file
-        logger.info("Attempting to store image feed configuration to feed.json...")
+        logger.info("Attempting to store image feed configuration...")
         self.store_image_feed(configuration)
 
         if self.display_settings_service.display_settings.mode == DisplayMode.IMAGE_FEED:
@@ -86,21 +87,24 @@ class ImageFeedService(ModeAbstract):
 
     def store_image_feed(self, image_feed_configuration: ImageFeedConfiguration):
         with self._lock:
-            with open(os.path.join(os.getenv("DATA_DIR", ""), "feed.json"), "w") as file:
-                json.dump(image_feed_configuration.model_dump(), file, ensure_ascii=False, indent=4)
+            self.state_store.put_state("image_feed", image_feed_configuration.model_dump(mode="json"))
             logger.info("Configuration stored")
 
     def restore_image_feed(self) -> ImageFeedConfiguration | None:
-        feed_configuration_json = self.read_stored_feed_configuration()
+        feed_configuration_json = self.state_store.get_state("image_feed")
+        if feed_configuration_json is None:
+            feed_configuration_json = self.import_feed_configuration_file()
         if isinstance(feed_configuration_json, dict):
             logger.info("Existing image feed configuration found")
             feed_configuration = ImageFeedConfiguration(**feed_configuration_json)
             return feed_configuration
 
-    def read_stored_feed_configuration(self):
-        try:
-            with open(os.path.join(os.getenv("DATA_DIR", ""), "feed.json"), "r") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            logger.info("No image feed configuration file found...")
-            return False
+    def import_feed_configuration_file(self) -> dict | None:
+        # The configuration used to be stored in feed.json, it is moved into the state store the first time it is read
+        feed_configuration_json = self.state_store.read_json_state("feed.json")
+        if feed_configuration_json is None:
+            logger.info("No image feed configuration found...")
+            return None
+        self.store_image_feed(ImageFeedConfiguration(**feed_configuration_json))
+        self.state_store.retire_json_state("feed.json")
+        return feed_configuration_json
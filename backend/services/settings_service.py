@@ -1,15 +1,12 @@
-import json
-import os
 import threading
 from typing import Callable
 
-from backend.lib.display_utilis import (
-    detect_inky_display,
-    InkyDisplay,
-    resolve_display_type_from_inky_instance,
-    resolve_supported_palette_from_inky_instance,
-)
+from dependency_injector.wiring import inject, Provide
+
+from backend.lib.display_utilis import get_display_detection
 from backend.lib.logger_setup import logger
+from backend.lib.settings_dispatcher import SettingsDispatcher, SettingsOperation
+from backend.lib.state_store import StateStore
 from backend.models.display_model import (
     DisplaySettings,
     DisplayType,
@@ -25,9 +22,16 @@ class DisplaySettingsService:
     _display_settings: DisplaySettings
     settings_update_callbacks: list[Callable[[DisplaySettings, bool], None]]
     _active_worker: DisplayWorkerAbstract | None
+    state_store: StateStore
+    settings_dispatcher: SettingsDispatcher
     _lock: threading.RLock
 
-    def __init__(self):
+    @inject
+    def __init__(
+        self,
+        state_store: StateStore = Provide["state_store"],
+        settings_dispatcher: SettingsDispatcher = Provide["settings_dispatcher"],
+    ):
         self._display_settings = DisplaySettings(
             type=DisplayType.PHAT_104,
             colour_palette=ColourPalette.RED,
@@ -36,20 +40,22 @@ class DisplaySettingsService:
         )
         self.settings_update_callbacks = []
         self._active_worker = None
+        self.state_store = state_store
+        self.settings_dispatcher = settings_dispatcher
         self._lock = threading.RLock()
         logger.info("Created DisplaySettingsService")
-        detected_display = detect_inky_display()
+        detection = get_display_detection()
 
         # Check for existing settings
         stored_settings = self.restore_settings()
         logger.info(f"Stored settings: {stored_settings}")
         if stored_settings:
             self._display_settings = stored_settings
-            logger.info("Settings were restored from file")
+            logger.info("Settings were restored")
 
-        if isinstance(detected_display, InkyDisplay):
-            display_type = resolve_display_type_from_inky_instance(detected_display)
-            display_palette = resolve_supported_palette_from_inky_instance(detected_display)
+        if detection.display_type is not None:
+            display_type = detection.display_type
+            display_palette = detection.colour_palette
             # Set the display settings if no stored settings exist or
             # the stored settings do not match the detected display
             if (
@@ -68,7 +74,7 @@ class DisplaySettingsService:
                 )
                 self.update_settings(display_settings)
 
-        if not detected_display and not stored_settings:
+        if detection.display_type is None and not stored_settings:
             # No display was detected and no setting exist so use default settings
             logger.info("Unable to detect display, using default settings")
 
@@ -86,45 +92,61 @@ class DisplaySettingsService:
         with self._lock:
             self.settings_update_callbacks.append(callback)
 
-    def update_settings(self, settings: DisplaySettings | DisplaySettingsUpdate, emit_update: bool = True):
-        display_has_changed = False
-
+    def update_settings(
+        self, settings: DisplaySettings | DisplaySettingsUpdate, emit_update: bool = True
+    ) -> SettingsOperation | None:
+        """
+        Stores the settings, and returns the operation delivering them to the subscribers, which is done in the
+        background (see SettingsDispatcher).
+        """
         with self._lock:
             current_display_type = self._display_settings.type
 
-            if current_display_type != settings.type:
-                logger.info(f"Display type has changed from {current_display_type} to {settings.type}.")
-                display_has_changed = True
-
             # Update the display settings, merge existing settings with the updated settings
             self._display_settings = DisplaySettings(
                 **{**self._display_settings.model_dump(), **settings.model_dump(exclude_unset=True)}
             )
+            # An update that leaves out the display type does not change the display
+            display_has_changed = current_display_type != self._display_settings.type
+            if display_has_changed:
+                logger.info(f"Display type has changed from {current_display_type} to {self._display_settings.type}.")
             # Take snapshot for use outside lock
             updated_settings = self._display_settings
-            # Write the settings to file
-            logger.info("Attempting to store settings to file...")
-            with open(os.path.join(os.getenv("DATA_DIR", ""), "settings.json"), "w") as file:
-                json.dump(updated_settings.model_dump(), file, ensure_ascii=False, indent=4)
+            # Only the settings that changed are written
+            logger.info("Attempting to store settings...")
+            self.state_store.put_state("display_settings", updated_settings.model_dump(mode="json"))
             logger.info("Settings stored")
 
-        if emit_update:
-            self.emit_settings_update(updated_settings, display_has_changed)
+            if emit_update:
+                # Submitted under the lock, so updates are delivered in the order they were stored
+                return self.emit_settings_update(updated_settings, display_has_changed)
+        return None
 
-    def emit_settings_update(self, settings: DisplaySettings, display_has_changed: bool = False):
+    def emit_settings_update(self, settings: DisplaySettings, display_has_changed: bool = False) -> SettingsOperation:
         with self._lock:
             # Snapshot callback list under lock to prevent new subscribers added mid-iteration from affecting this emit
             callbacks = list(self.settings_update_callbacks)
-        for callback in callbacks:
-            callback(settings, display_has_changed)
+            return self.settings_dispatcher.submit(settings, display_has_changed, callbacks)
 
     def restore_settings(self) -> DisplaySettings | None:
-        settings_json = DisplaySettingsService.retrieve_settings_from_file()
+        settings_json = self.state_store.get_state("display_settings")
+        if settings_json is None:
+            settings_json = self.import_settings_file()
         if isinstance(settings_json, dict):
             logger.info("Existing settings detected, attempting to restore settings...")
             settings = DisplaySettings(**settings_json)
             return settings
 
+    def import_settings_file(self) -> dict | None:
+        # Settings used to be stored in settings.json, they are moved into the state store the first time they are read
+        settings_json = self.state_store.read_json_state("settings.json")
+        if settings_json is None:
+            logger.info("No settings found...")
+            return None
+        self.state_store.put_state("display_settings", DisplaySettings(**settings_json).model_dump(mode="json"))
+        self.state_store.retire_json_state("settings.json")
+        return settings_json
+
     @property
     def active_worker(self) -> DisplayWorkerAbstract | None:
         with self._lock:
@@ -134,12 +156,3 @@ class DisplaySettingsService:
     def active_worker(self, worker: DisplayWorkerAbstract) -> None:
         with self._lock:
             self._active_worker = worker
-
-    @staticmethod
-    def retrieve_settings_from_file():
-        try:
-            with open(os.path.join(os.getenv("DATA_DIR", ""), "settings.json"), "r") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            logger.info("No settings found...")
-            return False
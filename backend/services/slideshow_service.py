@@ -1,39 +1,67 @@
-import json
-import os
+import base64
+import io
 import threading
+import uuid
 
-from dependency_injector.wiring import inject, Provide
+from dependency_injector.wiring import Provide, inject
 
+from backend.lib.display_profile import resolve_profile_from_settings
+from backend.lib.frame_cache import FrameCache
+from backend.lib.image_store import ImageStore
+from backend.lib.image_upload import ImageUpload
+from backend.lib.image_utilis import dithers_in_parallel
+from backend.lib.image_validation import detect_image_format, is_within_pixel_limit, probe_image
 from backend.lib.logger_setup import logger
 from backend.lib.place_holder_image import generate_place_holder_image
-from backend.models.display_model import DisplaySettings, DisplayMode
-from backend.models.slideshow_model import SlideshowConfiguration
+from backend.lib.render_executor import RenderExecutor, render_frame_job, thumbnail_job
+from backend.lib.rendition_cache import RenditionCache
+from backend.lib.state_store import StateStore
+from backend.models.display_model import DisplayMode, DisplaySettings
+from backend.models.slideshow_model import (
+    Slideshow,
+    SlideshowConfiguration,
+    SlideshowImage,
+    SlideshowUpdate,
+    validate_image,
+)
 from backend.services.display_mode_abstract import ModeAbstract
 from backend.workers.slideshow_worker import SlideshowWorker
 
 
 class SlideshowService(ModeAbstract):
-    _slideshow_configuration: SlideshowConfiguration
+    _slideshow: Slideshow
     slideshow_worker: SlideshowWorker
+    image_store: ImageStore
+    rendition_cache: RenditionCache
+    render_executor: RenderExecutor
+    state_store: StateStore
     _lock: threading.RLock
 
     @inject
     def __init__(
         self,
         slideshow_worker: SlideshowWorker = Provide["slideshow_worker"],
+        image_store: ImageStore = Provide["image_store"],
+        rendition_cache: RenditionCache = Provide["rendition_cache"],
+        render_executor: RenderExecutor = Provide["render_executor"],
+        state_store: StateStore = Provide["state_store"],
     ):
         super().__init__()
         logger.info("Created SlideshowService")
         self.slideshow_worker = slideshow_worker
-        self._slideshow_configuration = SlideshowConfiguration(images=[], change_delay=1800)
+        self.image_store = image_store
+        self.rendition_cache = rendition_cache
+        self.render_executor = render_executor
+        self.state_store = state_store
+        self._slideshow = Slideshow(images=[], change_delay=1800)
         self._lock = threading.RLock()
 
-        stored_slideshow_configuration = self.restore_slideshow()
-        if stored_slideshow_configuration:
-            self._slideshow_configuration = stored_slideshow_configuration
-            logger.info("Slideshow configuration was restored from file")
+        stored_slideshow = self.restore_slideshow()
+        if stored_slideshow:
+            self._slideshow = stored_slideshow
+            logger.info("Slideshow configuration was restored")
 
-        if len(self.slideshow_configuration.images) < 1:
+        if len(self.slideshow.images) < 1:
             logger.info("Slideshow has no images...")
             self.default_to_placeholder_image()
 
@@ -41,44 +69,208 @@ class SlideshowService(ModeAbstract):
             self.start_slideshow()
 
     @property
-    def slideshow_configuration(self) -> SlideshowConfiguration:
+    def slideshow(self) -> Slideshow:
         with self._lock:
-            return self._slideshow_configuration
+            return self._slideshow
 
-    @slideshow_configuration.setter
-    def slideshow_configuration(self, value: SlideshowConfiguration) -> None:
+    @slideshow.setter
+    def slideshow(self, value: Slideshow) -> None:
         with self._lock:
-            self._slideshow_configuration = value
+            self._slideshow = value
+
+    def get_slideshow_configuration(self) -> SlideshowConfiguration:
+        # Read the images back from the store, they were validated when they were added so are not validated again
+        slideshow = self.slideshow
+        return SlideshowConfiguration.model_construct(
+            change_delay=slideshow.change_delay,
+            images=[self.image_store.get_base64(image.key) for image in slideshow.images],
+            fit_mode=slideshow.fit_mode,
+        )
+
+    def get_image(self, image_id: str) -> SlideshowImage:
+        image = next((image for image in self.slideshow.images if image.id == image_id), None)
+        if image is None:
+            raise ValueError(f"Slideshow has no image with id {image_id}")
+        return image
+
+    def get_thumbnail(self, image_id: str, size: int) -> tuple[str, bytes]:
+        # Returns the key and JPEG bytes of a thumbnail of the image that fits within a square of the given size
+        image = self.get_image(image_id)
+        rendition_key = RenditionCache.rendition_key(image.key, "thumbnail", size)
+        thumbnail = self.rendition_cache.get(rendition_key)
+        if thumbnail is None:
+            image_path = self.image_store.image_path(image.key)
+            thumbnail = self.render_executor.submit(thumbnail_job, image_path, size).result()
+            self.rendition_cache.put(rendition_key, thumbnail)
+        return rendition_key, thumbnail
+
+    def get_preview(self, image_id: str) -> tuple[str, bytes]:
+        # Returns the key and PNG bytes of the image exactly as it would be shown on the display
+        image = self.get_image(image_id)
+        display_settings = self.display_settings_service.display_settings
+        fit_mode = self.slideshow.fit_mode
+        display_profile = resolve_profile_from_settings(display_settings)
+        rendition_key = RenditionCache.rendition_key(
+            image.key,
+            f"preview-{fit_mode.value}",
+            f"{display_profile.width}x{display_profile.height}",
+            FrameCache.profile_key(display_settings),
+        )
+        preview = self.rendition_cache.get(rendition_key)
+        if preview is None:
+            frame_key = FrameCache.frame_key(image.key, fit_mode)
+            frame_cache = self.slideshow_worker.frame_cache
+            frame = frame_cache.get(frame_key, display_settings)
+            if frame is None:
+                frame = self.render_executor.submit(
+                    render_frame_job,
+                    self.image_store.image_path(image.key),
+                    display_profile.resolution,
+                    list(display_profile.palette),
+                    display_settings.dither_algorithm,
+                    fit_mode,
+                    display_settings.parallel_dithering,
+                    in_process=dithers_in_parallel(
+                        display_settings.dither_algorithm, display_settings.parallel_dithering
+                    ),
+                ).result()
+                # The slideshow can show the frame without rendering it again
+                frame_cache.put(frame_key, display_settings, frame)
+            preview_stream = io.BytesIO()
+            frame.save(preview_stream, "PNG")
+            preview = preview_stream.getvalue()
+            self.rendition_cache.put(rendition_key, preview)
+        return rendition_key, preview
 
     def start_slideshow(self):
-        slideshow_configuration = self.slideshow_configuration
+        slideshow = self.slideshow
         display_settings = self.display_settings_service.display_settings
         logger.info("Attempting to start slideshow on the Inky display...")
         logger.info(
             f"Settings: {display_settings.type} ({display_settings.colour_palette}) - "
-            f"delay: {slideshow_configuration.change_delay} seconds"
+            f"delay: {slideshow.change_delay} seconds"
         )
-        self.slideshow_worker.start_slideshow(slideshow_configuration, display_settings)
+        self.slideshow_worker.start_slideshow(slideshow, display_settings)
         self.display_settings_service.active_worker = self.slideshow_worker
 
     def update_slideshow(self, configuration: SlideshowConfiguration):
-        self.slideshow_configuration = configuration
-        logger.info("Attempting to store slideshow configuration to slideshow.json...")
-        self.store_slideshow_configuration(configuration)
+        with self._lock:
+            # Stored under the lock, so the images cannot be pruned before the slideshow references them
+            slideshow = Slideshow(
+                change_delay=configuration.change_delay,
+                images=[self.store_image(base64_image) for base64_image in configuration.images],
+                fit_mode=configuration.fit_mode,
+            )
+            self._slideshow = slideshow
+            logger.info("Attempting to store slideshow configuration...")
+            self.store_slideshow(slideshow)
 
         if self.display_settings_service.display_settings.mode == DisplayMode.SLIDESHOW:
             self.start_slideshow()
 
+    def add_image(self, base64_image: str) -> SlideshowImage:
+        with self._lock:
+            # Stored under the lock, so the image cannot be pruned before the slideshow references it
+            image = self.store_image(base64_image)
+            self._slideshow = self._slideshow.model_copy(update={"images": [*self._slideshow.images, image]})
+            self.store_slideshow(self._slideshow)
+        logger.info(f"Added image {image.id} to the slideshow")
+        self.apply_slideshow_change()
+        return image
+
+    def add_uploaded_image(self, upload: ImageUpload) -> SlideshowImage:
+        # The image is written to the store as it arrives, outside the lock so a slow upload does not hold up others
+        staged_image = self.image_store.stage(upload)
+        try:
+            self.check_image_pixels(staged_image.path)
+            with self._lock:
+                image = SlideshowImage(
+                    id=uuid.uuid4().hex,
+                    key=self.image_store.commit(staged_image),
+                    format=upload.format or "unknown",
+                    size=staged_image.size,
+                )
+                self._slideshow = self._slideshow.model_copy(update={"images": [*self._slideshow.images, image]})
+                self.store_slideshow(self._slideshow)
+        finally:
+            self.image_store.discard(staged_image)
+        logger.info(f"Added uploaded image {image.id} to the slideshow")
+        self.apply_slideshow_change()
+        return image
+
+    def remove_image(self, image_id: str):
+        with self._lock:
+            images = [image for image in self._slideshow.images if image.id != image_id]
+            if len(images) == len(self._slideshow.images):
+                raise ValueError(f"Slideshow has no image with id {image_id}")
+            if not images:
+                # A slideshow must always have an image to show
+                images = [self.store_image(generate_place_holder_image(self.display_settings_service.display_settings))]
+            self._slideshow = self._slideshow.model_copy(update={"images": images})
+            self.store_slideshow(self._slideshow)
+        logger.info(f"Removed image {image_id} from the slideshow")
+        self.apply_slideshow_change()
+
+    def reorder_images(self, image_ids: list[str]):
+        with self._lock:
+            images_by_id = {image.id: image for image in self._slideshow.images}
+            if len(image_ids) != len(images_by_id) or set(image_ids) != set(images_by_id):
+                raise ValueError("The new order must contain the id of every image in the slideshow exactly once")
+            self._slideshow = self._slideshow.model_copy(
+                update={"images": [images_by_id[image_id] for image_id in image_ids]}
+            )
+            self.store_slideshow(self._slideshow)
+        logger.info("Reordered the slideshow images")
+        self.apply_slideshow_change()
+
+    def update_slideshow_settings(self, slideshow_update: SlideshowUpdate):
+        with self._lock:
+            self._slideshow = self._slideshow.model_copy(update=slideshow_update.model_dump(exclude_none=True))
+            self.store_slideshow(self._slideshow)
+        logger.info(f"Updated slideshow settings: {slideshow_update.model_dump(exclude_none=True)}")
+        self.apply_slideshow_change()
+
+    def apply_slideshow_change(self):
+        # A running slideshow picks up the change straight away, rather than being restarted
+        if self.display_settings_service.display_settings.mode != DisplayMode.SLIDESHOW:
+            return
+        if self.slideshow_worker.running:
+            self.slideshow_worker.update_slideshow(self.slideshow)
+        else:
+            self.start_slideshow()
+
+    def store_image(self, base64_image: str) -> SlideshowImage:
+        data = base64.b64decode(base64_image)
+        self.check_image_pixels(data)
+        return SlideshowImage(
+            id=uuid.uuid4().hex,
+            key=self.image_store.put(data),
+            format=detect_image_format(data) or "unknown",
+            size=len(data),
+        )
+
+    def check_image_pixels(self, source: bytes | str):
+        # Only the header of the image is read, so an image too large to decode is refused before it is decoded
+        is_within_pixel_limit(probe_image(source), self.display_resolution(), True)
+
+    def display_resolution(self) -> tuple[int, int]:
+        return resolve_profile_from_settings(self.display_settings_service.display_settings).resolution
+
     def on_settings_update(self, settings: DisplaySettings, display_has_changed: bool = False):
         logger.info("Settings have changed")
+        # Frames rendered for the previous display settings will not be shown again
+        self.slideshow_worker.frame_cache.evict_profiles_except(settings)
+        self.rendition_cache.evict_profiles_except(FrameCache.profile_key(settings))
 
         if display_has_changed:
-            place_holder_image = generate_place_holder_image(self.display_settings_service.display_settings)
+            place_holder_image = self.store_image(
+                generate_place_holder_image(self.display_settings_service.display_settings)
+            )
             logger.info("Display has changed, clearing slideshow configuration")
             with self._lock:
                 # Reset config and persist together
-                self._slideshow_configuration = SlideshowConfiguration(images=[place_holder_image], change_delay=1800)
-                self.store_slideshow_configuration(self._slideshow_configuration)
+                self._slideshow = Slideshow(images=[place_holder_image], change_delay=1800)
+                self.store_slideshow(self._slideshow)
 
         if settings.mode == DisplayMode.SLIDESHOW:
             logger.info("Slideshow mode is active, restart slideshow")
@@ -87,34 +279,70 @@ class SlideshowService(ModeAbstract):
             logger.info("Slideshow mode has been disabled, stop slideshow")
             self.slideshow_worker.stop()
 
-    def store_slideshow_configuration(self, slideshow_configuration: SlideshowConfiguration):
+    def store_slideshow(self, slideshow: Slideshow):
         with self._lock:
-            with open(os.path.join(os.getenv("DATA_DIR", ""), "slideshow.json"), "w") as file:
-                json.dump(slideshow_configuration.model_dump(), file, ensure_ascii=False, indent=4)
+            # Only the images that were added, removed or moved are written
+            slideshow_json = slideshow.model_dump(mode="json")
+            self.state_store.put_slideshow(
+                {name: value for name, value in slideshow_json.items() if name != "images"}, slideshow_json["images"]
+            )
+            # Images that are no longer in the slideshow are not needed
+            self.image_store.prune({image.key for image in slideshow.images})
         logger.info("Slideshow Configuration stored")
 
     def default_to_placeholder_image(self):
-        place_holder_image = generate_place_holder_image(self.display_settings_service.display_settings)
+        place_holder_image = self.store_image(
+            generate_place_holder_image(self.display_settings_service.display_settings)
+        )
         with self._lock:
             # Read change_delay, write new config, and persist together
-            change_delay = self._slideshow_configuration.change_delay
+            change_delay = self._slideshow.change_delay
             logger.info("Defaulting slideshow to placeholder image")
-            self._slideshow_configuration = SlideshowConfiguration(
-                images=[place_holder_image], change_delay=change_delay
-            )
-            self.store_slideshow_configuration(self._slideshow_configuration)
+            self._slideshow = Slideshow(images=[place_holder_image], change_delay=change_delay)
+            self.store_slideshow(self._slideshow)
 
-    def restore_slideshow(self) -> SlideshowConfiguration | None:
-        slideshow_configuration_json = self.read_stored_slideshow_configuration()
-        if isinstance(slideshow_configuration_json, dict):
-            logger.info("Existing slideshow configuration found")
-            slideshow_configuration = SlideshowConfiguration(**slideshow_configuration_json)
-            return slideshow_configuration
+    def restore_slideshow(self) -> Slideshow | None:
+        slideshow_json = self.state_store.get_slideshow()
+        if slideshow_json is None:
+            return self.import_slideshow_file()
 
-    def read_stored_slideshow_configuration(self):
-        try:
-            with open(os.path.join(os.getenv("DATA_DIR", ""), "slideshow.json"), "r") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            logger.info("No slideshow configuration file found...")
-            return False
+        logger.info("Existing slideshow configuration found")
+        return self.without_missing_images(Slideshow(**slideshow_json))
+
+    def import_slideshow_file(self) -> Slideshow | None:
+        # The slideshow used to be stored in slideshow.json, it is moved into the state store the first time it is read
+        slideshow_json = self.state_store.read_json_state("slideshow.json")
+        if not isinstance(slideshow_json, dict):
+            logger.info("No slideshow configuration found...")
+            return None
+
+        logger.info("Existing slideshow configuration found in slideshow.json")
+        images = slideshow_json.get("images", [])
+        if any(isinstance(image, str) for image in images):
+            # Slideshows used to be stored with their images inline as base64, move the images into the image store
+            logger.info("Moving slideshow images from slideshow.json into the image store...")
+            slideshow = Slideshow(**{**slideshow_json, "images": self.import_images(images)})
+        else:
+            slideshow = self.without_missing_images(Slideshow(**slideshow_json))
+        self.store_slideshow(slideshow)
+        self.state_store.retire_json_state("slideshow.json")
+        return slideshow
+
+    def import_images(self, base64_images: list[str]) -> list[SlideshowImage]:
+        # Images that are no longer accepted, e.g. as they are over the pixel limit, are removed rather than stopping
+        # the app from starting
+        imported_images = []
+        for position, base64_image in enumerate(base64_images):
+            try:
+                imported_images.append(self.store_image(validate_image(base64_image)))
+            except ValueError as err:
+                logger.error(f"Slideshow image {position + 1} could not be imported, removing it: {err}")
+        return imported_images
+
+    def without_missing_images(self, slideshow: Slideshow) -> Slideshow:
+        # Only the references are read, the images themselves are not loaded until they are displayed
+        missing_images = [image for image in slideshow.images if not self.image_store.contains(image.key)]
+        if missing_images:
+            logger.error(f"{len(missing_images)} slideshow images are missing from the image store, removing them")
+            slideshow.images = [image for image in slideshow.images if image not in missing_images]
+        return slideshow
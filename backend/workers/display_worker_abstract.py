@@ -1,19 +1,37 @@
+import io
 import os
 import threading
 import gc
 from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
 
 from PIL import Image
 
 from backend.lib.display_utilis import (
     InkyDisplay,
     construct_palette,
-    detect_inky_display,
+    create_detected_display,
     resolve_display_from_settings,
 )
-from backend.lib.image_utilis import crop_image_width, crop_image_height, pad_image, dither
+from backend.lib.display_profile import DisplayProfile, resolve_profile_from_settings
+from backend.lib.fingerprint import Fingerprint, content_hash
+from backend.lib.image_utilis import changed_pixel_fraction, dithers_in_parallel
 from backend.lib.logger_setup import logger
-from backend.models.display_model import DisplaySettings, DetectionError, DisplayType, BorderColour
+from backend.lib.palette_lut import get_palette_lut
+from backend.lib.render_executor import RenderExecutor, render_frame_job
+from backend.models.display_model import (
+    DisplaySettings,
+    DetectionError,
+    DitherAlgorithm,
+    FitMode,
+)
+
+
+@dataclass
+class RefreshStats:
+    # Number of times the display was refreshed, and the number of refreshes skipped as the frame had not changed enough
+    refreshes: int = 0
+    skipped_refreshes: int = 0
 
 
 class DisplayWorkerAbstract(ABC):
@@ -23,51 +41,110 @@ class DisplayWorkerAbstract(ABC):
     stop_event: threading.Event
     thread: threading.Thread | None
     display: InkyDisplay | DetectionError | None
+    display_settings: DisplaySettings | None
+    # The frame last shown on the display, None when what the display is showing is unknown
+    panel_frame: Image.Image | None
+    # The panel frame encoded as a PNG and its hash, encoded once when first requested after each refresh
+    panel_frame_png: tuple[str, bytes] | None
+    refresh_stats: RefreshStats
+    render_executor: RenderExecutor
     _lock: threading.RLock
+    _refresh_lock: threading.Lock
 
-    def __init__(self, worker_name: str):
+    def __init__(self, worker_name: str, render_executor: RenderExecutor):
         self.worker_name = worker_name
         self.running = False
         self.thread = None
         self.stop_event = threading.Event()
         self.display = None
+        self.display_settings = None
+        self.panel_frame = None
+        self.panel_frame_png = None
+        self.refresh_stats = RefreshStats()
+        self.render_executor = render_executor
         self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
 
     @abstractmethod
     def get_current_image_in_base64(self) -> str | None:
         pass
 
+    @abstractmethod
+    def get_current_image_fingerprint(self) -> Fingerprint | None:
+        pass
+
     @abstractmethod
     def run(self):
         pass
 
+    def get_current_image_etag(self) -> str | None:
+        # Identifies the image returned by get_current_image_in_base64, for answering conditional requests
+        fingerprint = self.get_current_image_fingerprint()
+        return fingerprint.identity if fingerprint else None
+
+    def get_panel_frame_png(self) -> tuple[str, bytes] | None:
+        # Returns the hash and PNG bytes of the frame on the display, or None if nothing has been shown yet
+        with self._refresh_lock:
+            frame = self.panel_frame
+            panel_frame_png = self.panel_frame_png
+        if panel_frame_png is None and frame is not None:
+            png_stream = io.BytesIO()
+            frame.save(png_stream, "PNG")
+            png = png_stream.getvalue()
+            panel_frame_png = (content_hash(png), png)
+            with self._refresh_lock:
+                # Only keep the encoding if the display was not refreshed while it was being encoded
+                if self.panel_frame is frame:
+                    self.panel_frame_png = panel_frame_png
+        return panel_frame_png
+
+    def get_refresh_stats(self) -> dict[str, int]:
+        with self._refresh_lock:
+            return asdict(self.refresh_stats)
+
     def start(self, display_settings: DisplaySettings):
         with self._lock:
             if self.running:
                 logger.info(f"{self.worker_name} is already running, restarting with latest settings...")
                 self.stop()
 
-            self.display = detect_inky_display()
-            if not isinstance(self.display, InkyDisplay):
-                logger.info("Manual initialisation of Inky Device will be attempted")
-                self.display = resolve_display_from_settings(display_settings)
-
-            if display_settings.type in (DisplayType.PHAT_104, DisplayType.PHAT_122):
-                selected_border_colour = 1 if display_settings.border_colour == BorderColour.BLACK else 0
-            else:
-                selected_border_colour = 0 if display_settings.border_colour == BorderColour.BLACK else 1
-
-            logger.debug(f"Setting border colour to {display_settings.border_colour}({selected_border_colour})")
-            self.display.set_border(selected_border_colour)
+            # Resolved up front so settings the display does not support are refused by the caller
+            display_profile = resolve_profile_from_settings(display_settings)
+            self.display_settings = display_settings
+            # Another worker may have used the display since, and the border will be set, so the first frame is
+            # always shown
+            with self._refresh_lock:
+                self.panel_frame = None
+                self.panel_frame_png = None
 
             logger.info(f"Starting {self.worker_name}...")
             self.running = True
             # reset the stop event
             self.stop_event.clear()
             # create and start the thread
-            self.thread = threading.Thread(target=self.run)
+            self.thread = threading.Thread(target=self.run_on_display, args=(display_settings, display_profile))
             self.thread.start()
 
+    def run_on_display(self, display_settings: DisplaySettings, display_profile: DisplayProfile):
+        # Importing the driver and setting up its pins is done on the worker's thread, so the app does not wait for it
+        # when a worker is started at boot
+        try:
+            display = create_detected_display(display_settings)
+            if display is None:
+                logger.info("Manual initialisation of Inky Device will be attempted")
+                display = resolve_display_from_settings(display_settings)
+
+            selected_border_colour = display_profile.border_index(display_settings.border_colour)
+            logger.debug(f"Setting border colour to {display_settings.border_colour}({selected_border_colour})")
+            display.set_border(selected_border_colour)
+        except Exception as e:  # noqa: BLE001 - the worker runs without a display rather than stopping
+            logger.error(f"Failed to initialise Inky display for {self.worker_name}: {e}")
+            return
+        self.display = display
+        # Warm the palette lookup table for this display so the first render does not pay for building it
+        get_palette_lut(construct_palette(display))
+        self.run()
+
     def shutdown(self, signum, frame):
         if self.running:
             logger.info(f"{self.worker_name} is running and the application has received a signal to shut down")
@@ -92,30 +169,54 @@ class DisplayWorkerAbstract(ABC):
             gc.collect()
             self.running = False
 
-    @staticmethod
-    def display_image(display: InkyDisplay, image: Image.Image) -> Image.Image:
-        if image.mode != "P":
-            logger.info(f"Image is not in palette mode ({image.mode}), attempt to dither it")
-            # Construct a palette to apply in the dithering process
-            palette: list[int] = construct_palette(display)
-            # Dither the image
-            image = dither(image, palette)
-
-        if image.width > display.resolution[0]:
-            logger.info("Image is wider than display width, cropping image")
-            image = crop_image_width(image, display.resolution)
-
-        if image.height > display.resolution[1]:
-            logger.info("Image is higher than display height, cropping image")
-            image = crop_image_height(image, display.resolution)
-
-        if image.width < display.resolution[0] or image.height < display.resolution[1]:
-            image = pad_image(display.resolution, image)
+    def display_image(
+        self,
+        display: InkyDisplay,
+        source: bytes | str,
+        dither_algorithm: DitherAlgorithm = DitherAlgorithm.FLOYD_STEINBERG,
+        fit_mode: FitMode = FitMode.CROP,
+        parallel_dithering: bool = False,
+    ) -> Image.Image:
+        image = self.render_source_image(display, source, dither_algorithm, fit_mode, parallel_dithering)
+        self.show_image(display, image)
+        return image
 
+    def render_source_image(
+        self,
+        display: InkyDisplay,
+        source: bytes | str,
+        dither_algorithm: DitherAlgorithm = DitherAlgorithm.FLOYD_STEINBERG,
+        fit_mode: FitMode = FitMode.CROP,
+        parallel_dithering: bool = False,
+    ) -> Image.Image:
+        # Renders the encoded image, or the image at the path, into a frame for the display in the render executor
+        # (see render_executor), waiting for it to have room for the job
+        return self.render_executor.submit(
+            render_frame_job,
+            source,
+            display.resolution,
+            construct_palette(display),
+            dither_algorithm,
+            fit_mode,
+            parallel_dithering,
+            block=True,
+            in_process=dithers_in_parallel(dither_algorithm, parallel_dithering),
+        ).result()
+
+    def show_image(self, display: InkyDisplay, image: Image.Image):
         if os.getenv("DEV", "False").lower() == "true":
             # When in dev save the image to disk for debugging purposes
             image.save("result.png")
 
+        refresh_threshold = self.display_settings.refresh_threshold if self.display_settings else 0.0
+        with self._refresh_lock:
+            # Compare with what is on the display, rather than the last frame skipped, so small changes cannot add up
+            changed_fraction = changed_pixel_fraction(image, self.panel_frame)
+            if changed_fraction == 0 or changed_fraction < refresh_threshold:
+                self.refresh_stats.skipped_refreshes += 1
+                logger.info(f"{changed_fraction:.2%} of the frame has changed, skipping refresh of Inky display")
+                return
+
         display.set_image(image)
 
         if os.getenv("DESKTOP", "False").lower() == "true":
@@ -127,7 +228,12 @@ class DisplayWorkerAbstract(ABC):
                 logger.info("Inky display image updated!")
             except Exception as e:
                 logger.error(f"Failed to update Inky display: {e}")
+                return
             except SystemExit as e:
                 logger.error(f"SystemExit encountered while updating Inky display: {e}")
+                return
 
-        return image
+        with self._refresh_lock:
+            self.panel_frame = image
+            self.panel_frame_png = None
+            self.refresh_stats.refreshes += 1
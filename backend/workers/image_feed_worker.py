@@ -1,12 +1,17 @@
-import io
 import threading
 
-import requests
 from PIL import Image
 
-from backend.lib.image_utilis import pil_image_to_base64
+from backend.lib.display_utilis import construct_palette
+from backend.lib.feed_client import FeedClient
+from backend.lib.fingerprint import Fingerprint, content_hash
+from backend.lib.frame_cache import FrameCache
+from backend.lib.http_cache import conditional_request_headers, next_poll_delay
+from backend.lib.image_utilis import dithers_in_parallel, pil_image_to_base64
+from backend.lib.image_validation import is_within_pixel_limit, probe_image
 from backend.lib.logger_setup import logger
-from backend.models.display_model import DetectionError, DisplaySettings
+from backend.lib.render_executor import RenderExecutor, render_changed_frame_job
+from backend.models.display_model import DetectionError, DisplaySettings, FitMode
 from backend.models.image_feed_model import ImageFeedConfiguration
 from backend.workers.display_worker_abstract import DisplayWorkerAbstract
 
@@ -14,40 +19,82 @@ from backend.workers.display_worker_abstract import DisplayWorkerAbstract
 class ImageFeedWorker(DisplayWorkerAbstract):
     polling_interval: int
     image_feed_url: str | None
-    current_image: Image.Image | None
+    max_image_size: int
+    fit_mode: FitMode
+    # Fingerprint of the image on the display, the bytes hashed are those most recently received for it
+    current_fingerprint: Fingerprint | None
     displaying_image: Image.Image | None
+    # The displaying image encoded for the API, encoded on first request rather than on every change
+    displaying_image_base64: str | None
+    # How the displaying image was rendered, the same feed image is rendered differently after a settings change
+    displaying_image_profile: str | None
+    # Validators of the last image received from the feed, used to ask the feed for the image only if it has changed
+    etag: str | None
+    last_modified: str | None
+    feed_client: FeedClient
     _image_feed_lock: threading.Lock
 
-    def __init__(self):
-        super().__init__("image_feed_worker")
+    def __init__(self, feed_client: FeedClient, render_executor: RenderExecutor):
+        super().__init__("image_feed_worker", render_executor)
         logger.info("Created ImageFeedWorker")
         self.polling_interval = 120
         self.image_feed_url = None
-        self.current_image = None
+        self.max_image_size = 15100
+        self.fit_mode = FitMode.CROP
+        self.current_fingerprint = None
         self.displaying_image = None
+        self.displaying_image_base64 = None
+        self.displaying_image_profile = None
+        self.etag = None
+        self.last_modified = None
+        self.feed_client = feed_client
         self._image_feed_lock = threading.Lock()
 
     def start_image_feed(self, image_feed_configuration: ImageFeedConfiguration, display_settings: DisplaySettings):
         with self._image_feed_lock:
             self.polling_interval = image_feed_configuration.polling_interval
             self.image_feed_url = image_feed_configuration.image_feed_url
+            self.fit_mode = image_feed_configuration.fit_mode
+            self.max_image_size = image_feed_configuration.max_image_size
         self.start(display_settings)
 
     def get_current_image_in_base64(self) -> str | None:
         with self._image_feed_lock:
             image = self.displaying_image
-        if isinstance(image, Image.Image):
-            return pil_image_to_base64(image)
+            image_base64 = self.displaying_image_base64
+        if image_base64 is None and isinstance(image, Image.Image):
+            image_base64 = pil_image_to_base64(image)
+            with self._image_feed_lock:
+                # Only keep the encoding if the image was not replaced while it was being encoded
+                if self.displaying_image is image:
+                    self.displaying_image_base64 = image_base64
+        return image_base64
+
+    def get_current_image_fingerprint(self) -> Fingerprint | None:
+        with self._image_feed_lock:
+            return self.current_fingerprint
+
+    def get_current_image_etag(self) -> str | None:
+        # The image returned is the rendered frame rather than the feed image, so it is identified by both the feed
+        # image and how it was rendered
+        with self._image_feed_lock:
+            fingerprint = self.current_fingerprint
+            profile = self.displaying_image_profile
+        if fingerprint is None or profile is None:
+            return None
+        return content_hash(f"{fingerprint.identity}_{profile}".encode())
 
     def run(self):
         display = self.display
+        display_settings = self.display_settings
         first_run = True
         while not self.stop_event.is_set():
-            image: Image.Image | None = None
             with self._image_feed_lock:
                 image_feed_url = self.image_feed_url
-                current_image = self.current_image
+                current_fingerprint = self.current_fingerprint
                 polling_interval = self.polling_interval
+                fit_mode = self.fit_mode
+                max_image_size = self.max_image_size
             try:
                 if image_feed_url is None:
                     raise ValueError("Image feed URL is not defined")
@@ -55,30 +102,75 @@ class ImageFeedWorker(DisplayWorkerAbstract):
                 if display is None or display == DetectionError.UNSUPPORTED:
                     raise ValueError(f"Display has not been setup or is unsupported: {display}")
 
-                image_data = requests.get(image_feed_url).content
+                if display_settings is None:
+                    raise ValueError("Display settings have not been set")
 
-                previous_image_base64 = None
-                if current_image:
-                    previous_image_base64 = pil_image_to_base64(current_image)
+                # The first request of a run always fetches the image, as it has to be displayed regardless
+                request_headers = {} if first_run else conditional_request_headers(self.etag, self.last_modified)
+                response = self.feed_client.fetch(image_feed_url, request_headers, max_image_size * 1024)
+                logger.info(f"Fetched image feed {image_feed_url} ({response.status_code}): {response.timings}")
+                # Poll again once the image is no longer fresh, or after the polling interval if that is longer
+                poll_delay = next_poll_delay(polling_interval, response.headers)
 
-                image_stream = io.BytesIO(image_data)
-                image = Image.open(image_stream)
-                current_image_base64 = pil_image_to_base64(image)
+                if response.status_code == 304:
+                    logger.info(f"Image from feed {image_feed_url} has not been modified, no need to update display")
+                    self.stop_event.wait(poll_delay)
+                    continue
 
-                with self._image_feed_lock:
-                    self.current_image = image
+                image_data = response.content
 
-                if previous_image_base64 != current_image_base64 or first_run:
-                    displaying_image = self.display_image(display, image)
+                # Hashing the bytes is enough to recognise an image the feed has sent before, without decoding it
+                content = content_hash(image_data)
+                if first_run or current_fingerprint is None or content != current_fingerprint.content:
+                    # Read only the header first, an image too large to decode is refused before it is decoded
+                    is_within_pixel_limit(probe_image(image_data), display.resolution, True)
+                    # The bytes differ, but the picture may not, e.g. it has been saved again with new metadata.
+                    # The render executor hashes the pixels of the image and only renders it when they differ from the
+                    # pixels displayed, so the image is decoded once.
+                    previous_pixel_hash = (
+                        None if first_run or current_fingerprint is None else current_fingerprint.pixels
+                    )
+                    image_pixel_hash, frame = self.render_executor.submit(
+                        render_changed_frame_job,
+                        image_data,
+                        previous_pixel_hash,
+                        display.resolution,
+                        construct_palette(display),
+                        display_settings.dither_algorithm,
+                        fit_mode,
+                        display_settings.parallel_dithering,
+                        block=True,
+                        in_process=dithers_in_parallel(
+                            display_settings.dither_algorithm, display_settings.parallel_dithering
+                        ),
+                    ).result()
+                    image_fingerprint = Fingerprint(content, image_pixel_hash)
+                    if frame is not None:
+                        self.show_image(display, frame)
+                        with self._image_feed_lock:
+                            self.displaying_image = frame
+                            self.displaying_image_base64 = None
+                            self.displaying_image_profile = (
+                                f"{FrameCache.profile_key(display_settings)}_{fit_mode.value}"
+                            )
+                        logger.info(f"Displaying image from feed {image_feed_url}")
+                    else:
+                        logger.info(f"Image from feed {image_feed_url} has not changed, no need to update display")
+                    # Remember the latest bytes, so the picture is recognised from its bytes alone next time
                     with self._image_feed_lock:
-                        self.displaying_image = displaying_image
-                    logger.info(f"Displaying image from feed {image_feed_url}")
+                        self.current_fingerprint = image_fingerprint
                 else:
                     logger.info(f"Image from feed {image_feed_url} has not changed, no need to update display")
 
+                # The validators are only kept once the image has been displayed, or recognised as the one displayed.
+                # Were the image to fail to render, the next poll has to fetch it again rather than be told it has not
+                # been modified.
+                self.etag = response.headers.get("ETag")
+                self.last_modified = response.headers.get("Last-Modified")
                 first_run = False
-                # Sleep for the allotted interval until retrieving the next image
-                self.stop_event.wait(polling_interval)
+                # Sleep until it is time to retrieve the next image
+                logger.debug(f"Polling feed again in {poll_delay} seconds")
+                self.stop_event.wait(poll_delay)
             except Exception as err:
                 logger.error(f"Failed to retrieve a valid image from feed: {err}")
                 logger.info("Waiting before attempting to retrieve again...")
@@ -1,57 +1,209 @@
 import threading
+import time
 
-from backend.lib.image_utilis import base64_to_pil_image
+from PIL import Image
+
+from backend.lib.display_utilis import InkyDisplay
+from backend.lib.fingerprint import Fingerprint
+from backend.lib.frame_cache import FrameCache
+from backend.lib.image_store import ImageStore
 from backend.lib.logger_setup import logger
-from backend.models.display_model import DisplaySettings, DetectionError
-from backend.models.slideshow_model import SlideshowConfiguration
+from backend.lib.render_executor import RenderExecutor
+from backend.models.display_model import DisplaySettings, DetectionError, FitMode
+from backend.models.slideshow_model import Slideshow, SlideshowImage
 from backend.workers.display_worker_abstract import DisplayWorkerAbstract
 
 
 class SlideshowWorker(DisplayWorkerAbstract):
-    images: list[str]
+    images: list[SlideshowImage]
     delay_seconds: int
-    current_image: str
+    fit_mode: FitMode
+    current_image: SlideshowImage | None
+    current_fingerprint: Fingerprint | None
     next_image_index: int
+    # Set when the images have changed, so their frames are rendered ahead of time
+    playlist_changed: bool
+    # Set when the image being shown is removed or fitted differently, so the next image is shown straight away
+    show_next_now: bool
+    # Set to show the next image before the delay has passed, or when the delay has changed
+    wake_event: threading.Event
+    frame_cache: FrameCache
+    image_store: ImageStore
     _slideshow_lock: threading.Lock
 
-    def __init__(self):
-        super().__init__("slideshow_worker")
+    def __init__(self, frame_cache: FrameCache, image_store: ImageStore, render_executor: RenderExecutor):
+        super().__init__("slideshow_worker", render_executor)
         logger.info("Created SlideshowWorker")
         self.images = []
         self.delay_seconds = 30
+        self.fit_mode = FitMode.CROP
+        self.current_image = None
+        self.current_fingerprint = None
         self.next_image_index = 0
+        self.playlist_changed = False
+        self.show_next_now = False
+        self.wake_event = threading.Event()
+        self.frame_cache = frame_cache
+        self.image_store = image_store
         self._slideshow_lock = threading.Lock()
 
-    def start_slideshow(self, slideshow_configuration: SlideshowConfiguration, display_settings: DisplaySettings):
+    def start_slideshow(self, slideshow: Slideshow, display_settings: DisplaySettings):
         with self._slideshow_lock:
-            self.images = slideshow_configuration.images
-            self.delay_seconds = slideshow_configuration.change_delay
+            self.images = slideshow.images
+            self.delay_seconds = slideshow.change_delay
+            self.fit_mode = slideshow.fit_mode
             self.next_image_index = 0
         self.start(display_settings)
 
     def get_current_image_in_base64(self) -> str | None:
         with self._slideshow_lock:
-            return self.current_image
+            current_image = self.current_image
+        if current_image is not None:
+            return self.image_store.get_base64(current_image.key)
+
+    def get_current_image_fingerprint(self) -> Fingerprint | None:
+        with self._slideshow_lock:
+            return self.current_fingerprint
+
+    def update_slideshow(self, slideshow: Slideshow):
+        # Change the images and timing of the running slideshow, without restarting it
+        with self._slideshow_lock:
+            image_ids = [image.id for image in slideshow.images]
+            current_image = self.current_image
+            next_image = self.images[self.next_image_index] if self.images else None
+            # Show an image now, rather than after the delay, if the one being shown is removed or fitted differently
+            show_now = current_image is None or current_image.id not in image_ids or self.fit_mode != slideshow.fit_mode
+            # A new delay applies to the image being shown, so the wait for the next image has to be recalculated
+            delay_changed = self.delay_seconds != slideshow.change_delay
+
+            if current_image is not None and current_image.id in image_ids:
+                # Carry on from the image being shown, wherever it has moved to
+                current_index = image_ids.index(current_image.id)
+                self.next_image_index = current_index if show_now else (current_index + 1) % len(image_ids)
+            elif next_image is not None and next_image.id in image_ids:
+                self.next_image_index = image_ids.index(next_image.id)
+            else:
+                self.next_image_index = 0
+
+            self.images = slideshow.images
+            self.delay_seconds = slideshow.change_delay
+            self.fit_mode = slideshow.fit_mode
+            self.playlist_changed = True
+            if show_now:
+                self.show_next_now = True
+        if show_now or delay_changed:
+            self.wake_event.set()
+
+    def stop(self):
+        # Wake the slideshow once it has been told to stop, so it does not wait out its delay before noticing
+        self.stop_event.set()
+        self.wake_event.set()
+        super().stop()
 
     def run(self):
         display = self.display
-        while not self.stop_event.is_set():
-            with self._slideshow_lock:
-                images = self.images
-                delay_seconds = self.delay_seconds
-                next_image_index = self.next_image_index
+        display_settings = self.display_settings
+        self.wake_event.clear()
+        with self._slideshow_lock:
+            # Every frame is rendered ahead of time once the first image has been shown
+            self.playlist_changed = True
+            self.show_next_now = False
 
+        while not self.stop_event.is_set():
             if display is None or display == DetectionError.UNSUPPORTED:
                 raise ValueError(f"Display has not been setup or is unsupported: {display}")
 
+            if display_settings is None:
+                raise ValueError("Display settings have not been set")
+
             with self._slideshow_lock:
+                images = self.images
+                fit_mode = self.fit_mode
+                next_image_index = self.next_image_index
+                playlist_changed = self.playlist_changed
+                self.playlist_changed = False
+
                 current_image = images[next_image_index]
                 self.current_image = current_image
+                # Images are stored by their hash, which identifies them and keys their frames in the frame cache
+                self.current_fingerprint = Fingerprint(current_image.key)
                 logger.info(f"Displaying image number #{next_image_index}. Running is: {self.running}")
                 # increment the image index
                 self.next_image_index = (next_image_index + 1) % len(images)
 
-            image = base64_to_pil_image(current_image)
-            self.display_image(display, image)
-            # sleep for the allotted delay until the next image is displayed
-            self.stop_event.wait(delay_seconds)
+            frame_key = FrameCache.frame_key(current_image.key, fit_mode)
+            frame = self.load_frame(display, display_settings, fit_mode, current_image, frame_key)
+            self.show_image(display, frame)
+            shown_at = time.monotonic()
+
+            if playlist_changed:
+                # Render the remaining images now, so every following change is read straight from the cache
+                self.prerender_frames(display, display_settings, fit_mode, images)
+
+            # sleep for the allotted delay until the next image is displayed, unless the slideshow is changed
+            self.wait_for_next_image(shown_at)
+
+    def wait_for_next_image(self, shown_at: float):
+        # Waits until the delay has passed since the image was shown. When woken because only the delay has changed,
+        # it carries on waiting for whatever remains of the new delay
+        while not self.stop_event.is_set():
+            with self._slideshow_lock:
+                if self.show_next_now:
+                    self.show_next_now = False
+                    return
+                remaining_seconds = self.delay_seconds - (time.monotonic() - shown_at)
+            if remaining_seconds <= 0:
+                return
+            self.wake_event.wait(remaining_seconds)
+            self.wake_event.clear()
+
+    def load_frame(
+        self,
+        display: InkyDisplay,
+        display_settings: DisplaySettings,
+        fit_mode: FitMode,
+        image: SlideshowImage,
+        frame_key: str,
+    ) -> Image.Image:
+        frame = self.frame_cache.get(frame_key, display_settings)
+        if frame is None:
+            logger.info(f"No cached frame found for image {frame_key[:12]}, rendering it")
+            frame = self.render_frame(display, display_settings, fit_mode, image, frame_key)
+        return frame
+
+    def render_frame(
+        self,
+        display: InkyDisplay,
+        display_settings: DisplaySettings,
+        fit_mode: FitMode,
+        image: SlideshowImage,
+        frame_key: str,
+    ) -> Image.Image:
+        # The image is opened from the store lazily in the render process, so it can be decoded at reduced size
+        frame = self.render_source_image(
+            display,
+            self.image_store.image_path(image.key),
+            display_settings.dither_algorithm,
+            fit_mode,
+            display_settings.parallel_dithering,
+        )
+        self.frame_cache.put(frame_key, display_settings, frame)
+        return frame
+
+    def prerender_frames(
+        self,
+        display: InkyDisplay,
+        display_settings: DisplaySettings,
+        fit_mode: FitMode,
+        images: list[SlideshowImage],
+    ):
+        frame_keys = [FrameCache.frame_key(image.key, fit_mode) for image in images]
+        for image, frame_key in zip(images, frame_keys):
+            if self.stop_event.is_set():
+                return
+            if not self.frame_cache.contains(frame_key, display_settings):
+                logger.info(f"Pre-rendering frame for image {frame_key[:12]}")
+                self.render_frame(display, display_settings, fit_mode, image, frame_key)
+
+        # Frames of images that have been removed from the slideshow are no longer needed
+        self.frame_cache.prune(set(frame_keys), display_settings)
@@ -0,0 +1,91 @@
+import io
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from backend.lib.feed_client import FeedResponse
+from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings, DisplayType
+from backend.workers import image_feed_worker
+from backend.workers.image_feed_worker import ImageFeedWorker
+
+
+def png(colour: tuple[int, int, int]) -> bytes:
+    png_stream = io.BytesIO()
+    Image.new("RGB", (30, 20), colour).save(png_stream, "PNG")
+    return png_stream.getvalue()
+
+
+class FakeFeedClient:
+    # Serves the images in turn, each with its own ETag, and answers 304 when the client already has the image
+    def __init__(self, worker: ImageFeedWorker, render_executor: "FakeRenderExecutor", images: list[bytes]):
+        self.worker = worker
+        self.render_executor = render_executor
+        self.images = images
+        self.requests = []
+
+    def fetch(self, url: str, headers: dict[str, str] | None = None, max_bytes: int | None = None) -> FeedResponse:
+        self.requests.append(headers)
+        version = min(len(self.requests), len(self.images))
+        etag = f'"v{version}"'
+        if len(self.requests) > len(self.images) + 1:
+            self.worker.stop_event.set()
+        if headers and headers.get("If-None-Match") == etag:
+            return FeedResponse(304, {"ETag": etag}, None)
+        if version == 2 and not self.render_executor.failed:
+            # The render of the new image fails the first time it is fetched
+            self.render_executor.fail_next = True
+        return FeedResponse(200, {"ETag": etag}, self.images[version - 1])
+
+
+class FakeRenderExecutor:
+    # Runs jobs in the calling thread, failing the next job as the pool would if a process had died
+    def __init__(self):
+        self.fail_next = False
+        self.failed = False
+
+    def submit(self, job, *args, block: bool = False, in_process: bool = False) -> Future:
+        future = Future()
+        if self.fail_next:
+            self.fail_next = False
+            self.failed = True
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        else:
+            future.set_result(job(*args))
+        return future
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    render_executor = FakeRenderExecutor()
+    worker = ImageFeedWorker(None, render_executor)
+    worker.display = SimpleNamespace(resolution=(30, 20))
+    worker.display_settings = DisplaySettings(
+        type=DisplayType.PHAT_104, colour_palette=ColourPalette.RED, border_colour=BorderColour.WHITE
+    )
+    worker.image_feed_url = "http://feed/image"
+    worker.polling_interval = 0
+    worker.shown = []
+    monkeypatch.setattr(image_feed_worker, "construct_palette", lambda display: [255, 255, 255, 0, 0, 0])
+    monkeypatch.setattr(worker, "show_image", lambda display, image: worker.shown.append(image))
+    return worker
+
+
+def test_image_is_fetched_again_after_failing_to_render(worker):
+    feed_client = FakeFeedClient(worker, worker.render_executor, [png((200, 0, 0)), png((0, 0, 200))])
+    worker.feed_client = feed_client
+
+    worker.run()
+
+    # The validators of the image that failed to render are not kept, so it is fetched again rather than skipped
+    assert feed_client.requests[:4] == [
+        {},
+        {"If-None-Match": '"v1"'},
+        {"If-None-Match": '"v1"'},
+        {"If-None-Match": '"v2"'},
+    ]
+    assert worker.render_executor.failed
+    assert len(worker.shown) == 2
+    assert worker.etag == '"v2"'
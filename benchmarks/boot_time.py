@@ -0,0 +1,101 @@
+"""
+Measures the cold start of the app: the time from starting a fresh interpreter to the app answering its first request
+(GET /api/settings through the Flask test client), and which imports that time goes on, from the output of
+python -X importtime.
+
+Each boot uses an empty data directory in desktop mode, so the app starts as it would the first time on a Raspberry Pi
+with no display attached. Run from the root of the repository:
+    python -m benchmarks.boot_time [--repeats 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Boots the app and answers a request, then stops the workers and render processes as the app does on SIGTERM. It is
+# run from a file behind a main guard, as the render processes are started from a fork server that imports __main__
+BOOT_SCRIPT = """
+if __name__ == "__main__":
+    import signal
+    import sys
+    from backend.app import app, thread_shutdown_handler
+
+    response = app.test_client().get("/api/settings")
+    inky_modules = sorted(name for name in sys.modules if name == "inky" or name.startswith("inky."))
+    print(f"first response {response.status_code} {','.join(inky_modules)}", flush=True)
+    thread_shutdown_handler(signal.SIGTERM, None)
+"""
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def boot(*options: str) -> tuple[float, list[str], str]:
+    # Returns the seconds taken to answer the first request, the inky modules imported by then, and what the interpreter
+    # wrote to stderr
+    with tempfile.TemporaryDirectory() as data_dir:
+        script_path = os.path.join(data_dir, "boot.py")
+        with open(script_path, "w") as script:
+            script.write(BOOT_SCRIPT)
+        env = dict(os.environ, DATA_DIR=data_dir, DESKTOP="True", DEV="False", PYTHONPATH=REPOSITORY_DIR)
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, *options, script_path],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        # The logo is printed to stdout at boot, before the status of the first response
+        status = None
+        inky_modules = []
+        for line in process.stdout:
+            if line.startswith("first response"):
+                status, *inky_modules = line.split()[2:]
+                inky_modules = inky_modules[0].split(",") if inky_modules else []
+                break
+        elapsed = time.perf_counter() - start
+        _, stderr = process.communicate()
+    if status != "200":
+        raise RuntimeError(f"The app did not answer its first request:\n{stderr}")
+    return elapsed, inky_modules, stderr
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, str, int]]:
+    # The depth, name and cumulative microseconds of each import, lines look like
+    # "import time:       542 |      96950 |   inky.inky", and are indented by two spaces for each level
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, total, name = line[len("import time:") :].split("|")
+        imports.append(((len(name) - len(name.lstrip()) - 1) // 2, name.strip(), int(total)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the time from a cold start to the first response")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Number of the slowest imports to show")
+    parser.add_argument("--depth", type=int, default=2, help="Levels of nested imports to show, 0 is the script's own")
+    args = parser.parse_args()
+
+    boots = [boot() for _ in range(args.repeats)]
+    timings = [elapsed for elapsed, _, _ in boots]
+    print(f"Boot to first response, median of {args.repeats}: {statistics.median(timings) * 1000:.0f} ms")
+    inky_modules = boots[-1][1]
+    print(f"Inky modules imported by the first response: {', '.join(inky_modules) or 'none'}")
+
+    # The workers import on their own threads, so their imports are interleaved with those of the app
+    _, _, stderr = boot("-X", "importtime")
+    imports = parse_importtime(stderr)
+    print("\nSlowest imports (-X importtime, cumulative)")
+    shown = [(name, total) for depth, name, total in imports if depth <= args.depth]
+    for name, total in sorted(shown, key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"{name:<40}{total / 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Compares the peak memory (RSS) of rendering a large photo for every display type, using the baseline render path (the
+image is converted to RGB and quantized whole by Pillow with Floyd-Steinberg, then cropped and padded, as frames were
+rendered before streaming was added) and the streaming render path (the image is dithered a band of rows at a time
+straight into the frame). The dither algorithm chosen only applies to the streaming path.
+
+Floyd-Steinberg is not streamed, Pillow quantizes the region of the image visible on the display whole. Its column is
+labelled "cropped" rather than "streaming", as it measures cropping the image before dithering it and not band streaming.
+
+Each render runs in a fresh process, the peak RSS reported is the increase over the RSS of that process just before
+rendering, i.e. once the source image has been decoded and fitted to the display.
+
+Peak RSS is read from /proc, so the benchmark runs on Linux only (as does the Raspberry Pi). Run from the root of the
+repository:
+    python -m benchmarks.render_memory [--fit-mode crop] [--algorithm atkinson]
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from PIL import Image
+
+# Size of the generated source photo, roughly a 12 MP phone photo
+SOURCE_SIZE = (4000, 3000)
+
+
+def read_status(field: str) -> int:
+    # Reads a memory field of /proc/self/status in bytes, e.g. VmRSS (current RSS) or VmHWM (peak RSS)
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    raise ValueError(f"{field} not found in /proc/self/status")
+
+
+def reset_peak_rss():
+    # Linux allows the peak RSS of a process to be reset to its current RSS
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+
+def baseline_render(image, resolution, palette, algorithm):
+    from backend.lib.image_utilis import crop_image_height, crop_image_width, pad_image
+
+    # The baseline only dithered with Floyd-Steinberg, the algorithm is ignored
+    palette_image = Image.new("P", (1, 1))
+    palette_image.putpalette(palette + [0, 0, 0] * 248)
+    image = image.convert("RGB").quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+    if image.width > resolution[0]:
+        image = crop_image_width(image, resolution)
+    if image.height > resolution[1]:
+        image = crop_image_height(image, resolution)
+    if image.width < resolution[0] or image.height < resolution[1]:
+        image = pad_image(resolution, image)
+    return image
+
+
+def streaming_render(image, resolution, palette, algorithm):
+    from backend.lib.image_utilis import dither_to_frame
+
+    return dither_to_frame(image, resolution, palette, algorithm)
+
+
+RENDER_PATHS = {
+    "baseline": baseline_render,
+    "streaming": streaming_render,
+}
+
+
+def measure(display_type, render_path: str, source: bytes, fit_mode, algorithm) -> tuple[int, float]:
+    from backend.lib.display_utilis import construct_palette, resolve_display_from_settings
+    from backend.lib.image_utilis import fit_image
+    from backend.lib.palette_lut import get_palette_lut
+    from backend.models.display_model import BorderColour, ColourPalette, DisplaySettings
+
+    display = resolve_display_from_settings(
+        DisplaySettings(type=display_type, colour_palette=ColourPalette.RED, border_colour=BorderColour.WHITE)
+    )
+    palette = construct_palette(display)
+    get_palette_lut(palette)
+    image = fit_image(Image.open(io.BytesIO(source)), display.resolution, fit_mode)
+    image.load()
+    # Warm up with a tiny render so one off costs, such as lazy imports, are not measured
+    RENDER_PATHS[render_path](image.crop((0, 0, 8, 8)), (8, 8), palette, algorithm)
+
+    reset_peak_rss()
+    baseline = read_status("VmRSS")
+    start = time.perf_counter()
+    RENDER_PATHS[render_path](image, display.resolution, palette, algorithm)
+    elapsed = time.perf_counter() - start
+    return read_status("VmHWM") - baseline, elapsed
+
+
+def generate_source() -> bytes:
+    source_stream = io.BytesIO()
+    gradient = Image.radial_gradient("L").resize(SOURCE_SIZE)
+    Image.merge("RGB", (gradient, gradient.transpose(Image.Transpose.ROTATE_180), gradient)).save(
+        source_stream, "JPEG", quality=90
+    )
+    return source_stream.getvalue()
+
+
+def main():
+    from backend.models.display_model import DisplayType, DitherAlgorithm, FitMode
+
+    parser = argparse.ArgumentParser(description="Compare the peak memory of the render paths for each display type")
+    parser.add_argument("--fit-mode", type=FitMode, default=FitMode.CROP, choices=list(FitMode))
+    parser.add_argument(
+        "--algorithm", type=DitherAlgorithm, default=DitherAlgorithm.ATKINSON, choices=list(DitherAlgorithm)
+    )
+    args = parser.parse_args()
+    labels = {path: path for path in RENDER_PATHS}
+    if args.algorithm == DitherAlgorithm.FLOYD_STEINBERG:
+        labels["streaming"] = "cropped"
+
+    # Palette lookup tables are written under DATA_DIR, keep them out of the working directory
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="inky_dash_benchmark_"))
+    source = generate_source()
+
+    print(f"Source {SOURCE_SIZE[0]}x{SOURCE_SIZE[1]} JPEG, fit mode {args.fit_mode.value}, {args.algorithm.value}")
+    print(f"{'display type':<20}" + "".join(f"{label + ' peak':>20}{label + ' time':>20}" for label in labels.values()))
+    for display_type in DisplayType:
+        row = f"{display_type.value:<20}"
+        for render_path in RENDER_PATHS:
+            # A new process per measurement, so every render starts from the same peak RSS
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                try:
+                    peak, elapsed = executor.submit(
+                        measure, display_type, render_path, source, args.fit_mode, args.algorithm
+                    ).result()
+                    row += f"{peak / 2**20:>17.1f} MB{elapsed:>19.2f}s"
+                except Exception as err:  # noqa: BLE001 - a failed render is reported in its column
+                    row += f"{'failed: ' + str(err):>40}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
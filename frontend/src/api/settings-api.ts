@@ -1,8 +1,17 @@
 import type { DisplaySettings } from '@/types/display'
-import type { SetDisplayResponse } from '@/types/settings.ts'
+import type {
+  SetDisplayResponse,
+  SettingsOperationResponse,
+} from '@/types/settings.ts'
+import type { millisecond } from '@/types/branded-types'
+import { SettingsOperationStatus } from '@/types/settings.ts'
 import { fetchWithErrorHandling } from '@/lib/fetcher.ts'
 import { constructUrl } from '@/lib/utils'
 
+// How often a settings operation is polled, and how long to wait for it
+const OPERATION_POLL_INTERVAL = 500 as millisecond
+const OPERATION_TIMEOUT = 60000 as millisecond
+
 export async function updateSettings(
   displaySettings: Partial<DisplaySettings>,
   alertFn: (message: string) => void,
@@ -26,3 +35,40 @@ export async function updateSettings(
     console.error('Error updating display settings', error)
   })
 }
+
+export async function getSettingsOperation(
+  operationId: string,
+  alertFn: (message: string) => void,
+): Promise<SettingsOperationResponse | null | void> {
+  return fetchWithErrorHandling<SettingsOperationResponse>(
+    constructUrl(`settings/operations/${operationId}`),
+    {},
+    alertFn,
+  ).catch((error: Error) => {
+    console.error('Error getting settings operation', error)
+  })
+}
+
+/**
+ * Polls the operation applying updated settings until it has finished.
+ * Resolves with the finished operation, or nothing if it could not be
+ * retrieved or did not finish in time.
+ */
+export async function waitForSettingsOperation(
+  operationId: string,
+  alertFn: (message: string) => void,
+): Promise<SettingsOperationResponse | null | void> {
+  const deadline = Date.now() + OPERATION_TIMEOUT
+  while (Date.now() < deadline) {
+    const operation = await getSettingsOperation(operationId, alertFn)
+    if (
+      !operation ||
+      operation.status === SettingsOperationStatus.SUCCEEDED ||
+      operation.status === SettingsOperationStatus.FAILED
+    ) {
+      return operation
+    }
+    await new Promise((resolve) => setTimeout(resolve, OPERATION_POLL_INTERVAL))
+  }
+  alertFn('Timed out waiting for the display settings to be applied')
+}
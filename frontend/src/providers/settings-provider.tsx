@@ -13,8 +13,12 @@ import type {
   DisplaySettingsResponse,
 } from '@/types/settings.ts'
 import { ToastType } from '@/types/toast.ts'
+import { SettingsOperationStatus } from '@/types/settings.ts'
 import { constructUrl } from '@/lib/utils.ts'
-import { updateSettings } from '@/api/settings-api.ts'
+import {
+  updateSettings,
+  waitForSettingsOperation,
+} from '@/api/settings-api.ts'
 
 interface SettingsContextDefaults {
   displaySettings: DisplaySettings | null
@@ -88,19 +92,26 @@ export const SettingsProvider = ({
     updatedSettings: DisplaySettings,
   ): Promise<boolean> {
     let success = false
-    const res = await updateSettings(
-      { ...updatedSettings },
-      (message: string) =>
-        addToast(`Error updating display - ${message}`, {
-          type: ToastType.ERROR,
-        }),
-    )
-    if (res) {
-      addToast('Successfully submitted display settings', {
-        type: ToastType.SUCCESS,
+    const alertFn = (message: string) =>
+      addToast(`Error updating display - ${message}`, {
+        type: ToastType.ERROR,
       })
-      setDisplaySettings(updatedSettings)
-      success = true
+    const res = await updateSettings({ ...updatedSettings }, alertFn)
+    if (res) {
+      // The settings are applied to the display in the background
+      const operation = await waitForSettingsOperation(
+        res.operation_id,
+        alertFn,
+      )
+      if (operation?.status === SettingsOperationStatus.SUCCEEDED) {
+        addToast('Successfully submitted display settings', {
+          type: ToastType.SUCCESS,
+        })
+        setDisplaySettings(updatedSettings)
+        success = true
+      } else if (operation) {
+        operation.errors.forEach((error) => alertFn(error))
+      }
     }
 
     return success
@@ -99,10 +99,11 @@ function DisplaySettingsPage() {
   }, [displayClass.palettes, settingsForm, typeValue])
 
   const onSubmit = async (values: SettingsForm) => {
+    // Resolves once the display has applied the settings, or failed to
     const success = await submit({ ...values })
+    // Force a revalidation of the slideshow data which would have been cleared if the display type changed
+    mutate(constructUrl('slideshow'))
     if (success) {
-      // Force a revalidation of the slideshow data which would have been cleared if the display type changed
-      mutate(constructUrl('slideshow'))
       await navigate({ to: '/' })
     }
     return success
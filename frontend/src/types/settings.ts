@@ -20,6 +20,23 @@ export interface DetectDisplayResponse {
   type: DisplayType | null
 }
 
-export interface SetDisplayResponse {
-  message: string
+export enum SettingsOperationStatus {
+  PENDING = 'pending',
+  RUNNING = 'running',
+  SUCCEEDED = 'succeeded',
+  FAILED = 'failed',
+}
+
+// Settings are stored straight away and applied to the display in the
+// background, the operation tracks applying them
+export interface SettingsOperationResponse {
+  operation_id: string
+  status: SettingsOperationStatus
+  submitted_at: number
+  finished_at: number | null
+  errors: Array<string>
+}
+
+export interface SetDisplayResponse extends SettingsOperationResponse {
+  success: boolean
 }
@@ -20,6 +20,21 @@ parser.add_argument(
     help="When running in a desktop environment, actions to update the Inky display will not be attempted",
 )
 
+parser.add_argument(
+    "--dither-workers",
+    type=int,
+    help="Number of processes used when dithering in parallel, defaults to the number of CPU cores",
+)
+
+parser.add_argument(
+    "--render-workers",
+    type=int,
+    help="Number of processes used to render images outside the server process, defaults to 2 or fewer CPU cores",
+)
+
+# Processes used for parallel dithering start by running this script, when frozen by PyInstaller they must be
+# diverted before the arguments are parsed
+multiprocessing.freeze_support()
 args = parser.parse_args()
 
 # Check the value of the flags
@@ -33,6 +48,12 @@ if args.desktop:
 else:
     os.environ["DESKTOP"] = "False"
 
+if args.dither_workers:
+    os.environ["DITHER_WORKERS"] = str(args.dither_workers)
+
+if args.render_workers:
+    os.environ["RENDER_WORKERS"] = str(args.render_workers)
+
 # sys.frozen is set by PyInstaller when running as a compiled binary
 if getattr(sys, "frozen", False):
     os.environ["DATA_DIR"] = "/var/lib/inky_dash"